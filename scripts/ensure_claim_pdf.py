@@ -1,14 +1,20 @@
 #!/usr/bin/env python3
 """
 Generate PDF from claim_timeline.md and ensure it's at least 10 pages.
-If needed, appends appendix sections to the markdown and regenerates.
+If needed, appends appendix sections to the markdown in the same layout pass.
+
+Pass one or more markdown files to render a batch of claims in parallel.
 """
 
-import re
+import argparse
+import os
 import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
+from typing import List, Optional, Tuple
+
 from fpdf import FPDF
-from pypdf import PdfReader
 
 PROJECT_ROOT = Path(__file__).resolve().parent.parent
 MARKDOWN_PATH = PROJECT_ROOT / "data" / "claim_timeline.md"
@@ -125,13 +131,89 @@ def generate_pdf(markdown_path: Path, pdf_path: Path) -> int:
     pdf.add_markdown_text(content)
     pdf.output(str(pdf_path))
     
-    # Count pages
-    reader = PdfReader(str(pdf_path))
-    return len(reader.pages)
+    # FPDF tracks pages while laying out; no need to re-read the file.
+    return pdf.page_no()
+
+
+def render_claim(markdown_path: Path, pdf_path: Path, min_pages: int = MIN_PAGES) -> Tuple[int, List[str]]:
+    """
+    Render one claim file to PDF, appending appendices until min_pages is reached.
+
+    Layout is incremental: the base markdown is laid out once and each
+    appendix continues on the same in-memory document, so the page count is
+    known after every appendix without regenerating anything. The PDF and
+    (if appendices were needed) the markdown are each written exactly once.
+
+    Returns:
+        (page_count, titles of the appendices that were appended)
+    """
+    with open(markdown_path, 'r', encoding='utf-8') as f:
+        content = f.read()
+    # End the last line, so an appendix starts on a line of its own in the
+    # written file as it does in the layout.
+    if not content.endswith('\n'):
+        content += '\n'
+
+    pdf = MarkdownToPDF()
+    pdf.add_markdown_text(content)
+
+    appended: List[str] = []
+    for title, make_appendix in APPENDICES:
+        if pdf.page_no() >= min_pages:
+            break
+        appendix = make_appendix()
+        if not appendix.endswith('\n'):
+            appendix += '\n'
+        # Lay out exactly the lines the concatenated file would produce:
+        # the content's trailing newline already ends its last line.
+        chunk = appendix[1:] if appendix.startswith('\n') else appendix
+        pdf.add_markdown_text(chunk)
+        content += appendix
+        appended.append(title)
+
+    page_count = pdf.page_no()
+    if page_count < min_pages:
+        raise Exception(
+            f"Failed to reach {min_pages} pages after {len(appended)} appendices "
+            f"for {markdown_path}. Final count: {page_count}"
+        )
+
+    pdf.output(str(pdf_path))
+    if appended:
+        with open(markdown_path, 'w', encoding='utf-8') as f:
+            f.write(content)
 
+    return page_count, appended
 
-def append_appendix_a(markdown_path: Path):
-    """Append Appendix A with high-resolution incident log."""
+
+def _render_job(job: Tuple[str, str, int]) -> Tuple[str, int, List[str]]:
+    markdown_path, pdf_path, min_pages = job
+    page_count, appended = render_claim(Path(markdown_path), Path(pdf_path), min_pages)
+    return pdf_path, page_count, appended
+
+
+def render_claims(
+    markdown_paths: List[Path],
+    min_pages: int = MIN_PAGES,
+    workers: Optional[int] = None,
+) -> List[Tuple[str, int, List[str]]]:
+    """
+    Render many claim files, in parallel across processes when workers > 1.
+
+    Each PDF is written next to its markdown file (same stem, .pdf suffix).
+    Returns (pdf_path, page_count, appended appendix titles) per file, in input order.
+    """
+    jobs = [(str(p), str(p.with_suffix('.pdf')), min_pages) for p in markdown_paths]
+    if workers is None:
+        workers = os.cpu_count() or 1
+    if workers <= 1 or len(jobs) <= 1:
+        return [_render_job(job) for job in jobs]
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        return list(pool.map(_render_job, jobs, chunksize=max(1, len(jobs) // (workers * 4))))
+
+
+def appendix_a() -> str:
+    """Appendix A: high-resolution incident log."""
     appendix = """
 
 ## Appendix A — High-Resolution Incident Log (Second/Minute Granularity)
@@ -401,12 +483,11 @@ This appendix provides second-by-second and minute-by-minute granularity for the
 **2024-01-03 20:35:00** – End of high-resolution incident log window. All immediate post-incident activities documented.
 
 """
-    with open(markdown_path, 'a', encoding='utf-8') as f:
-        f.write(appendix)
+    return appendix
 
 
-def append_appendix_b(markdown_path: Path):
-    """Append Appendix B with supporting metadata."""
+def appendix_b() -> str:
+    """Appendix B: supporting metadata."""
     appendix = """
 
 ## Appendix B — Supporting Metadata
@@ -494,12 +575,11 @@ def append_appendix_b(markdown_path: Path):
 - Internal Policy Compliance: Verified
 
 """
-    with open(markdown_path, 'a', encoding='utf-8') as f:
-        f.write(appendix)
+    return appendix
 
 
-def append_appendix_a2(markdown_path: Path):
-    """Append Appendix A.2 with extended dispatch and call log."""
+def appendix_a2() -> str:
+    """Appendix A.2: extended dispatch and call log."""
     appendix = """
 
 ## Appendix A.2 — Extended Dispatch & Call Log
@@ -571,42 +651,46 @@ def append_appendix_a2(markdown_path: Path):
 **2024-01-03 20:40:00** – End of extended dispatch and call log window.
 
 """
-    with open(markdown_path, 'a', encoding='utf-8') as f:
-        f.write(appendix)
+    return appendix
+
 
+APPENDICES = [
+    ("Appendix A — High-Resolution Incident Log", appendix_a),
+    ("Appendix B — Supporting Metadata", appendix_b),
+    ("Appendix A.2 — Extended Dispatch & Call Log", appendix_a2),
+]
 
-def main():
+
+def main(argv: Optional[List[str]] = None):
     """Main execution."""
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument(
+        "markdown", nargs="*", type=Path,
+        help="Claim markdown files to render (default: data/claim_timeline.md)",
+    )
+    parser.add_argument("--min-pages", type=int, default=MIN_PAGES)
+    parser.add_argument(
+        "--workers", type=int, default=None,
+        help="Worker processes for batch rendering (default: CPU count)",
+    )
+    args = parser.parse_args(argv)
+
+    if args.markdown:
+        start = time.perf_counter()
+        results = render_claims(args.markdown, min_pages=args.min_pages, workers=args.workers)
+        elapsed = time.perf_counter() - start
+        for pdf_path, page_count, appended in results:
+            suffix = f" (+{len(appended)} appendices)" if appended else ""
+            print(f"✓ {pdf_path}: {page_count} pages{suffix}")
+        print(f"\n✓ Rendered {len(results)} claim(s) in {elapsed:.2f}s")
+        return 0
+
     print(f"Reading markdown from: {MARKDOWN_PATH}")
     print(f"Generating PDF to: {PDF_PATH}")
     
-    # Initial PDF generation
-    page_count = generate_pdf(MARKDOWN_PATH, PDF_PATH)
-    print(f"Initial PDF: {page_count} pages")
-    
-    iterations = 0
-    max_iterations = 3
-    
-    while page_count < MIN_PAGES and iterations < max_iterations:
-        iterations += 1
-        print(f"\nPDF has {page_count} pages (need {MIN_PAGES}). Appending appendix sections...")
-        
-        if iterations == 1:
-            append_appendix_a(MARKDOWN_PATH)
-            print("Appended: Appendix A — High-Resolution Incident Log")
-        elif iterations == 2:
-            append_appendix_b(MARKDOWN_PATH)
-            print("Appended: Appendix B — Supporting Metadata")
-        else:
-            append_appendix_a2(MARKDOWN_PATH)
-            print("Appended: Appendix A.2 — Extended Dispatch & Call Log")
-        
-        # Regenerate PDF
-        page_count = generate_pdf(MARKDOWN_PATH, PDF_PATH)
-        print(f"Regenerated PDF: {page_count} pages")
-    
-    if page_count < MIN_PAGES:
-        raise Exception(f"Failed to reach {MIN_PAGES} pages after {max_iterations} iterations. Final count: {page_count}")
+    page_count, appended = render_claim(MARKDOWN_PATH, PDF_PATH, args.min_pages)
+    for title in appended:
+        print(f"Appended: {title}")
     
     # Verify PDF exists and is non-empty
     if not PDF_PATH.exists():
@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+"""
+List stored evaluation runs and compare two of them.
+
+Every ``python src/eval/judge.py`` run is appended to the results store
+(``src/eval/runs/``, or ``EVAL_RUNS_DIR``). ``compare`` checks a candidate
+run against a baseline on the cases both ran and exits with status 1 when
+any gate fails: a quality mean dropped, a stage's p95 latency grew, tokens
+per case grew beyond the thresholds, or too few of the baseline's cases
+were run. It exits with status 2 when the runs share no case at all.
+
+Runs are named by id, unique id prefix, ``latest`` or ``latest~N``.
+
+Usage:
+    python scripts/eval_runs.py list
+    python scripts/eval_runs.py compare                      # latest~1 vs latest
+    python scripts/eval_runs.py compare 20261019-0912 latest --max-latency-increase 0.1
+"""
+
+import argparse
+import sys
+from pathlib import Path
+from typing import List, Optional
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(PROJECT_ROOT / "src" / "eval"))
+
+from results_store import Gates, ResultsStore, compare, format_comparison  # noqa: E402
+
+
+def list_runs(store: ResultsStore) -> int:
+    runs = store.runs()
+    if not runs:
+        print(f"No runs in {store.directory}")
+        return 0
+    print(f"{'run':<28} {'cases':>5} {'correct':>7} {'f1':>5} {'hit':>5}  config")
+    for entry in runs:
+        averages = entry.get("averages", {})
+
+        def fmt(metric: str) -> str:
+            value = averages.get(metric)
+            return "-" if value is None else f"{value:.2f}"
+
+        config = ", ".join(f"{k}={v}" for k, v in entry.get("config", {}).items())
+        print(
+            f"{entry['run_id']:<28} {entry['cases']:>5} {fmt('llm_correctness'):>7} "
+            f"{fmt('token_f1'):>5} {fmt('context_hit'):>5}  {config}"
+        )
+    return 0
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--dir", type=Path, help="Results store directory (default: EVAL_RUNS_DIR or src/eval/runs)")
+    sub = parser.add_subparsers(dest="command", required=True)
+    sub.add_parser("list", help="List stored runs, oldest first")
+    cmp = sub.add_parser("compare", help="Compare a candidate run against a baseline")
+    cmp.add_argument("baseline", nargs="?", default="latest~1")
+    cmp.add_argument("candidate", nargs="?", default="latest")
+    defaults = Gates()
+    cmp.add_argument("--max-quality-drop", type=float, default=defaults.max_quality_drop,
+                     help="Allowed drop of a quality mean, as a fraction of its scale")
+    cmp.add_argument("--max-latency-increase", type=float, default=defaults.max_latency_increase,
+                     help="Allowed relative increase of a stage's p95 latency")
+    cmp.add_argument("--min-latency-ms", type=float, default=defaults.min_latency_ms,
+                     help="p95 increases smaller than this never fail")
+    cmp.add_argument("--max-token-increase", type=float, default=defaults.max_token_increase,
+                     help="Allowed relative increase of mean tokens per case")
+    cmp.add_argument("--min-case-overlap", type=float, default=defaults.min_case_overlap,
+                     help="Smallest share of the baseline's cases the candidate must have run")
+    args = parser.parse_args(argv)
+
+    store = ResultsStore(args.dir)
+    if args.command == "list":
+        return list_runs(store)
+
+    gates = Gates(
+        max_quality_drop=args.max_quality_drop,
+        max_latency_increase=args.max_latency_increase,
+        min_latency_ms=args.min_latency_ms,
+        max_token_increase=args.max_token_increase,
+        min_case_overlap=args.min_case_overlap,
+    )
+    try:
+        baseline, candidate = store.load(args.baseline), store.load(args.candidate)
+    except (ValueError, OSError) as exc:
+        print(f"error: {exc}", file=sys.stderr)
+        return 2
+    report = compare(baseline, candidate, gates)
+    print(format_comparison(report))
+    if not report["cases"]:
+        print("error: the runs have no case in common", file=sys.stderr)
+        return 2
+    return 0 if report["passed"] else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,501 @@
+#!/usr/bin/env python3
+"""
+Generate a seeded corpus of synthetic claim timelines for scale and load tests.
+
+Every claim follows the structure of data/claim_timeline.md (FNOL with incident
+log, ER report, adjuster visit, physiotherapy, work capacity note, settlement
+thread, Event and Expenses ledgers) and comes with ground-truth test cases in
+the src/eval/test_cases.json format (plus a "claim_id" field).
+
+The same --seed always produces byte-identical output, regardless of the
+number of worker processes.
+
+Usage:
+    python scripts/generate_claim_corpus.py --count 1000 --out data/synthetic
+    python scripts/generate_claim_corpus.py --count 100000 --workers 16 --pdf
+"""
+
+import argparse
+import json
+import os
+import random
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date, datetime, timedelta
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+DEFAULT_OUT_DIR = PROJECT_ROOT / "data" / "synthetic"
+CLAIMS_PER_SHARD = 1000
+
+FIRST_NAMES = [
+    "Dana", "Noa", "Maya", "Yael", "Tamar", "Shira", "Michal", "Rivka", "Avital", "Hila",
+    "David", "Yosef", "Amir", "Eitan", "Omer", "Itai", "Lior", "Ronen", "Gil", "Nadav",
+]
+LAST_NAMES = [
+    "Cohen", "Levi", "Mizrahi", "Peretz", "Biton", "Dahan", "Avraham", "Friedman",
+    "Azoulay", "Katz", "Shapiro", "Ben-David", "Golan", "Rosen", "Halevi", "Ohayon",
+]
+INSURERS = ["Magen Insurance", "Harel Mutual", "Shomer Assurance", "Ogen Insurance", "Keshet General"]
+LOCATIONS = [
+    ("Jerusalem", "Jaffa Road", "Shlomzion HaMalka Street", "Shaare Zedek Medical Center"),
+    ("Jerusalem", "King George Street", "Agron Street", "Hadassah Ein Kerem"),
+    ("Tel Aviv", "Ibn Gabirol Street", "Arlozorov Street", "Ichilov Medical Center"),
+    ("Haifa", "Herzl Street", "Balfour Street", "Rambam Health Care Campus"),
+    ("Beersheba", "Rager Boulevard", "Yitzhak Rager Street", "Soroka Medical Center"),
+    ("Petah Tikva", "Jabotinsky Road", "Kaplan Street", "Beilinson Hospital"),
+]
+VEHICLES = [
+    "2019 Mazda 3", "2020 Toyota Corolla", "2018 Hyundai i30", "2021 Kia Picanto",
+    "2017 Skoda Octavia", "2022 Suzuki Swift", "2016 Mitsubishi Lancer",
+]
+PARKED_VEHICLES = ["silver Honda Civic", "white Renault Clio", "black Seat Ibiza", "blue Ford Focus"]
+INJURIES = [
+    ("cervical and lumbar strain", "whiplash-type injury"),
+    ("cervical strain", "soft tissue neck injury"),
+    ("lumbar strain", "lower back soft tissue injury"),
+    ("shoulder contusion and cervical strain", "seat-belt related soft tissue injury"),
+]
+PHYSIO_CENTERS = [
+    "Rehavia Physical Therapy Center", "Maccabi Physio Clinic", "Clalit Rehab Unit",
+    "Motion Physio Lab", "Meuhedet Physiotherapy",
+]
+EMPLOYERS = [
+    "Talpiot Analytics Ltd.", "Carmel Logistics", "Negev Software", "Galil Foods",
+    "Shfela Engineering", "Yarkon Media",
+]
+ADJUSTERS = ["Amir Levi", "Ruth Segal", "Yoni Baruch", "Keren Aloni"]
+REPRESENTATIVES = ["Yael Ben-Haim", "Oren Katz", "Michal Sasson", "Tal Weiss"]
+WEATHER = ["light rain", "heavy rain", "dry and clear", "fog", "strong wind"]
+
+
+def _pronouns(first_name: str) -> Tuple[str, str]:
+    female = FIRST_NAMES.index(first_name) < 10
+    return ("she", "her") if female else ("he", "his")
+
+
+def _fmt_amount(amount: int) -> str:
+    return f"NIS {amount:,}"
+
+
+def _claim_facts(rng: random.Random, index: int) -> Dict[str, Any]:
+    """Draw all the facts for one claim; everything else is rendered from these."""
+    first, last = rng.choice(FIRST_NAMES), rng.choice(LAST_NAMES)
+    city, road, cross_street, hospital = rng.choice(LOCATIONS)
+    accident_day = date(2023, 1, 1) + timedelta(days=rng.randrange(0, 3 * 365))
+    accident_at = datetime.combine(accident_day, datetime.min.time()) + timedelta(
+        hours=rng.randrange(7, 22), minutes=rng.randrange(0, 60)
+    )
+    refused_ambulance = rng.random() < 0.6
+    if refused_ambulance:
+        er_at = accident_at + timedelta(hours=rng.randrange(1, 40))
+    else:
+        er_at = accident_at + timedelta(minutes=rng.randrange(20, 60))
+    fnol_day = accident_day + timedelta(days=rng.randrange(1, 4))
+    adjuster_day = accident_day + timedelta(days=rng.randrange(14, 36))
+    physio_start = accident_day + timedelta(days=rng.randrange(20, 46))
+
+    sessions = []
+    session_day = physio_start
+    pain = rng.randrange(5, 9)
+    for number in range(1, rng.randrange(6, 15) + 1):
+        sessions.append((number, session_day, pain))
+        session_day += timedelta(days=rng.randrange(3, 9))
+        pain = max(1, pain - rng.choice([0, 0, 1, 1, 2]))
+    physio_end = sessions[-1][1]
+
+    return_to_work = physio_start + timedelta(
+        days=rng.randrange(7, max(8, (physio_end - physio_start).days))
+    )
+    settlement_day = physio_end + timedelta(days=rng.randrange(20, 61))
+    insurer = rng.choice(INSURERS)
+    injury, injury_lay = rng.choice(INJURIES)
+
+    return {
+        "claim_id": f"SC-{accident_day.year}-{index:06d}",
+        "first": first,
+        "last": last,
+        "name": f"{first} {last}",
+        "pronouns": _pronouns(first),
+        "insurer": insurer,
+        "policy": f"AC-{accident_day.year - 1}-{rng.randrange(1000, 9999)}",
+        "city": city,
+        "road": road,
+        "cross_street": cross_street,
+        "hospital": hospital,
+        "vehicle": rng.choice(VEHICLES),
+        "plate": f"{rng.randrange(10, 99)}-{rng.randrange(100, 999)}-{rng.randrange(10, 99)}",
+        "parked_vehicle": rng.choice(PARKED_VEHICLES),
+        "weather": rng.choice(WEATHER),
+        "speed": rng.randrange(25, 60),
+        "refused_ambulance": refused_ambulance,
+        "accident_at": accident_at,
+        "er_at": er_at,
+        "fnol_day": fnol_day,
+        "adjuster_day": adjuster_day,
+        "adjuster": rng.choice(ADJUSTERS),
+        "representative": rng.choice(REPRESENTATIVES),
+        "injury": injury,
+        "injury_lay": injury_lay,
+        "physio_center": rng.choice(PHYSIO_CENTERS),
+        "sessions": sessions,
+        "return_to_work": return_to_work,
+        "employer": rng.choice(EMPLOYERS),
+        "settlement_day": settlement_day,
+        "demand_amount": rng.randrange(60, 240) * 1000,
+        "settlement_amount": rng.randrange(30, 240) * 500,
+        "repair_estimate": rng.randrange(40, 400) * 100,
+        "deductible": rng.choice([1200, 1500, 1800, 2400]),
+    }
+
+
+def _incident_log(rng: random.Random, f: Dict[str, Any], extra_events: int) -> List[str]:
+    she, _ = f["pronouns"]
+    before = [
+        (0, f"Weather monitoring reports {f['weather']} on {f['road']}."),
+        (rng.randrange(20, 90), f"Insured vehicle ({f['vehicle']}, plate {f['plate']}) detected entering {f['road']}."),
+    ]
+    for _ in range(extra_events):
+        before.append((rng.randrange(5, 40), rng.choice([
+            f"Traffic flow sensor records average speed {rng.randrange(20, 55)} km/h on {f['road']}.",
+            f"Traffic camera at {f['road']} / {f['cross_street']} reports normal operation.",
+            "Municipal traffic control center logs routine status check. No incidents reported.",
+            f"Vehicle {f['plate']} maintains lane {rng.randrange(1, 4)} of 3.",
+        ])))
+    before.append((rng.randrange(20, 60), f"Vehicle ahead of {f['plate']} begins sharp deceleration."))
+    before.append((rng.randrange(2, 6), f"Brake lights of {f['vehicle']} activate; ABS engages."))
+
+    transport = (
+        f"Driver **declines ambulance transport**, stating {she} feels okay and prefers to go home."
+        if f["refused_ambulance"] else
+        f"Driver is transported by ambulance to {f['hospital']} for evaluation."
+    )
+    after = [
+        (rng.randrange(2, 6), f"**Impact** with parked {f['parked_vehicle']} at approximately {f['speed']} km/h; airbags deploy."),
+        (rng.randrange(10, 40), f"Driver ({f['name']}) exits the vehicle and sits on the curb; appears unsteady."),
+        (rng.randrange(20, 60), "Bystander calls emergency services reporting a single-car collision."),
+        (rng.randrange(200, 420), "Ambulance arrives; paramedics assess the driver."),
+        (rng.randrange(60, 240), transport),
+        (rng.randrange(60, 300), "Police complete scene documentation and clear the roadway."),
+    ]
+
+    # Anchor the log so the impact entry lands exactly on the ledger's accident time.
+    impact_offset = sum(delta for delta, _ in before) + after[0][0]
+    t = f["accident_at"] - timedelta(seconds=impact_offset)
+    entries = []
+    for delta, text in before + after:
+        t += timedelta(seconds=delta)
+        entries.append(f"**{t:%Y-%m-%d %H:%M:%S}** – {text}")
+    return entries
+
+
+def render_claim(f: Dict[str, Any], incident_log: List[str]) -> str:
+    """Render one claim's facts as markdown in the claim_timeline.md layout."""
+    she, _ = f["pronouns"]
+    acc = f["accident_at"]
+    sessions = f["sessions"]
+    physio_start, physio_end = sessions[0][1], sessions[-1][1]
+    first_pain, last_pain = sessions[0][2], sessions[-1][2]
+    transport = (
+        f"{she.capitalize()} refused ambulance transport at the scene and went home with a friend."
+        if f["refused_ambulance"] else
+        f"{she.capitalize()} was transported by ambulance from the scene."
+    )
+
+    lines = [
+        f"# Claim {f['claim_id']} – {f['last']} v. {f['insurer']}",
+        "",
+        "---",
+        "",
+        "## High-Level Timeline Overview",
+        "",
+        f"This claim file documents the bodily injury and property damage claim of **{f['name']}** "
+        f"following a motor vehicle collision in {f['city']}.",
+        "",
+        "**Key dates**",
+        "",
+        f"- **{acc:%Y-%m-%d %H:%M}** – Motor vehicle collision at {f['road']} and {f['cross_street']}, {f['city']}.",
+        f"- **{f['er_at']:%Y-%m-%d %H:%M}** – Emergency Room visit at {f['hospital']}.",
+        f"- **{f['fnol_day']}** – Initial Loss Report (FNOL) finalized.",
+        f"- **{f['adjuster_day']}** – Field adjuster site visit and vehicle inspection.",
+        f"- **{physio_start} – {physio_end}** – Physiotherapy ({len(sessions)} sessions).",
+        f"- **{f['return_to_work']}** – Return to part-time work.",
+        f"- **{f['settlement_day']}** – Bodily injury claim settled for **{_fmt_amount(f['settlement_amount'])}**.",
+        "",
+        "---",
+        "",
+        "## Document 1 – Initial Loss Report (FNOL)",
+        "",
+        f"**Policy number:** {f['policy']}  ",
+        f"**Insured:** {f['name']}  ",
+        f"**Vehicle:** {f['vehicle']}, plate {f['plate']}",
+        "",
+        "### 1.1 High-Resolution Incident Log (Accident Window)",
+        "",
+    ]
+    for entry in incident_log:
+        lines += [entry, ""]
+    lines += [
+        "### 1.2 Emergency Call & FNOL Transcript",
+        "",
+        f"The insured called the {f['insurer']} hotline on the evening of the accident and reported "
+        f"a single-vehicle collision with a parked {f['parked_vehicle']}. {transport}",
+        "",
+        "### 1.3 Structured Intake Note",
+        "",
+        "**Document type:** Call center intake note  ",
+        f"**Date created:** {f['fnol_day']}  ",
+        f"**Author:** {f['representative']}, Claims Representative",
+        "",
+        "Insured reports neck and back pain after the collision. Police report pending.",
+        "",
+        "---",
+        "",
+        "## Document 2 – Emergency Room Report",
+        "",
+        f"**Hospital:** {f['hospital']}  ",
+        f"**Arrival:** {f['er_at']:%Y-%m-%d %H:%M}",
+        "",
+        "### Chief Complaint",
+        "",
+        f"Neck and lower back pain following a motor vehicle accident on {acc:%Y-%m-%d}.",
+        "",
+        "### Diagnosis",
+        "",
+        f"Soft tissue injury – **{f['injury']}** (“{f['injury_lay']}”).",
+        "",
+        "### Disposition",
+        "",
+        "Discharged home the same day with analgesics and a referral to physiotherapy.",
+        "",
+        "---",
+        "",
+        "## Document 3 – Adjuster Site Visit Report",
+        "",
+        f"**Adjuster:** {f['adjuster']}  ",
+        f"**Visit date:** {f['adjuster_day']}",
+        "",
+        "### Vehicle Inspection",
+        "",
+        f"Front bumper, headlights and airbags require replacement. Repair estimate "
+        f"**{_fmt_amount(f['repair_estimate'])}**; deductible {_fmt_amount(f['deductible'])}.",
+        "",
+        "### Recommendation",
+        "",
+        "Approve vehicle repair under comprehensive coverage.",
+        "",
+        "---",
+        "",
+        "## Document 4 – Physiotherapy Progress Report",
+        "",
+        f"**Clinic:** {f['physio_center']}",
+        "",
+        f"### Initial Assessment – {physio_start}",
+        "",
+        f"- Pain level: **{first_pain}/10**.",
+        "- Cervical and lumbar range of motion limited.",
+        "",
+        "### Session Log (abridged)",
+        "",
+    ]
+    for number, day, pain in sessions:
+        final = " (final)" if number == len(sessions) else ""
+        lines += [f"**Session {number}{final} – {day}**", "", f"- Pain reported as **{pain}/10**.", ""]
+        if number > 1 and sessions[number - 2][1] < f["return_to_work"] <= day:
+            lines += [f"- Patient reports **return to part-time work on {f['return_to_work']}**.", ""]
+    lines += [
+        "### Final Assessment",
+        "",
+        f"Residual mild discomfort ({last_pain}/10). No indication of permanent disability.",
+        "",
+        "---",
+        "",
+        "## Document 5 – Work and Functional Capacity Note",
+        "",
+        f"{f['name']} returned to part-time work at {f['employer']} on **{f['return_to_work']}**, "
+        f"initially 4-hour days, increasing gradually.",
+        "",
+        "---",
+        "",
+        "## Document 6 – Settlement Email Thread",
+        "",
+        f"### Excerpt – {f['settlement_day'] - timedelta(days=10)} (Insured’s Counsel)",
+        "",
+        f"We demand {_fmt_amount(f['demand_amount'])} for pain and suffering, lost income and treatment costs.",
+        "",
+        f"### Final Agreement – {f['settlement_day']}",
+        "",
+        f"The parties agree to a full and final bodily injury settlement of "
+        f"**{_fmt_amount(f['settlement_amount'])}**, signed on **{f['settlement_day']}**.",
+        "",
+        "---",
+        "",
+        "## Appendix — Structured Tables",
+        "",
+        "### Table 1 — Event Ledger",
+        "",
+        "| Date | Event | Document | Notes |",
+        "|------|-------|----------|-------|",
+        f"| {acc:%Y-%m-%d %H:%M} | Motor vehicle collision at {f['road']} and {f['cross_street']} | High-Resolution Incident Log | Struck parked {f['parked_vehicle']} |",
+        f"| {f['er_at']:%Y-%m-%d %H:%M} | Emergency Room visit at {f['hospital']} | Emergency Room Report | Diagnosis: {f['injury']} |",
+        f"| {f['fnol_day']} | Initial Loss Report (FNOL) finalized | Structured Intake Note | Created by {f['representative']} |",
+        f"| {f['adjuster_day']} | Field adjuster site visit and vehicle inspection | Adjuster Site Visit Report | Adjuster: {f['adjuster']} |",
+        f"| {physio_start} | First physiotherapy session | Physiotherapy Progress Report | {f['physio_center']}; pain level {first_pain}/10 |",
+        f"| {f['return_to_work']} | Return to part-time work | Work and Functional Capacity Note | {f['employer']} |",
+        f"| {physio_end} | Final physiotherapy session | Physiotherapy Progress Report | Session {len(sessions)}; pain {last_pain}/10 |",
+        f"| {f['settlement_day']} | Bodily injury claim settled | Settlement Email Thread | Final settlement agreement reached |",
+        "",
+        "### Table 2 — Expenses / Payments Ledger",
+        "",
+        "| Date | Item | Amount | Document | Notes |",
+        "|------|------|--------|----------|-------|",
+        f"| {f['adjuster_day']} | Vehicle repair estimate | {_fmt_amount(f['repair_estimate'])} | Adjuster Site Visit Report | Approved by adjuster {f['adjuster']} |",
+        f"| {f['adjuster_day']} | Deductible payment | {_fmt_amount(f['deductible'])} | Adjuster Site Visit Report | Applied to vehicle damage claim |",
+        f"| {f['settlement_day']} | Bodily injury settlement | {_fmt_amount(f['settlement_amount'])} | Settlement Email Thread | Full and final settlement agreement |",
+        f"| {physio_start} to {physio_end} | Physiotherapy treatment | {len(sessions)} sessions | Physiotherapy Progress Report | {f['physio_center']} |",
+        "",
+    ]
+    return "\n".join(lines)
+
+
+def build_test_cases(f: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """Ground-truth cases for one claim, mirroring src/eval/test_cases.json."""
+    cid = f["claim_id"]
+    she, _ = f["pronouns"]
+    accident = f["accident_at"].date()
+    days = (f["settlement_day"] - accident).days
+    refusal = (
+        f"Yes. {she.capitalize()} refused ambulance transport at the scene."
+        if f["refused_ambulance"] else
+        f"No. {she.capitalize()} was transported by ambulance."
+    )
+    cases = [
+        ("summary", "Give me a brief overview of the claim, including the main events and dates.",
+         f"Motor vehicle accident on {accident} in {f['city']}; ER visit at {f['hospital']}; "
+         f"physiotherapy from {f['sessions'][0][1]} to {f['sessions'][-1][1]}; return to part-time work on "
+         f"{f['return_to_work']}; settlement on {f['settlement_day']} for {_fmt_amount(f['settlement_amount'])}."),
+        ("needle", "On what date did the accident occur?", f"{accident}."),
+        ("needle", "Which hospital treated the insured after the accident?", f"{f['hospital']}."),
+        ("needle", "Did the insured refuse ambulance transport at the scene?", refusal),
+        ("needle", "On what date was the bodily injury claim settled?", f"{f['settlement_day']}."),
+        ("needle", "What amount was agreed as the bodily injury settlement?", f"{_fmt_amount(f['settlement_amount'])}."),
+        ("needle+tool", "How many days passed between the accident and the final settlement date?",
+         f"{days} days between {accident} and {f['settlement_day']}."),
+        ("needle", "On what date did the insured return to part-time work?", f"{f['return_to_work']}."),
+        ("table", "What was the amount of the vehicle repair estimate?", f"{_fmt_amount(f['repair_estimate'])}."),
+    ]
+    return [
+        {
+            "claim_id": cid,
+            "type": case_type,
+            "question": f"In claim {cid}: {question}",
+            "ground_truth": truth,
+        }
+        for case_type, question, truth in cases
+    ]
+
+
+def _claim_path(out_dir: Path, index: int) -> Path:
+    return out_dir / "claims" / f"{index // CLAIMS_PER_SHARD:04d}" / f"claim_{index:06d}.md"
+
+
+def _generate_range(job: Tuple[int, int, int, str, int]) -> List[Dict[str, Any]]:
+    seed, start, stop, out_dir, incident_events = job
+    out = Path(out_dir)
+    cases: List[Dict[str, Any]] = []
+    for index in range(start, stop):
+        # One RNG per claim: output does not depend on how work is split.
+        rng = random.Random(f"{seed}:{index}")
+        facts = _claim_facts(rng, index)
+        markdown = render_claim(facts, _incident_log(rng, facts, incident_events))
+        path = _claim_path(out, index)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(markdown, encoding="utf-8")
+        cases.extend(build_test_cases(facts))
+    return cases
+
+
+def generate_corpus(
+    count: int,
+    out_dir: Path,
+    seed: int = 0,
+    workers: int = 1,
+    incident_events: int = 20,
+) -> Tuple[List[Path], Path]:
+    """
+    Write ``count`` claims plus a combined test_cases.json under ``out_dir``.
+
+    Returns:
+        (paths of the generated markdown files, path of test_cases.json)
+    """
+    out_dir.mkdir(parents=True, exist_ok=True)
+    batch = max(1, min(CLAIMS_PER_SHARD, count // max(1, workers * 4) or 1))
+    jobs = [
+        (seed, start, min(count, start + batch), str(out_dir), incident_events)
+        for start in range(0, count, batch)
+    ]
+
+    tests_path = out_dir / "test_cases.json"
+    next_id = 1
+    with open(tests_path, "w", encoding="utf-8") as f:
+        f.write("[\n")
+        first = True
+        if workers > 1 and len(jobs) > 1:
+            with ProcessPoolExecutor(max_workers=workers) as pool:
+                batches = pool.map(_generate_range, jobs)
+                for cases in batches:
+                    next_id, first = _write_cases(f, cases, next_id, first)
+        else:
+            for job in jobs:
+                next_id, first = _write_cases(f, _generate_range(job), next_id, first)
+        f.write("\n]\n")
+
+    return [_claim_path(out_dir, i) for i in range(count)], tests_path
+
+
+def _write_cases(f, cases: List[Dict[str, Any]], next_id: int, first: bool) -> Tuple[int, bool]:
+    # Streamed so the test file for 100k claims never sits in memory at once.
+    for case in cases:
+        record = {"id": next_id, **case}
+        f.write(("" if first else ",\n") + "  " + json.dumps(record, ensure_ascii=False))
+        next_id += 1
+        first = False
+    return next_id, first
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--count", type=int, default=100, help="Number of claims to generate")
+    parser.add_argument("--out", type=Path, default=DEFAULT_OUT_DIR, help="Output directory")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument(
+        "--incident-events", type=int, default=20,
+        help="Filler entries per incident log (controls claim size)",
+    )
+    parser.add_argument("--pdf", action="store_true", help="Also render a PDF per claim")
+    args = parser.parse_args(argv)
+
+    start = time.perf_counter()
+    paths, tests_path = generate_corpus(
+        args.count, args.out, seed=args.seed, workers=args.workers,
+        incident_events=args.incident_events,
+    )
+    print(f"✓ Generated {len(paths)} claims in {time.perf_counter() - start:.2f}s under {args.out}")
+    print(f"✓ Test cases: {tests_path}")
+
+    if args.pdf:
+        sys.path.insert(0, str(Path(__file__).resolve().parent))
+        from ensure_claim_pdf import render_claims
+
+        start = time.perf_counter()
+        # Synthetic claims are not padded with the sample claim's appendices.
+        render_claims(paths, min_pages=1, workers=args.workers)
+        print(f"✓ Rendered {len(paths)} PDFs in {time.perf_counter() - start:.2f}s")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,76 @@
+#!/usr/bin/env python3
+"""
+Ingest a large claim directory with the parallel, resumable pipeline.
+
+Chunks the files in a process pool and embeds the leaves concurrently into
+the persistent embedding cache (see src/ingest.py). It then builds the
+indexes once, which writes the memory-mapped leaf matrix for this index
+version. An interrupted run picks up where it stopped: rerun the same
+command.
+
+Usage:
+    python scripts/ingest.py --dir data/synthetic --exts .md
+    python scripts/ingest.py --dir data/synthetic --exts .md --workers 16 --embed-workers 8 --rpm 3000
+"""
+
+import argparse
+import os
+import sys
+from pathlib import Path
+from typing import List, Optional
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(PROJECT_ROOT / "src"))
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--dir", type=Path, required=True, help="Claim directory (read recursively)")
+    parser.add_argument("--exts", default=".md,.pdf", help="File types to read (default: .md,.pdf)")
+    parser.add_argument("--workers", type=int, help="Chunking processes (INGEST_WORKERS)")
+    parser.add_argument("--embed-workers", type=int, help="Concurrent embedding requests (INGEST_EMBED_WORKERS)")
+    parser.add_argument("--batch", type=int, help="Texts per embedding request (INGEST_EMBED_BATCH)")
+    parser.add_argument("--rpm", type=int, help="Embedding requests per minute cap (INGEST_EMBED_RPM)")
+    parser.add_argument("--state-dir", type=Path, help="Shards, manifest and embedding cache (INGEST_DIR)")
+    args = parser.parse_args(argv)
+
+    os.environ.update({
+        "CLAIMS_DIR": str(args.dir.resolve()),
+        "CLAIMS_RECURSIVE": "1",
+        "CLAIMS_EXTS": args.exts,
+        "INGEST_PIPELINE": "1",
+    })
+    for name, value in (
+        ("INGEST_WORKERS", args.workers),
+        ("INGEST_EMBED_WORKERS", args.embed_workers),
+        ("INGEST_EMBED_BATCH", args.batch),
+        ("INGEST_EMBED_RPM", args.rpm),
+        ("INGEST_DIR", args.state_dir),
+    ):
+        if value is not None:
+            os.environ[name] = str(value)
+
+    from indexing import build_indexes
+    from startup import get_startup_timer
+
+    idx = build_indexes()
+    stats = idx["ingest_stats"]
+    print(
+        f"✓ {stats['files']} files: {stats['chunked']} chunked, {stats['reused']} resumed, "
+        f"{stats['failed']} failed"
+    )
+    print(
+        f"✓ {stats['leaves']} leaves: {stats['embedded_leaves']} through the embedding stage "
+        f"({stats['api_texts']} sent to the API, {stats['batches']} batches), "
+        f"{stats['skipped_leaves']} already embedded"
+    )
+    print(
+        f"✓ {stats['seconds']:.1f}s ({stats['chunk_seconds']:.1f}s until the last file was chunked), "
+        f"{stats['leaves_per_second']:.0f} leaves/s"
+    )
+    print(get_startup_timer().report())
+    return 1 if stats["failed"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
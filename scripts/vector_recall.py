@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+"""
+Measure the recall cost of float16 / int8 embedding storage.
+
+Loads a float32 leaf matrix written by the memory-mapped vector store and,
+for every storage type, reports the footprint and recall@k against exact
+float32 search. Queries are either the evaluation questions (embedded with
+the index's embedding model, needs OPENAI_API_KEY) or, by default, the
+leaves themselves with their own match left out (nearest-neighbour recall).
+
+Usage:
+    python scripts/vector_recall.py                      # newest float32 matrix
+    python scripts/vector_recall.py --version aeb3930a3ef98562 --k 6
+    python scripts/vector_recall.py --questions src/eval/test_cases.json
+"""
+
+import argparse
+import json
+import sys
+from pathlib import Path
+from typing import List, Optional
+
+import numpy as np
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(PROJECT_ROOT / "src"))
+
+from mmap_vector_store import DEFAULT_VECTOR_STORE_DIR, DTYPES, measure_recall  # noqa: E402
+
+
+def load_reference(directory: Path, version: Optional[str]) -> np.ndarray:
+    if version:
+        path = directory / f"{version}-float32.npy"
+    else:
+        candidates = sorted(directory.glob("*-float32.npy"), key=lambda p: p.stat().st_mtime)
+        if not candidates:
+            raise SystemExit(
+                f"No float32 matrix in {directory}; build the index once with VECTOR_DTYPE=float32"
+            )
+        path = candidates[-1]
+    print(f"Reference matrix: {path}")
+    return np.load(path)
+
+
+def embed_questions(path: Path) -> np.ndarray:
+    from dotenv import load_dotenv
+    from llama_index.embeddings.openai import OpenAIEmbedding
+
+    load_dotenv(PROJECT_ROOT / ".env")
+    with open(path, "r", encoding="utf-8") as f:
+        questions = [case["question"] for case in json.load(f)]
+    embed_model = OpenAIEmbedding(model="text-embedding-ada-002")
+    return np.asarray(embed_model.get_text_embedding_batch(questions), dtype=np.float32)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--dir", type=Path, default=DEFAULT_VECTOR_STORE_DIR, help="VECTOR_STORE_DIR")
+    parser.add_argument("--version", help="Index version (default: newest float32 matrix)")
+    parser.add_argument("--k", type=int, default=6, help="Recall@k (the retriever's max k)")
+    parser.add_argument("--queries", type=int, default=500, help="Leaves sampled as queries")
+    parser.add_argument("--questions", type=Path, help="Embed these test-case questions as queries")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+
+    reference = load_reference(args.dir, args.version).astype(np.float32)
+    if args.questions:
+        queries = embed_questions(args.questions)
+        exclude_self = False
+        query_label = f"{len(queries)} questions"
+    else:
+        rng = np.random.default_rng(args.seed)
+        picked = rng.choice(len(reference), size=min(args.queries, len(reference)), replace=False)
+        # measure_recall excludes row i for query i, so reorder the reference.
+        order = np.concatenate([picked, np.setdiff1d(np.arange(len(reference)), picked)])
+        reference = reference[order]
+        queries = reference[: len(picked)]
+        exclude_self = True
+        query_label = f"{len(queries)} leaves (self excluded)"
+
+    n, dim = reference.shape
+    print(f"{n} vectors x {dim} dims, recall@{args.k} over {query_label}\n")
+    print(f"{'dtype':<8} {'bytes/vec':>9} {'matrix MB':>9} {'recall':>7} {'max score err':>13}")
+    for dtype in DTYPES:
+        result = measure_recall(reference, queries, dtype, k=args.k, exclude_self=exclude_self)
+        megabytes = result["bytes_per_vector"] * n / 1e6
+        print(
+            f"{dtype:<8} {result['bytes_per_vector']:>9} {megabytes:>9.2f} "
+            f"{result['recall']:>7.4f} {result['max_score_error']:>13.5f}"
+        )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
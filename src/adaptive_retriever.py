@@ -0,0 +1,112 @@
+"""
+Adaptive top-k for the needle retriever.
+
+``AdaptiveAutoMergingRetriever`` fetches up to ``max_k`` leaves (the old
+fixed ``similarity_top_k``), then keeps only as many as the score
+distribution supports:
+
+- the candidate list is cut at the first score gap of at least
+  ``score_gap``, or where a score falls more than ``score_window`` below
+  the best one;
+- if that leaves a single atomic node (e.g. a ``table_row``) scoring at
+  least ``confident_score``, it is returned as is, skipping auto-merging;
+- otherwise the kept leaves go through the normal auto-merging passes.
+
+The decision for the most recent query (scores, chosen k, early exit,
+merges) is kept in ``last_trace`` and logged.
+"""
+
+import logging
+import threading
+from typing import Any, Dict, List, Optional
+
+from llama_index.core.indices.vector_store.retrievers.retriever import VectorIndexRetriever
+from llama_index.core.retrievers import AutoMergingRetriever
+from llama_index.core.schema import NodeWithScore, QueryBundle
+from llama_index.core.storage.storage_context import StorageContext
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MAX_K = 6
+DEFAULT_SCORE_GAP = 0.03
+DEFAULT_SCORE_WINDOW = 0.08
+DEFAULT_CONFIDENT_SCORE = 0.80
+ATOMIC_NODE_TYPES = ("table_row",)
+
+
+def choose_k(scores: List[float], score_gap: float, score_window: float, min_k: int = 1) -> int:
+    """Number of leading candidates to keep for descending ``scores``."""
+    if not scores:
+        return 0
+    for i in range(max(1, min_k), len(scores)):
+        if scores[i - 1] - scores[i] >= score_gap or scores[0] - scores[i] > score_window:
+            return i
+    return len(scores)
+
+
+class AdaptiveAutoMergingRetriever(AutoMergingRetriever):
+    """AutoMergingRetriever that picks k per query from the similarity scores."""
+
+    def __init__(
+        self,
+        vector_retriever: VectorIndexRetriever,
+        storage_context: StorageContext,
+        score_gap: float = DEFAULT_SCORE_GAP,
+        score_window: float = DEFAULT_SCORE_WINDOW,
+        confident_score: float = DEFAULT_CONFIDENT_SCORE,
+        min_k: int = 1,
+        **kwargs: Any,
+    ) -> None:
+        super().__init__(vector_retriever, storage_context, **kwargs)
+        self.score_gap = score_gap
+        self.score_window = score_window
+        self.confident_score = confident_score
+        self.min_k = min_k
+        self._local = threading.local()
+
+    @property
+    def last_trace(self) -> Optional[Dict[str, Any]]:
+        """Retrieval decision for the most recent query on this thread."""
+        return getattr(self._local, "trace", None)
+
+    def _retrieve(self, query_bundle: QueryBundle) -> List[NodeWithScore]:
+        candidates = self._vector_retriever.retrieve(query_bundle)
+        candidates.sort(key=lambda n: n.get_score(), reverse=True)
+        scores = [n.get_score() for n in candidates]
+        k = choose_k(scores, self.score_gap, self.score_window, self.min_k)
+        kept = candidates[:k]
+
+        trace: Dict[str, Any] = {
+            "candidates": len(candidates),
+            "scores": [round(s, 4) for s in scores],
+            "k": k,
+            "early_exit": False,
+            "merged": False,
+        }
+
+        top = kept[0] if kept else None
+        if (
+            k == 1
+            and top.node.metadata.get("node_type") in ATOMIC_NODE_TYPES
+            and top.get_score() >= self.confident_score
+        ):
+            # One clear, self-contained answer: merging would only add context.
+            trace["early_exit"] = True
+            nodes = kept
+        else:
+            nodes, is_changed = self._try_merging(kept)
+            trace["merged"] = is_changed
+            while is_changed:
+                nodes, is_changed = self._try_merging(nodes)
+            nodes.sort(key=lambda x: x.get_score(), reverse=True)
+
+        trace["returned"] = len(nodes)
+        self._local.trace = trace
+        logger.info(
+            "Adaptive retrieval: k=%d of %d (early_exit=%s, merged=%s)",
+            k,
+            len(candidates),
+            trace["early_exit"],
+            trace["merged"],
+        )
+        return nodes
@@ -1,17 +1,34 @@
 from typing import Any, Dict
 
+from profiling import profiled
+
 
 class ManagerAgent:
     """
     Simple router agent that decides whether a question should go to
     the SummarizationAgent or the NeedleAgent, based on heuristics.
+
+    With a ``QueryPlanner``, compound questions are split into sub-queries
+    that are answered concurrently and merged (``chosen_agent`` "planner").
+    With ``ClaimTimelines``, "what happened between", "first / last" and
+    ordering questions about one claim are answered from its timeline index,
+    with no LLM call (``chosen_agent`` "timeline"). With a ``Speculator``, questions whose
+    route is borderline run both agents and keep a well-grounded needle
+    answer, cancelling the summary.
     """
 
-    def __init__(self, summarization_agent, needle_agent):
+    def __init__(self, summarization_agent, needle_agent, planner=None, timeline=None, speculator=None):
         self.summarization_agent = summarization_agent
         self.needle_agent = needle_agent
+        self.planner = planner
+        self.timeline = timeline
+        self.speculator = speculator
+
+    def route(self, question: str) -> str:
+        """Agent for ``question``: "timeline", "summarization" or "needle"."""
+        if self.timeline is not None and self.timeline.parse(question) is not None:
+            return "timeline"
 
-    def _route(self, question: str) -> str:
         q = question.lower()
 
         # Heuristic: words strongly suggestive of summaries / timelines
@@ -35,8 +52,27 @@ class ManagerAgent:
         # Default route: needle agent
         return "needle"
 
+    @profiled("answer")
     def answer(self, question: str) -> Dict[str, Any]:
-        route = self._route(question)
+        if self.planner is not None:
+            plan = self.planner.plan(question, self)
+            if len(plan) > 1:
+                result = self.planner.execute(question, plan, self)
+                result["chosen_agent"] = "planner"
+                return result
+
+        route = self.route(question)
+
+        if route == "timeline":
+            result = self.timeline.answer(question)
+            if result is not None:
+                result["chosen_agent"] = route
+                return result
+            # An event the timeline cannot resolve: retrieve as usual.
+            route = "needle"
+
+        if self.speculator is not None and self.speculator.rules.is_borderline(question, route):
+            return self.speculator.answer(question, self, route)
 
         if route == "summarization":
             result = self.summarization_agent.answer(question)
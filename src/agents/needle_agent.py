@@ -1,8 +1,52 @@
+from __future__ import annotations
+
 import os
-from typing import Any, Dict, List
+import re
+import threading
+from typing import TYPE_CHECKING, Any, Dict, List, Optional, Tuple
+
+# LlamaIndex and the MCP client are imported on first use (the MCP client
+# only for interval questions), so importing the agent stays cheap.
+if TYPE_CHECKING:
+    from llama_index.core.query_engine import BaseQueryEngine  # pyright: ignore[reportMissingImports]
+    from llama_index.core.schema import NodeWithScore
+    from claims import ClaimTexts
+    from context_packer import ContextPacker
+    from provenance import ProvenanceIndex
+
+
+# "How many (business) days/weeks passed between X and Y?"
+_BETWEEN_RE = re.compile(
+    r"how many\s+(?P<unit>business days|working days|days|weeks)\b.*?\bbetween\s+"
+    r"(?P<start>.+?)\s+and\s+(?P<end>.+?)[?.!]*$",
+    re.IGNORECASE,
+)
+# "How long was it from X to/until Y?"
+_FROM_TO_RE = re.compile(
+    r"how long\b.*?\bfrom\s+(?P<start>.+?)\s+(?:to|until|till)\s+(?P<end>.+?)[?.!]*$",
+    re.IGNORECASE,
+)
+_UNIT_KEYS = {
+    "days": ("days", "days"),
+    "business days": ("business_days", "business days"),
+    "working days": ("business_days", "working days"),
+    "weeks": ("weeks", "weeks"),
+}
+
+
+def parse_interval_question(question: str) -> Optional[Dict[str, str]]:
+    """
+    Recognise "how many days between X and Y" style questions.
 
-from llama_index.core.query_engine import BaseQueryEngine  # pyright: ignore[reportMissingImports]
-from mcp_integration.client import compute_days_between_dates
+    Returns {"start", "end", "unit"} with the two event phrases, or None.
+    """
+    m = _BETWEEN_RE.search(question)
+    if m:
+        return {"start": m.group("start"), "end": m.group("end"), "unit": m.group("unit").lower()}
+    m = _FROM_TO_RE.search(question)
+    if m:
+        return {"start": m.group("start"), "end": m.group("end"), "unit": "days"}
+    return None
 
 
 class NeedleAgent:
@@ -10,73 +54,168 @@ class NeedleAgent:
     Agent specialized in precise, factual questions that require
     'needle-in-haystack' retrieval over fine-grained chunks.
 
-    It also knows how to call a date-difference tool for specific questions.
+    It also answers date-interval questions ("how many days between X and Y")
+    with the MCP date tools, which extract the event dates from the text of
+    the claim the question is about.
+
+    Retrieval and synthesis are separate steps (retrieve, pack the context,
+    synthesize), so a caller holding already-retrieved nodes, such as a
+    ``ConversationSession``, can skip the vector search.
     """
 
-    def __init__(self, query_engine: BaseQueryEngine):
+    def __init__(
+        self,
+        query_engine: BaseQueryEngine,
+        claim_texts: Optional[ClaimTexts] = None,
+        provenance: Optional[ProvenanceIndex] = None,
+        context_packer: Optional[ContextPacker] = None,
+    ):
         self.query_engine = query_engine
+        self.claim_texts = claim_texts
+        self.provenance = provenance
+        self.context_packer = context_packer
+        self._local = threading.local()
+
+    @property
+    def last_nodes(self) -> List[NodeWithScore]:
+        """Nodes retrieved (before packing) for the most recent answer on this thread."""
+        return getattr(self._local, "nodes", [])
+
+    def _event_text(self, question: str) -> Optional[str]:
+        """
+        Text of one claim file to extract dated events from, so both events
+        come from the same claim: the claim the question names, else the
+        file of the best retrieved node. Without claim texts, the retrieved
+        nodes of that file. None when no file can be chosen.
+        """
+        files = self.claim_texts.files_for(question) if self.claim_texts else []
+        if len(files) == 1:
+            return self.claim_texts.texts[files[0]]
+
+        from llama_index.core.schema import QueryBundle
+
+        nodes = self.query_engine.retrieve(QueryBundle(question))
+        node_files = [n.node.metadata.get("file_path") or n.node.metadata.get("source") for n in nodes]
+        if files:
+            best = next((f for f in node_files if f in files), None)
+            return self.claim_texts.texts[best] if best is not None else None
+        if not nodes:
+            return None
+        return "\n\n".join(
+            n.node.get_content(metadata_mode="none") for n, f in zip(nodes, node_files) if f == node_files[0]
+        )
 
     def _maybe_answer_with_date_tool(self, question: str) -> Dict[str, Any] | None:
         """
-        If the question clearly asks for the number of days between the accident
-        and the settlement, answer using the external date-diff tool.
+        If the question asks for the interval between two events, resolve both
+        events against the claim's dated events and compute the interval with
+        the date tool. Returns None (fall through to the LLM) if the question
+        does not match or either event cannot be found.
+        """
+        parsed = parse_interval_question(question)
+        if parsed is None:
+            return None
+
+        from mcp_integration.client import compute_event_interval
+
+        text = self._event_text(question)
+        if not text:
+            return None
+        result = compute_event_interval(text, parsed["start"], parsed["end"])
+        if not result.get("found"):
+            return None
+
+        key, unit_label = _UNIT_KEYS[parsed["unit"]]
+        # The tool's count is signed (negative when the end event comes
+        # first); the answer states the distance.
+        answer_text = (
+            f"There are {abs(result[key])} {unit_label} between {parsed['start']} "
+            f"({result['start_date']}) and {parsed['end']} ({result['end_date']})."
+        )
+
+        return {
+            "agent": "needle",
+            "question": question,
+            "answer": answer_text,
+            "sources": [
+                {
+                    "node_id": f"event:{event['date']}",
+                    "score": 1.0,
+                    "text": f"{event['date']} – {event['label']}",
+                }
+                for event in (result["start_event"], result["end_event"])
+            ],
+            "tool_used": "mcp_event_interval",
+        }
+
+    def _retrieve_and_synthesize(
+        self, question: str, context_nodes: Optional[List[NodeWithScore]]
+    ) -> Tuple[Any, List[NodeWithScore]]:
+        """(response, retrieved nodes); ``context_nodes`` replace retrieval when given."""
+        from llama_index.core.schema import QueryBundle
+
+        retriever = getattr(self.query_engine, "retriever", None)
+        if context_nodes is None and retriever is None:
+            response = self.query_engine.query(question)
+            return response, list(getattr(response, "source_nodes", []))
+
+        bundle = QueryBundle(question)
+        nodes = list(context_nodes) if context_nodes is not None else retriever.retrieve(bundle)
+        # The packer is the engine's node postprocessor; apply it here since
+        # synthesize() alone does not.
+        packed = self.context_packer.postprocess_nodes(nodes, query_bundle=bundle) if self.context_packer else nodes
+        return self.query_engine.synthesize(bundle, packed), nodes
+
+    def answer(self, question: str, context_nodes: Optional[List[NodeWithScore]] = None) -> Dict[str, Any]:
+        """
+        Answer ``question``. With ``context_nodes``, answer from those nodes
+        (packed as usual) instead of retrieving, and skip the date tool.
         """
-        q_lower = question.lower()
-
-        if "how many days" in q_lower and "accident" in q_lower and "settlement" in q_lower:
-            # In a fuller system we'd parse these dates from retrieved context.
-            # For the midterm, we use the canonical dates from the synthetic claim.
-            start_date = "2024-01-03"  # accident
-            end_date = "2024-05-20"    # settlement
-
-            days = compute_days_between_dates(start_date, end_date)
-
-            answer_text = (
-                f"There are {days} days between the accident ({start_date}) "
-                f"and the final settlement date ({end_date})."
-            )
-
-            return {
-                "agent": "needle",
-                "question": question,
-                "answer": answer_text,
-                "sources": [
-                    {"node_id": "accident_date", "score": 1.0},
-                    {"node_id": "settlement_date", "score": 1.0},
-                ],
-                "tool_used": "mcp_date_diff",
-            }
-
-        return None
-
-    def answer(self, question: str) -> Dict[str, Any]:
         q = question.strip()
+        self._local.nodes = []
 
         # 1. First check if this is a date-difference question we handle via the tool
-        tool_result = self._maybe_answer_with_date_tool(q)
-        if tool_result is not None:
-            return tool_result
+        if context_nodes is None:
+            tool_result = self._maybe_answer_with_date_tool(q)
+            if tool_result is not None:
+                return tool_result
 
         # 2. Otherwise, fall back to normal retrieval + LLM answer
-        response = self.query_engine.query(q)
+        response, retrieved = self._retrieve_and_synthesize(q, context_nodes)
+        self._local.nodes = retrieved
 
         sources: List[Dict[str, Any]] = []
+        spans: List[Dict[str, Any]] = []
         for sn in getattr(response, "source_nodes", [])[:5]:
             try:
                 node = sn.node
-                sources.append(
-                    {
-                        "node_id": sn.node_id,
-                        "score": sn.score,
-                        # We'll keep text short for now; later useful for evaluation.
-                        "text": node.get_content(metadata_mode="none")[:500],
-                    }
-                )
+                source = {
+                    "node_id": sn.node_id,
+                    "score": sn.score,
+                    # We'll keep text short for now; later useful for evaluation.
+                    "text": node.get_content(metadata_mode="none")[:500],
+                }
             except AttributeError:
-                pass
+                continue
+            # Exact location in the source file: file, doc_index, start, end, section_path.
+            span = self.provenance.source_span(node) if self.provenance else None
+            if span is not None:
+                source.update(span)
+                spans.append(span)
+            sources.append(source)
+
+        # Adaptive retrieval records how many leaves it kept for this query.
+        trace = None
+        if context_nodes is None:
+            trace = getattr(getattr(self.query_engine, "retriever", None), "last_trace", None)
 
         # Debug mode: print top 3 source nodes with metadata
         if os.getenv("DEBUG_SOURCES") == "1":
+            if trace is not None:
+                print(
+                    f"\n[DEBUG] Retrieval: k={trace['k']} of {trace['candidates']} | "
+                    f"early_exit={trace['early_exit']} | merged={trace['merged']} | scores={trace['scores']}"
+                )
             print("\n[DEBUG] Top 3 source nodes:")
             for i, sn in enumerate(getattr(response, "source_nodes", [])[:3], 1):
                 try:
@@ -91,9 +230,18 @@ class NeedleAgent:
                 except Exception:
                     print(f"  {i}. [error reading node]")
 
-        return {
+        result = {
             "agent": "needle",
             "question": q,
             "answer": str(response),
             "sources": sources,
+            # Source sentences supporting the answer, with exact offsets.
+            "highlights": self.provenance.align(str(response), spans) if self.provenance else [],
         }
+        if trace is not None:
+            result["retrieval"] = trace
+        report = self.context_packer.last_report if self.context_packer else None
+        if report is not None:
+            result["context_tokens"] = report["tokens_out"]
+            result["context_tokens_saved"] = report["tokens_saved"]
+        return result
@@ -0,0 +1,322 @@
+"""
+Query decomposition for compound questions.
+
+"When did she go to the ER, which hospital was it, and how long until
+settlement?" asks for three facts. A single needle retrieval rarely covers
+all of them, so the answer comes back incomplete. ``QueryPlanner`` works in
+the manager layer:
+
+1. ``plan`` splits the question at clause boundaries that start a new
+   question ("..., which ...", "... and how long ...", "?", ";"). Each clause
+   becomes a ``SubQuery`` routed to:
+
+   - ``interval``: the needle agent's date tool ("how long until settlement"
+     gets the previous clause's event as its start);
+   - ``fact``: the claim's ledger tables, for "when" / "how much" clauses
+     that match a ledger row (no retrieval and no LLM call). Only the rows
+     of the claim the question names (or the only claim loaded) are used;
+   - ``timeline``, ``summarization`` or ``needle``: the manager's usual
+     routing.
+
+   A clause that refers back ("which hospital was it") gets the previous
+   clause appended as context, and every clause keeps the question's
+   "In claim X:" prefix.
+2. ``execute`` runs the sub-queries concurrently, so the latency is about
+   that of the slowest one. It then merges their answers in one short LLM
+   synthesis.
+
+A question with a single clause is not a plan: the manager answers it as
+before. ``QUERY_PLANNING=0`` turns the planner off.
+"""
+
+import contextvars
+import os
+import re
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, NamedTuple, Optional
+
+from agents.needle_agent import parse_interval_question
+from claims import ClaimTexts, claim_prefix, strip_claim_prefix
+
+
+DEFAULT_MAX_SUB_QUERIES = 4
+# Share of a clause's event words a ledger row must contain to answer it.
+DEFAULT_MIN_FACT_COVERAGE = 0.5
+
+_QUESTION_WORD = r"(?:when|where|which|who|whom|what|how|why)\b"
+# Boundaries that start a new question: "?" / ";" anywhere, a comma or
+# "and" only when a question word follows.
+_BOUNDARY_RE = re.compile(
+    rf"\?\s+(?:and\s+)?|;\s*(?:and\s+)?|,\s*(?:and\s+)?(?={_QUESTION_WORD})|\s+and\s+(?={_QUESTION_WORD})",
+    re.IGNORECASE,
+)
+_BETWEEN_RE = re.compile(r"\bbetween\b", re.IGNORECASE)
+_BACK_REFERENCE_RE = re.compile(r"\b(it|that|this|there|then|those|them)\b", re.IGNORECASE)
+# "how long until settlement" (no start event of its own).
+_HOW_LONG_UNTIL_RE = re.compile(
+    r"^how long\b.*?\b(?:until|till|to|before)\s+(?P<end>.+?)[?.!]*$", re.IGNORECASE
+)
+# The question framing around a clause's event: "When did she | go to the ER".
+_FRAMING_RE = re.compile(
+    r"^(?:when|on what (?:date|day)|what (?:date|day)|how much)\b\s*"
+    r"(?:(?:did|was|were|is|are|does|do|has|had|money|it)\s+)*"
+    r"(?:(?:she|he|they|the insured|the claimant|the insurer)\s+)?",
+    re.IGNORECASE,
+)
+_DATE_QUESTION_RE = re.compile(r"^(?:when|on what (?:date|day)|what (?:date|day))\b", re.IGNORECASE)
+_AMOUNT_QUESTION_RE = re.compile(r"\b(?:how much|amount|cost|paid|payment)\b", re.IGNORECASE)
+# An Amount cell that is money ("NIS 18,400", "$250.00", "1,800"), not a
+# count ("10 sessions") or a placeholder ("N/A").
+_MONEY_RE = re.compile(
+    r"^(?:(?:NIS|ILS|USD|EUR)\s?|[$€₪]\s?)?\d[\d,]*(?:\.\d+)?(?:\s?(?:NIS|ILS|USD|EUR|shekels|dollars))?$",
+    re.IGNORECASE,
+)
+
+SYNTHESIS_PROMPT = (
+    "A question was split into parts that were answered separately. Combine the "
+    "answers into one short answer to the original question (at most three "
+    "sentences). Keep every date, name and amount exactly as given and add no "
+    "facts of your own. If a part could not be answered, say so briefly.\n\n"
+    "Question: {question}\n\n{parts}\n\nAnswer:"
+)
+
+
+class SubQuery(NamedTuple):
+    """One clause of a compound question and the agent or tool that answers it."""
+
+    question: str
+    route: str  # "needle", "summarization", "timeline", "interval" or "fact"
+
+
+def event_phrase(clause: str) -> str:
+    """
+    The event a "when" / "how much" clause asks about: "When did she go to
+    the ER?" -> "go to the ER". Empty for other clauses.
+    """
+    clause = clause.strip().rstrip("?.! ")
+    m = _FRAMING_RE.match(clause)
+    return clause[m.end():].strip() if m else ""
+
+
+class FactTable:
+    """
+    Rows of the claim's markdown ledger tables (Date plus Event or Item), for
+    answering "when" and "how much" clauses without retrieval.
+    """
+
+    def __init__(self, rows: List[Dict[str, str]], min_coverage: float = DEFAULT_MIN_FACT_COVERAGE):
+        self.rows = rows
+        self.min_coverage = min_coverage
+
+    @classmethod
+    def from_text(cls, text: Optional[str], **kwargs: Any) -> "FactTable":
+        from markdown_tree import parse_markdown
+
+        rows: List[Dict[str, str]] = []
+        for _, table in parse_markdown(text or "").iter_tables():
+            if "Date" not in table.headers:
+                continue
+            for i, row in enumerate(table.row_dicts()):
+                label = row.get("Event") or row.get("Item")
+                if label:
+                    rows.append({**row, "_label": label, "_id": f"fact:{table.name}:{i}"})
+        return cls(rows, **kwargs)
+
+    def _best_row(self, phrase: str, rows: List[Dict[str, str]]) -> Optional[Dict[str, str]]:
+        from mcp_integration.date_tools import find_event, term_coverage
+
+        # Match on the row's label and notes (the hospital, the insurer, ...).
+        events = [
+            {"date": row["Date"], "label": f"{row['_label']} {row.get('Notes', '')}", "kind": "ledger", "row": i}
+            for i, row in enumerate(rows)
+        ]
+        event = find_event(events, phrase)
+        if event is None or term_coverage(event["label"], phrase) < self.min_coverage:
+            return None
+        return rows[event["row"]]
+
+    def lookup(self, question: str) -> Optional[Dict[str, Any]]:
+        """An answer dict for a "when" / "how much" question a ledger row answers, else None."""
+        phrase = event_phrase(question)
+        if not phrase:
+            return None
+        if _AMOUNT_QUESTION_RE.search(question):
+            rows = [r for r in self.rows if _MONEY_RE.match(r.get("Amount", "").strip())]
+            row = self._best_row(phrase, rows)
+            answer = f"{row['_label']}: {row['Amount']} ({row['Date']})." if row else None
+        elif _DATE_QUESTION_RE.match(question.strip()):
+            row = self._best_row(phrase, self.rows)
+            answer = f"{row['_label']}: {row['Date']}." if row else None
+        else:
+            return None
+        if row is None:
+            return None
+        text = ", ".join(f"{k}: {v}" for k, v in row.items() if not k.startswith("_"))
+        return {
+            "agent": "fact",
+            "question": question,
+            "answer": answer,
+            "sources": [{"node_id": row["_id"], "score": 1.0, "text": text}],
+            "tool_used": "fact_table",
+        }
+
+
+class ClaimFacts:
+    """
+    One ``FactTable`` per claim (the files of one claim share it), so a
+    clause is answered from the ledger rows of the claim it is about: the
+    one it names, or the only one loaded. None when that is ambiguous.
+    """
+
+    def __init__(self, tables: Dict[str, FactTable], claims: ClaimTexts):
+        self.tables = tables
+        self.claims = claims
+
+    @classmethod
+    def from_claims(cls, claims: ClaimTexts, **kwargs: Any) -> "ClaimFacts":
+        texts: Dict[str, List[str]] = {}
+        for file, text in claims.texts.items():
+            texts.setdefault(claims.claim_of[file], []).append(text)
+        return cls({claim: FactTable.from_text("\n\n".join(t), **kwargs) for claim, t in texts.items()}, claims)
+
+    def lookup(self, question: str) -> Optional[Dict[str, Any]]:
+        claim = self.claims.claim_for(question)
+        table = self.tables.get(claim) if claim is not None else None
+        if table is None:
+            return None
+        result = table.lookup(strip_claim_prefix(question))
+        if result is not None:
+            result["question"] = question
+        return result
+
+
+class QueryPlanner:
+    """
+    Splits compound questions into sub-queries and answers them concurrently.
+
+    Args:
+        fact_table: Ledger rows per claim for "when" / "how much" clauses (None: no fact route).
+        llm: LLM for the merged answer; defaults to ``Settings.llm``.
+        max_sub_queries: Clauses beyond this many are not split off.
+    """
+
+    def __init__(
+        self,
+        fact_table: Optional[ClaimFacts] = None,
+        llm: Any = None,
+        max_sub_queries: int = DEFAULT_MAX_SUB_QUERIES,
+    ):
+        self.fact_table = fact_table
+        self._llm = llm
+        self.max_sub_queries = max_sub_queries
+
+    def split(self, question: str) -> List[str]:
+        """The question's clauses, each as a standalone question."""
+        clauses: List[str] = []
+        last = 0
+        text = question.strip()
+        for m in _BOUNDARY_RE.finditer(text):
+            clause = text[last:m.start()]
+            # "between X and when ..." belongs to the interval clause.
+            if m.group().strip().lower() == "and" and _BETWEEN_RE.search(clause):
+                continue
+            clauses.append(clause)
+            last = m.end()
+            if len(clauses) == self.max_sub_queries - 1:
+                break
+        clauses.append(text[last:])
+        clauses = [c.strip(" ,;?.!") for c in clauses]
+        if len(clauses) < 2 or any(len(c.split()) < 2 for c in clauses):
+            return [text]
+        return [c[:1].upper() + c[1:] + "?" for c in clauses]
+
+    def plan(self, question: str, manager: Any) -> List[SubQuery]:
+        """Sub-queries of ``question`` (a single one when it is not compound)."""
+        # Split after the "In claim X:" prefix and give it to every clause,
+        # so each sub-query stays within the claim.
+        prefix = claim_prefix(question.strip())
+        clauses = self.split(question.strip()[len(prefix):])
+        if len(clauses) == 1:
+            question = question.strip()
+            return [SubQuery(question, manager.route(question))]
+
+        plan: List[SubQuery] = []
+        for i, clause in enumerate(clauses):
+            previous = clauses[i - 1] if i else None
+            until = _HOW_LONG_UNTIL_RE.match(clause)
+            if until and parse_interval_question(clause) is None:
+                # Start from the latest earlier clause that names an event.
+                start = next((event_phrase(c) for c in reversed(clauses[:i]) if event_phrase(c)), "")
+                if start:
+                    clause = f"How many days between {start} and {until.group('end')}?"
+            if parse_interval_question(clause) is not None:
+                plan.append(SubQuery(prefix + clause, "interval"))
+                continue
+            if self.fact_table is not None and self.fact_table.lookup(prefix + clause) is not None:
+                plan.append(SubQuery(prefix + clause, "fact"))
+                continue
+            if previous and _BACK_REFERENCE_RE.search(clause):
+                clause = f"{clause} (context: {previous})"
+            plan.append(SubQuery(prefix + clause, manager.route(prefix + clause)))
+        return plan
+
+    def _answer(self, sub: SubQuery, manager: Any) -> Dict[str, Any]:
+        start = time.perf_counter()
+        if sub.route == "fact":
+            result = self.fact_table.lookup(sub.question)
+        elif sub.route == "timeline":
+            # None when an event cannot be resolved: retrieve instead.
+            result = manager.timeline.answer(sub.question) or manager.needle_agent.answer(sub.question)
+        elif sub.route == "summarization":
+            result = manager.summarization_agent.answer(sub.question)
+        else:
+            result = manager.needle_agent.answer(sub.question)
+        result["ms"] = round((time.perf_counter() - start) * 1000.0, 1)
+        return result
+
+    def _synthesize(self, question: str, results: List[Dict[str, Any]]) -> str:
+        parts = "\n".join(
+            f"Part {i}: {r['question']}\nAnswer {i}: {r['answer']}" for i, r in enumerate(results, 1)
+        )
+        llm = self._llm
+        if llm is None:
+            from llama_index.core import Settings
+
+            llm = Settings.llm
+        return str(llm.complete(SYNTHESIS_PROMPT.format(question=question, parts=parts))).strip()
+
+    def execute(self, question: str, plan: List[SubQuery], manager: Any) -> Dict[str, Any]:
+        """Answer the sub-queries concurrently and merge them into one result."""
+        # Each task runs in a copy of the caller's context, so per-case
+        # tracking (eval's CaseTracker) still sees the sub-queries' calls.
+        with ThreadPoolExecutor(max_workers=len(plan), thread_name_prefix="subquery") as pool:
+            futures = [
+                pool.submit(contextvars.copy_context().run, self._answer, sub, manager)
+                for sub in plan
+            ]
+            results = [f.result() for f in futures]
+
+        sources: List[Dict[str, Any]] = []
+        highlights: List[Dict[str, Any]] = []
+        for result in results:
+            sources.extend(result.get("sources", []))
+            highlights.extend(result.get("highlights", []))
+        return {
+            "agent": "planner",
+            "question": question,
+            "answer": self._synthesize(question, results),
+            "sources": sources,
+            "highlights": highlights,
+            "sub_queries": [
+                {"question": sub.question, "route": sub.route, "answer": r["answer"], "ms": r["ms"]}
+                for sub, r in zip(plan, results)
+            ],
+        }
+
+
+def build_planner(claim_texts: Optional[ClaimTexts]) -> Optional[QueryPlanner]:
+    """Planner over each claim's ledger tables, or None when QUERY_PLANNING=0."""
+    if os.getenv("QUERY_PLANNING", "1") == "0":
+        return None
+    return QueryPlanner(ClaimFacts.from_claims(claim_texts) if claim_texts else None)
@@ -0,0 +1,251 @@
+"""
+Multi-turn conversations on top of ``ManagerAgent``.
+
+``ManagerAgent.answer`` treats every question on its own, so a follow-up
+such as "and how much was paid for it?" is retrieved from scratch, without
+knowing what "it" is. ``ConversationSession`` keeps a short memory of the
+conversation:
+
+- the nodes retrieved for the last few needle turns (before context
+  packing), most recent first;
+- entities resolved from earlier questions and answers: dates, amounts and
+  names (capitalized phrases such as a hospital or an insurer);
+- each turn's standalone question.
+
+For each new question it:
+
+1. detects a follow-up (a leading "and" / "what about", or pronouns such as
+   it / that / they / then / there) and rewrites it into a standalone
+   query. "then" / "that day" become the last date, "that amount" the last
+   amount and "there" the last name. Any other reference gets the previous
+   question (with its own references resolved) appended as context. The
+   rewrite is rule based, so it costs no LLM call;
+2. for a needle follow-up whose content words all occur in the kept nodes,
+   answers from those nodes with no query embedding and no vector search;
+3. otherwise asks the manager as usual and keeps the newly retrieved nodes.
+
+Results are the manager's, plus ``standalone_question``, ``follow_up``,
+``context_reused`` and ``turn``.
+"""
+
+import re
+from collections import deque
+from typing import Any, Deque, Dict, List, Tuple
+
+from agents.needle_agent import parse_interval_question
+
+
+DEFAULT_MAX_TURNS = 6
+# Needle turns whose retrieved nodes are kept for reuse, and a cap on them.
+DEFAULT_CONTEXT_TURNS = 2
+DEFAULT_MAX_NODES = 12
+# Share of a follow-up's content words that must occur in the kept nodes.
+DEFAULT_MIN_COVERAGE = 1.0
+
+_LEADING_RE = re.compile(r"^\s*(?:and|also|so|ok(?:ay)?|then)\b[\s,]*", re.IGNORECASE)
+_WHAT_ABOUT_RE = re.compile(r"^\s*(?:and\s+)?(?:what|how)\s+about\b", re.IGNORECASE)
+# "there" as a place, not "is there" / "there was".
+_PLACE_REF = r"(?<!\bis )(?<!\bare )(?<!\bwas )(?<!\bwere )\bthere\b(?!\s+(?:is|are|was|were|been|be)\b)"
+# Demonstratives only as pronouns ("was that covered?", "why did that
+# happen?"); followed by a noun ("this claim") they are not references to an
+# earlier turn. A following verb is approximated by auxiliaries and -ed forms.
+_VERB_AFTER = r"(?:is|are|was|were|be|been|has|have|had|does|did|do|cost|mean|happen\w*|\w+ed)\b"
+_REFERENCE_RE = re.compile(
+    r"\b(?:it|its|they|them|their|he|she|him|his|her|then)\b"
+    r"|\b(?:that|this|those|these)\b(?!\s+(?!" + _VERB_AFTER + r")\w)"
+    r"|" + _PLACE_REF,
+    re.IGNORECASE,
+)
+_DATE_REF_RE = re.compile(r"\b(?:(?:on|at)\s+)?(?:that (?:day|date|time)|then)\b", re.IGNORECASE)
+_AMOUNT_REF_RE = re.compile(r"\bthat (?:amount|sum|payment|figure)\b", re.IGNORECASE)
+_PLACE_REF_RE = re.compile(_PLACE_REF, re.IGNORECASE)
+
+_DATE_RE = re.compile(
+    r"\b\d{4}-\d{2}-\d{2}\b"
+    r"|\b(?:Jan|Feb|Mar|Apr|May|Jun|Jul|Aug|Sep|Sept|Oct|Nov|Dec)[a-z]*\.? \d{1,2},? \d{4}\b"
+    r"|\b\d{1,2} (?:Jan|Feb|Mar|Apr|May|Jun|Jul|Aug|Sep|Sept|Oct|Nov|Dec)[a-z]* \d{4}\b"
+)
+_AMOUNT_RE = re.compile(
+    r"(?:\b(?:NIS|ILS|USD|EUR)|[$€₪])\s?\d[\d,]*(?:\.\d+)?\b"
+    r"|\b\d[\d,]*(?:\.\d+)?\s?(?:NIS|ILS|USD|EUR|shekels|dollars)\b",
+    re.IGNORECASE,
+)
+_NAME_RE = re.compile(r"\b[A-Z][a-z]+(?:\s+(?:[A-Z][a-z]+|of|de|la))*\s+[A-Z][a-z]+\b")
+_WORD_RE = re.compile(r"[a-z0-9]+")
+
+_STOPWORDS = frozenset(
+    "a an the and or but of to in on at for from by with about as is are was were be been being "
+    "do does did done has have had what which who whom whose when where why how much many long "
+    "it its that this those these they them their he she him his her then there "
+    "i we you me my our your any some all also so ok okay please tell give show "
+    "after before during between again more other same".split()
+)
+
+
+def content_words(text: str) -> List[str]:
+    """Lowercased words of ``text`` that carry meaning (no stopwords or pronouns)."""
+    return [w for w in _WORD_RE.findall(text.lower()) if w not in _STOPWORDS]
+
+
+def extract_entities(text: str) -> Dict[str, List[str]]:
+    """Dates, amounts and capitalized names mentioned in ``text``, in order."""
+    return {
+        "dates": _DATE_RE.findall(text),
+        "amounts": [m.group().strip() for m in _AMOUNT_RE.finditer(text)],
+        "names": _NAME_RE.findall(text),
+    }
+
+
+class ConversationSession:
+    """
+    Stateful question answering over a ``ManagerAgent``.
+
+    Args:
+        manager: The router with its summarization and needle agents.
+        max_turns: Turns remembered for rewriting.
+        context_turns: Needle turns whose retrieved nodes are kept for reuse.
+        max_nodes: Cap on the kept nodes.
+        min_coverage: Share of a follow-up's content words the kept nodes
+            must contain to be reused (1.0: all of them).
+    """
+
+    def __init__(
+        self,
+        manager: Any,
+        max_turns: int = DEFAULT_MAX_TURNS,
+        context_turns: int = DEFAULT_CONTEXT_TURNS,
+        max_nodes: int = DEFAULT_MAX_NODES,
+        min_coverage: float = DEFAULT_MIN_COVERAGE,
+    ):
+        self.manager = manager
+        self.max_nodes = max_nodes
+        self.min_coverage = min_coverage
+        self.turns: Deque[Dict[str, Any]] = deque(maxlen=max_turns)
+        self._node_turns: Deque[List[Any]] = deque(maxlen=context_turns)
+        self.entities: Dict[str, List[str]] = {"dates": [], "amounts": [], "names": []}
+        self.stats = {"turns": 0, "follow_ups": 0, "context_reused": 0}
+
+    def reset(self) -> None:
+        """Forget the conversation (e.g. when the adjuster switches claims)."""
+        self.turns.clear()
+        self._node_turns.clear()
+        self.entities = {"dates": [], "amounts": [], "names": []}
+
+    # Rewriting ------------------------------------------------------------
+
+    def is_follow_up(self, question: str) -> bool:
+        if not self.turns:
+            return False
+        return bool(
+            _LEADING_RE.match(question)
+            or _WHAT_ABOUT_RE.match(question)
+            or _REFERENCE_RE.search(question)
+            or _DATE_REF_RE.search(question)
+            or _AMOUNT_REF_RE.search(question)
+        )
+
+    def _rewrite(self, question: str) -> Tuple[str, str]:
+        """(standalone question, its core without the appended context)."""
+        q = question.strip()
+        if not self.is_follow_up(q):
+            return q, q
+        # The previous core, not its standalone form, so appended context
+        # does not pile up over a chain of follow-ups.
+        previous = self.turns[-1]["core"]
+
+        about = _WHAT_ABOUT_RE.match(q)
+        if about:
+            # "what about the property damage?" -> previous question, new subject.
+            subject = q[about.end():].strip(" ?.!")
+            core = f"{previous.rstrip(' ?.!')}, regarding {subject}?"
+            return core, core
+
+        q = _LEADING_RE.sub("", q, count=1)
+        q = q[:1].upper() + q[1:]
+        if self.entities["dates"]:
+            q = _DATE_REF_RE.sub(f"on {self.entities['dates'][0]}", q)
+        if self.entities["amounts"]:
+            q = _AMOUNT_REF_RE.sub(self.entities["amounts"][0], q)
+        if self.entities["names"]:
+            q = _PLACE_REF_RE.sub(f"at {self.entities['names'][0]}", q)
+        if _REFERENCE_RE.search(q):
+            return f"{q.rstrip()} (context: {previous})", q
+        return q, q
+
+    def rewrite(self, question: str) -> str:
+        """Standalone form of ``question`` given the conversation so far."""
+        return self._rewrite(question)[0]
+
+    # Context reuse --------------------------------------------------------
+
+    def kept_nodes(self) -> List[Any]:
+        """Nodes of the most recent needle turns, newest first, without duplicates."""
+        nodes, seen = [], set()
+        for turn_nodes in reversed(self._node_turns):
+            for nws in turn_nodes:
+                if nws.node.node_id not in seen:
+                    seen.add(nws.node.node_id)
+                    nodes.append(nws)
+        return nodes[: self.max_nodes]
+
+    def coverage(self, question: str, nodes: List[Any]) -> float:
+        """Share of the content words of ``question`` found in ``nodes``."""
+        words = set(content_words(question))
+        if not words or not nodes:
+            return 0.0
+        text_words = set()
+        for nws in nodes:
+            text_words.update(_WORD_RE.findall(nws.node.get_content(metadata_mode="none").lower()))
+        return len(words & text_words) / len(words)
+
+    # Turns ----------------------------------------------------------------
+
+    def ask(self, question: str) -> Dict[str, Any]:
+        """Answer ``question`` in the context of the conversation."""
+        follow_up = self.is_follow_up(question)
+        standalone, core = self._rewrite(question)
+        route = self.manager.route(standalone)
+
+        reused = False
+        kept = self.kept_nodes()
+        if (
+            follow_up
+            and route == "needle"
+            and kept
+            and parse_interval_question(standalone) is None
+            # Coverage of the follow-up's own words: the appended context
+            # comes from earlier turns and is covered by construction.
+            and self.coverage(question, kept) >= self.min_coverage
+        ):
+            result = self.manager.needle_agent.answer(standalone, context_nodes=kept)
+            result["chosen_agent"] = "needle"
+            reused = True
+        else:
+            result = self.manager.answer(standalone)
+
+        if result.get("chosen_agent") == "needle" and not reused:
+            retrieved = self.manager.needle_agent.last_nodes
+            if retrieved:
+                self._node_turns.append(list(retrieved))
+
+        # Newest entities first: the question's, then the answer's.
+        found = extract_entities(standalone + "\n" + result.get("answer", ""))
+        for kind, values in found.items():
+            merged = list(dict.fromkeys(reversed(values)))
+            self.entities[kind] = (merged + [v for v in self.entities[kind] if v not in merged])[:10]
+
+        self.stats["turns"] += 1
+        self.stats["follow_ups"] += int(follow_up)
+        self.stats["context_reused"] += int(reused)
+        self.turns.append({
+            "question": question,
+            "standalone_question": standalone,
+            "core": core,
+            "answer": result.get("answer"),
+        })
+
+        result["standalone_question"] = standalone
+        result["follow_up"] = follow_up
+        result["context_reused"] = reused
+        result["turn"] = self.stats["turns"]
+        return result
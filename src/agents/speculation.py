@@ -0,0 +1,283 @@
+"""
+Speculative execution of the needle and summarization paths.
+
+The manager's keyword routing is unsure about some questions: "what
+happened at the hospital?" reads like a summary but usually has one precise
+answer, and "give an overview of the payments, how much was paid?" is the
+reverse. For these borderline questions, ``Speculator.answer``:
+
+1. starts the slow summarization agent on a worker thread;
+2. answers with the fast needle agent on the calling thread;
+3. if the needle answer is well grounded, returns it and cancels the
+   summarizer, else waits for the summary.
+
+Cancellation is cooperative. A Python thread cannot be interrupted in the
+middle of an HTTP request, so the summarizer's context carries a
+``CancelToken``, and a callback handler on the shared callback manager
+raises ``Cancelled`` when a cancelled call starts its next event (the next
+LLM call, retrieval or synthesis step). A tree summary over many chunks stops
+after at most the LLM call that is in flight, and its result is discarded.
+The handler runs first and raises only when an event starts, so the other
+handlers (eval's ``CaseTracker``) never see an event without its end.
+
+``SpeculationRules`` configures what counts as borderline and as well
+grounded. ``stats()`` reports how often speculation ran, how often the
+needle answer won and how many summarizer calls were cut short.
+``SPECULATION=0`` routes every question the usual way.
+"""
+
+from __future__ import annotations
+
+import contextvars
+import os
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import TYPE_CHECKING, Any, Callable, Dict, NamedTuple, Optional, Sequence, Tuple
+
+# LlamaIndex is imported when the first ``Speculator`` is built.
+if TYPE_CHECKING:
+    from llama_index.core.callbacks import CBEventType
+    from llama_index.core.callbacks.base_handler import BaseCallbackHandler
+
+
+DEFAULT_MIN_SOURCE_SCORE = 0.75
+
+# Broad wording that the keyword router sends to the needle agent, although
+# the question may want a summary.
+DEFAULT_BORDERLINE_PATTERNS = (
+    r"\bwhat happened\b",
+    r"\bdescribe\b",
+    r"\bexplain\b",
+    r"\bhow did\b.*\b(?:go|progress|develop|evolve|end)\b",
+    r"\b(?:progress|history|course|status|outcome)\b",
+)
+# Precise asks inside a summary-worded question.
+DEFAULT_PRECISE_PATTERNS = (
+    r"\bhow (?:much|many)\b",
+    r"\b(?:which|who|what date|when)\b",
+    r"\d",
+)
+# Needle answers that do not actually answer.
+DEFAULT_REFUSAL_PATTERNS = (
+    r"\bnot (?:mentioned|specified|provided|available|stated)\b",
+    r"\bno (?:information|mention|details?)\b",
+    r"\bdoes(?: not|n't) (?:mention|specify|provide|contain|say)\b",
+    r"\b(?:cannot|can't|unable to) (?:be )?(?:determine|find|answer)",
+    r"\bi don't know\b",
+)
+
+# Events (``CBEventType`` values) at which a cancelled call stops.
+CHECKPOINT_EVENTS = ("llm", "retrieve", "synthesize", "tree", "chunking")
+
+
+class Cancelled(Exception):
+    """Raised inside a call whose ``CancelToken`` was cancelled."""
+
+
+class CancelToken:
+    """Cancellation flag shared between a speculative call and its owner."""
+
+    def __init__(self):
+        self._event = threading.Event()
+
+    def cancel(self) -> None:
+        self._event.set()
+
+    @property
+    def cancelled(self) -> bool:
+        return self._event.is_set()
+
+
+_current_token: contextvars.ContextVar[Optional[CancelToken]] = contextvars.ContextVar(
+    "speculation_cancel_token", default=None
+)
+
+
+def _cancellation_handler() -> BaseCallbackHandler:
+    """A callback handler that raises ``Cancelled`` when an event of a cancelled call starts."""
+    from llama_index.core.callbacks.base_handler import BaseCallbackHandler
+
+    class _CancellationHandler(BaseCallbackHandler):
+        def __init__(self):
+            super().__init__(event_starts_to_ignore=[], event_ends_to_ignore=[])
+            self.interrupted = 0
+            self._lock = threading.Lock()
+
+        def on_event_start(
+            self,
+            event_type: CBEventType,
+            payload: Optional[Dict[str, Any]] = None,
+            event_id: str = "",
+            parent_id: str = "",
+            **kwargs: Any,
+        ) -> str:
+            token = _current_token.get()
+            if token is not None and token.cancelled and event_type.value in CHECKPOINT_EVENTS:
+                with self._lock:
+                    self.interrupted += 1
+                raise Cancelled(f"cancelled at {event_type.value}")
+            return event_id
+
+        def on_event_end(
+            self,
+            event_type: CBEventType,
+            payload: Optional[Dict[str, Any]] = None,
+            event_id: str = "",
+            **kwargs: Any,
+        ) -> None:
+            # Ends are never interrupted: the handlers after this one still
+            # close the event. The next event's start stops the call.
+            return
+
+        def start_trace(self, trace_id: Optional[str] = None) -> None:
+            return
+
+        def end_trace(self, trace_id: Optional[str] = None, trace_map: Optional[Dict[str, Any]] = None) -> None:
+            return
+
+    return _CancellationHandler()
+
+
+def run_cancellable(token: CancelToken, fn: Callable[..., Any], *args: Any) -> Optional[Any]:
+    """``fn(*args)`` with ``token`` as the current cancel token; None if it was cancelled."""
+    _current_token.set(token)
+    try:
+        return fn(*args)
+    except Cancelled:
+        return None
+
+
+class SpeculationRules(NamedTuple):
+    """When to speculate, and when the needle answer is good enough to keep."""
+
+    borderline_patterns: Sequence[str] = DEFAULT_BORDERLINE_PATTERNS
+    precise_patterns: Sequence[str] = DEFAULT_PRECISE_PATTERNS
+    refusal_patterns: Sequence[str] = DEFAULT_REFUSAL_PATTERNS
+    # Score of the best needle source (similarity) for a grounded answer.
+    min_source_score: float = DEFAULT_MIN_SOURCE_SCORE
+    # Also require at least one source sentence aligned with the answer.
+    require_highlights: bool = False
+
+    @classmethod
+    def from_env(cls) -> "SpeculationRules":
+        """Defaults, with SPECULATION_MIN_SCORE and SPECULATION_REQUIRE_HIGHLIGHTS applied."""
+        return cls(
+            min_source_score=float(os.getenv("SPECULATION_MIN_SCORE", DEFAULT_MIN_SOURCE_SCORE)),
+            require_highlights=os.getenv("SPECULATION_REQUIRE_HIGHLIGHTS", "0") == "1",
+        )
+
+    def is_borderline(self, question: str, route: str) -> bool:
+        """Whether the keyword route for ``question`` is unsure."""
+        if route not in ("needle", "summarization"):
+            return False
+        patterns = self.borderline_patterns if route == "needle" else self.precise_patterns
+        return any(re.search(p, question, re.IGNORECASE) for p in patterns)
+
+    def grounded(self, result: Dict[str, Any]) -> Tuple[bool, str]:
+        """(whether a needle result is well grounded, reason)."""
+        if result.get("tool_used"):
+            return True, "tool"
+        answer = result.get("answer") or ""
+        if not answer.strip():
+            return False, "empty"
+        if any(re.search(p, answer, re.IGNORECASE) for p in self.refusal_patterns):
+            return False, "refusal"
+        scores = [s["score"] for s in result.get("sources", []) if s.get("score") is not None]
+        if not scores or max(scores) < self.min_source_score:
+            return False, "low score"
+        if self.require_highlights and not result.get("highlights"):
+            return False, "no highlights"
+        return True, "grounded"
+
+
+class Speculator:
+    """
+    Runs the needle and summarization agents together for borderline
+    questions and keeps the needle answer when it is well grounded.
+
+    Args:
+        rules: Borderline and grounding rules (``SpeculationRules.from_env()`` by default).
+        max_workers: Summaries that may run (or wind down after cancellation) at once.
+    """
+
+    def __init__(self, rules: Optional[SpeculationRules] = None, max_workers: int = 4):
+        self.rules = rules or SpeculationRules.from_env()
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="speculative")
+        from llama_index.core import Settings
+
+        # First, so that a cancelled start is refused before any other
+        # handler records it.
+        self._handler = _cancellation_handler()
+        Settings.callback_manager.handlers.insert(0, self._handler)
+        self._lock = threading.Lock()
+        self._stats = {
+            "speculated": 0,
+            "needle_won": 0,
+            "summary_won": 0,
+            "summary_cancelled": 0,
+            "needle_ms_total": 0.0,
+            "summary_ms_total": 0.0,
+        }
+
+    def answer(self, question: str, manager: Any, route: str) -> Dict[str, Any]:
+        """Answer ``question`` speculatively; the result's ``chosen_agent`` is the winner."""
+        start = time.perf_counter()
+        token = CancelToken()
+        summary = self._pool.submit(
+            contextvars.copy_context().run,
+            run_cancellable,
+            token,
+            manager.summarization_agent.answer,
+            question,
+        )
+        try:
+            needle = manager.needle_agent.answer(question)
+            grounded, reason = self.rules.grounded(needle)
+        except Exception as exc:  # the summary is the fallback
+            needle, grounded, reason = None, False, f"needle failed: {exc}"
+
+        if grounded:
+            token.cancel()
+            result, winner = needle, "needle"
+        else:
+            result, winner = summary.result(), "summarization"
+        elapsed_ms = (time.perf_counter() - start) * 1000.0
+
+        with self._lock:
+            self._stats["speculated"] += 1
+            key = "needle" if winner == "needle" else "summary"
+            self._stats[f"{key}_won"] += 1
+            self._stats[f"{key}_ms_total"] += elapsed_ms
+            if winner == "needle" and not summary.done():
+                self._stats["summary_cancelled"] += 1
+
+        result["chosen_agent"] = winner
+        result["speculation"] = {"route": route, "winner": winner, "reason": reason}
+        return result
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            stats = dict(self._stats)
+        stats["interrupted_events"] = self._handler.interrupted
+        stats["needle_win_rate"] = stats["needle_won"] / stats["speculated"] if stats["speculated"] else 0.0
+        # Mean latency of speculative answers by winner.
+        for key in ("needle", "summary"):
+            won = stats[f"{key}_won"]
+            stats[f"{key}_avg_ms"] = stats[f"{key}_ms_total"] / won if won else 0.0
+        return stats
+
+    def close(self) -> None:
+        """Remove the cancellation handler and let running summaries finish in the background."""
+        from llama_index.core import Settings
+
+        Settings.callback_manager.remove_handler(self._handler)
+        self._pool.shutdown(wait=False)
+
+
+def build_speculator() -> Optional[Speculator]:
+    """A speculator with rules from the environment, or None when SPECULATION=0."""
+    if os.getenv("SPECULATION", "1") == "0":
+        return None
+    return Speculator()
@@ -1,7 +1,21 @@
+from __future__ import annotations
+
 import os
-from typing import Any, Dict, List
+import re
+from typing import TYPE_CHECKING, Any, Dict, List, Optional
+
+if TYPE_CHECKING:
+    from llama_index.core.query_engine import BaseQueryEngine
+
+    from provenance import ProvenanceIndex
+    from timeline import ClaimTimelines
 
-from llama_index.core.query_engine import BaseQueryEngine
+
+# Questions about the order of events, answered from the claim timeline.
+_CHRONOLOGY_RE = re.compile(
+    r"\b(?:timeline|chronolog\w*|sequence of events|order of events|in (?:chronological )?order)\b",
+    re.IGNORECASE,
+)
 
 
 class SummarizationAgent:
@@ -9,29 +23,69 @@ class SummarizationAgent:
     Agent specialized in high-level / timeline questions
     over the insurance claim.
 
-    It uses a SummaryIndex-backed query engine.
+    It uses a SummaryIndex-backed query engine. With ``ClaimTimelines``,
+    chronology questions about one claim are synthesized from its timeline's
+    sorted events (restricted to the question's date range, if any) instead
+    of from every document.
     """
 
-    def __init__(self, query_engine: BaseQueryEngine):
+    def __init__(
+        self,
+        query_engine: BaseQueryEngine,
+        provenance: Optional[ProvenanceIndex] = None,
+        timeline: Optional[ClaimTimelines] = None,
+    ):
         self.query_engine = query_engine
+        self.provenance = provenance
+        self.timeline = timeline
+
+    def _answer_chronology(self, question: str) -> Optional[Dict[str, Any]]:
+        """Synthesize from the timeline's events, or None if not a chronology question."""
+        if self.timeline is None or not _CHRONOLOGY_RE.search(question):
+            return None
+        timeline = self.timeline.for_question(question)
+        if timeline is None or not len(timeline):
+            return None
+        from llama_index.core.schema import NodeWithScore, QueryBundle, TextNode
+
+        span = timeline.time_range(question)
+        events = timeline.between(*span) if span is not None else timeline.events
+        context = TextNode(text="Claim events in chronological order:\n" + timeline.context_text(events))
+        response = self.query_engine.synthesize(QueryBundle(question), [NodeWithScore(node=context, score=1.0)])
+        return {
+            "agent": "summarization",
+            "question": question,
+            "answer": str(response),
+            "sources": [timeline.source(e) for e in events[:5]],
+            "highlights": [],
+            "timeline_events": len(events),
+        }
 
     def answer(self, question: str) -> Dict[str, Any]:
         q = question.strip()
+        chronology = self._answer_chronology(q)
+        if chronology is not None:
+            return chronology
         response = self.query_engine.query(q)
 
         sources: List[Dict[str, Any]] = []
+        spans: List[Dict[str, Any]] = []
         for sn in getattr(response, "source_nodes", [])[:5]:
             try:
                 node = sn.node
-                sources.append(
-                    {
-                        "node_id": sn.node_id,
-                        "score": sn.score,
-                        "text": node.get_content(metadata_mode="none")[:500],
-                    }
-                )
+                source = {
+                    "node_id": sn.node_id,
+                    "score": sn.score,
+                    "text": node.get_content(metadata_mode="none")[:500],
+                }
             except AttributeError:
-                pass
+                continue
+            # Exact location in the source file: file, doc_index, start, end, section_path.
+            span = self.provenance.source_span(node) if self.provenance else None
+            if span is not None:
+                source.update(span)
+                spans.append(span)
+            sources.append(source)
 
         # Debug mode: print top 3 source nodes with metadata
         if os.getenv("DEBUG_SOURCES") == "1":
@@ -54,4 +108,6 @@ class SummarizationAgent:
             "question": q,
             "answer": str(response),
             "sources": sources,
+            # Source sentences supporting the answer, with exact offsets.
+            "highlights": self.provenance.align(str(response), spans) if self.provenance else [],
         }
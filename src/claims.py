@@ -0,0 +1,80 @@
+"""
+Claim scoping for the answer paths that bypass retrieval.
+
+A corpus holds many claims (one file each, or several files of one claim,
+e.g. an original and an annotated copy). The date tools, the claim timeline
+and the planner's ledger facts answer without retrieval, so each must take
+its events from the claim the question is about, never from all of them.
+
+A claim is identified by the number in its title ("# Claim AC-2024-017 –
+..."), or by its file path when the title has none. ``ClaimTexts`` maps the
+markdown documents to their claims and resolves the claim a question names
+("In claim SC-2024-000123: ...", or the file name).
+"""
+
+import re
+from pathlib import Path
+from typing import Dict, List, Optional
+
+# "# Claim AC-2024-017 – Cohen v. Magen Insurance"
+_CLAIM_TITLE_RE = re.compile(r"^#[ \t]+Claim[ \t]+(?:No\.?[ \t]*|#[ \t]*)?([A-Za-z0-9][\w/-]*\d)\b", re.MULTILINE)
+# "In claim SC-2024-000123: ...", "For claim AC-2024-017, ..."
+_CLAIM_PREFIX_RE = re.compile(r"^\s*(?:in|for|regarding)\s+claim\s+\S+?[:,]\s*", re.IGNORECASE)
+
+
+def claim_id(text: str, file: str) -> str:
+    """Claim number from the document title, else the file path."""
+    m = _CLAIM_TITLE_RE.search(text)
+    return m.group(1) if m else file
+
+
+def strip_claim_prefix(question: str) -> str:
+    """``question`` without a leading "In claim X:" naming the claim."""
+    return _CLAIM_PREFIX_RE.sub("", question, count=1)
+
+
+def claim_prefix(question: str) -> str:
+    """The leading "In claim X: " of ``question``, or ""."""
+    m = _CLAIM_PREFIX_RE.match(question)
+    return m.group() if m else ""
+
+
+def _mentions(question: str, name: str) -> bool:
+    return re.search(r"(?<![\w-])" + re.escape(name) + r"(?![\w-])", question, re.IGNORECASE) is not None
+
+
+class ClaimTexts:
+    """Markdown text and claim id of every loaded document, by file path."""
+
+    def __init__(self, texts: Dict[str, str]):
+        self.texts = texts
+        self.claim_of = {file: claim_id(text, file) for file, text in texts.items()}
+
+    def __len__(self) -> int:
+        return len(self.texts)
+
+    def claims(self) -> List[str]:
+        """Distinct claim ids, in file order."""
+        return list(dict.fromkeys(self.claim_of.values()))
+
+    def named_claims(self, question: str) -> List[str]:
+        """Claims whose id or file name ``question`` mentions."""
+        return [
+            claim for claim in self.claims()
+            if _mentions(question, claim) or any(
+                _mentions(question, Path(file).name) for file, c in self.claim_of.items() if c == claim
+            )
+        ]
+
+    def claim_for(self, question: str) -> Optional[str]:
+        """The claim ``question`` is about: the one it names, or the only one loaded; None if ambiguous."""
+        named = self.named_claims(question)
+        if len(named) == 1:
+            return named[0]
+        claims = self.claims()
+        return claims[0] if not named and len(claims) == 1 else None
+
+    def files_for(self, question: str) -> List[str]:
+        """Files of the claims ``question`` names; every file when it names none."""
+        named = set(self.named_claims(question))
+        return [file for file, claim in self.claim_of.items() if not named or claim in named]
@@ -0,0 +1,449 @@
+"""
+Compact in-memory node storage for the needle index's docstore.
+
+The default ``SimpleDocumentStore`` keeps one JSON-style dict per node (text,
+metadata dict, relationship dicts with their own metadata and hashes), which
+for the claim corpus costs several times the raw text. ``CompactNodeStore``
+keeps the same information column-wise:
+
+- all node texts in one contiguous UTF-8 buffer, addressed by (start, length)
+  (a ``str`` holding any non-ASCII character costs 2-4 bytes per character);
+- node ids interned to integers, with parent / previous / next / source links
+  as integer arrays and children as slices of one shared integer pool;
+- metadata dicts and excluded-key lists interned, so nodes with identical
+  metadata (all paragraphs of a file) share one record;
+- character offsets as integer arrays.
+
+``TextNode`` objects are only materialized on ``get`` (i.e. for retrieved
+results and parents being merged). ``CompactDocumentStore`` plugs this into
+``StorageContext`` as a drop-in ``SimpleDocumentStore`` for the operations
+the vector index and the auto-merging retriever use, with the same
+ref-doc and hash bookkeeping as the default store. Embeddings are not
+stored (they live in the vector store).
+
+``persist`` writes the columns next to the docstore file: ``<path>.columns.npz``
+holds the integer columns and the text buffer, and ``<path>.ids.json`` holds
+the id map, the interned metadata and any non-text nodes. The ref-doc and
+hash records go to ``<path>`` as usual. ``from_persist_path`` reads all of
+them back.
+"""
+
+import json
+import os
+import sys
+import threading
+from array import array
+from typing import Any, Dict, List, Optional, Sequence
+
+import numpy as np
+
+from llama_index.core.schema import BaseNode, NodeRelationship, RelatedNodeInfo, TextNode
+from llama_index.core.storage.docstore.simple_docstore import SimpleDocumentStore
+from llama_index.core.storage.docstore.types import DEFAULT_BATCH_SIZE, DEFAULT_PERSIST_PATH, RefDocInfo
+from llama_index.core.storage.docstore.utils import doc_to_json, json_to_doc
+from llama_index.core.storage.kvstore.simple_kvstore import SimpleKVStore
+
+
+_NONE = -1
+# Integer columns of CompactNodeStore, one entry per node slot.
+_COLUMNS = (
+    "text_start", "text_len", "char_start", "char_end", "parent", "prev", "next",
+    "source", "child_start", "child_count", "meta", "excluded",
+)
+_TEXT_NODE_DEFAULTS = {
+    name: TextNode.model_fields[name].default
+    for name in ("text_template", "metadata_template", "metadata_separator", "mimetype")
+}
+
+
+def _is_compactable(node: BaseNode) -> bool:
+    return type(node) is TextNode and all(
+        getattr(node, name) == default for name, default in _TEXT_NODE_DEFAULTS.items()
+    )
+
+
+def _intern_value(value: Any) -> Any:
+    return sys.intern(value) if isinstance(value, str) else value
+
+
+class CompactNodeStore:
+    """Column-oriented node store; see the module docstring."""
+
+    def __init__(self):
+        self._ids: List[str] = []
+        self._slots: Dict[str, int] = {}
+        self._present = bytearray()
+        self._buffer = bytearray()
+        # Bytes of the buffer / child pool entries no slot refers to any more
+        # (overwritten or deleted); compacted away once they are half of it.
+        self._dead_bytes = 0
+        self._dead_children = 0
+        self._lock = threading.Lock()
+        self.text_start = array("q")
+        self.text_len = array("i")
+        self.char_start = array("i")
+        self.char_end = array("i")
+        self.parent = array("i")
+        self.prev = array("i")
+        self.next = array("i")
+        self.source = array("i")
+        self.child_start = array("i")
+        self.child_count = array("i")
+        self._child_pool = array("i")
+        self.meta = array("i")
+        self.excluded = array("i")
+        self._metadata: List[Dict[str, Any]] = []
+        self._metadata_ids: Dict[tuple, int] = {}
+        self._exclusions: List[tuple] = []
+        self._exclusion_ids: Dict[tuple, int] = {}
+        # Nodes that are not plain TextNodes are kept as objects.
+        self._objects: Dict[str, BaseNode] = {}
+
+    def __len__(self) -> int:
+        return sum(self._present) + len(self._objects)
+
+    def __contains__(self, node_id: str) -> bool:
+        slot = self._slots.get(node_id)
+        return (slot is not None and self._present[slot] == 1) or node_id in self._objects
+
+    def _slot(self, node_id: str) -> int:
+        """Integer id of a node, allocated on first reference (even before it is added)."""
+        slot = self._slots.get(node_id)
+        if slot is not None:
+            return slot
+        slot = len(self._ids)
+        self._slots[node_id] = slot
+        self._ids.append(node_id)
+        self._present.append(0)
+        for name in _COLUMNS:
+            getattr(self, name).append(_NONE)
+        return slot
+
+    def _related(self, node: BaseNode, relation: NodeRelationship) -> int:
+        info = node.relationships.get(relation)
+        if info is None or isinstance(info, list):
+            return _NONE
+        return self._slot(info.node_id)
+
+    def _intern_metadata(self, metadata: Dict[str, Any]) -> int:
+        key = tuple(sorted((k, repr(v)) for k, v in metadata.items()))
+        meta_id = self._metadata_ids.get(key)
+        if meta_id is None:
+            meta_id = self._metadata_ids[key] = len(self._metadata)
+            self._metadata.append({sys.intern(k): _intern_value(v) for k, v in metadata.items()})
+        return meta_id
+
+    def _intern_exclusions(self, node: TextNode) -> int:
+        key = (tuple(node.excluded_embed_metadata_keys), tuple(node.excluded_llm_metadata_keys))
+        ex_id = self._exclusion_ids.get(key)
+        if ex_id is None:
+            ex_id = self._exclusion_ids[key] = len(self._exclusions)
+            self._exclusions.append(key)
+        return ex_id
+
+    def add(self, node: BaseNode) -> None:
+        if not _is_compactable(node):
+            self._objects[node.node_id] = node
+            return
+        self._objects.pop(node.node_id, None)
+        slot = self._slot(node.node_id)
+
+        encoded = node.text.encode("utf-8")
+        # Present before storing, so a compaction triggered here keeps the slot.
+        self._present[slot] = 1
+        with self._lock:
+            self._store_text(slot, encoded)
+
+        self.char_start[slot] = _NONE if node.start_char_idx is None else node.start_char_idx
+        self.char_end[slot] = _NONE if node.end_char_idx is None else node.end_char_idx
+        self.parent[slot] = self._related(node, NodeRelationship.PARENT)
+        self.prev[slot] = self._related(node, NodeRelationship.PREVIOUS)
+        self.next[slot] = self._related(node, NodeRelationship.NEXT)
+        self.source[slot] = self._related(node, NodeRelationship.SOURCE)
+
+        children = array("i", [self._slot(c.node_id) for c in (node.relationships.get(NodeRelationship.CHILD) or [])])
+        with self._lock:
+            self._store_children(slot, children)
+
+        self.meta[slot] = self._intern_metadata(node.metadata)
+        self.excluded[slot] = self._intern_exclusions(node)
+
+    def _store_text(self, slot: int, encoded: bytes) -> None:
+        """Point ``slot`` at ``encoded``, reusing its byte range when it still fits."""
+        start, length = self.text_start[slot], self.text_len[slot]
+        if start != _NONE and len(encoded) <= length:
+            # Re-adding a node (the vector index re-adds every leaf) keeps
+            # its bytes; a shorter text is written over them.
+            if self._buffer[start:start + len(encoded)] != encoded:
+                self._buffer[start:start + len(encoded)] = encoded
+            self._dead_bytes += length - len(encoded)
+            self.text_len[slot] = len(encoded)
+            return
+        if start != _NONE:
+            self._dead_bytes += length
+        self.text_start[slot] = len(self._buffer)
+        self.text_len[slot] = len(encoded)
+        self._buffer += encoded
+        if self._dead_bytes > len(self._buffer) // 2:
+            self._compact()
+
+    def _store_children(self, slot: int, children: array) -> None:
+        start, count = self.child_start[slot], self.child_count[slot]
+        if start != _NONE and len(children) <= count:
+            self._child_pool[start:start + len(children)] = children
+            self._dead_children += count - len(children)
+            self.child_count[slot] = len(children)
+            return
+        if start != _NONE:
+            self._dead_children += count
+        self.child_start[slot] = len(self._child_pool)
+        self.child_count[slot] = len(children)
+        self._child_pool.extend(children)
+        if self._dead_children > len(self._child_pool) // 2:
+            self._compact()
+
+    def _compact(self) -> None:
+        """Rewrite the text buffer and child pool without unreferenced entries (lock held)."""
+        buffer, pool = bytearray(), array("i")
+        for slot in range(len(self._ids)):
+            start, length = self.text_start[slot], self.text_len[slot]
+            if start != _NONE and self._present[slot]:
+                self.text_start[slot] = len(buffer)
+                buffer += self._buffer[start:start + length]
+            else:
+                self.text_start[slot], self.text_len[slot] = _NONE, _NONE
+            start, count = self.child_start[slot], self.child_count[slot]
+            if start != _NONE and self._present[slot]:
+                self.child_start[slot] = len(pool)
+                pool.extend(self._child_pool[start:start + count])
+            else:
+                self.child_start[slot], self.child_count[slot] = _NONE, _NONE
+        self._buffer, self._child_pool = buffer, pool
+        self._dead_bytes = self._dead_children = 0
+
+    def delete(self, node_id: str) -> bool:
+        if self._objects.pop(node_id, None) is not None:
+            return True
+        slot = self._slots.get(node_id)
+        if slot is None or not self._present[slot]:
+            return False
+        self._present[slot] = 0
+        with self._lock:
+            self._dead_bytes += max(self.text_len[slot], 0)
+            self._dead_children += max(self.child_count[slot], 0)
+        return True
+
+    def _text(self, slot: int) -> str:
+        start = self.text_start[slot]
+        return self._buffer[start:start + self.text_len[slot]].decode("utf-8")
+
+    def _info(self, slot: int) -> RelatedNodeInfo:
+        return RelatedNodeInfo(node_id=self._ids[slot])
+
+    def get(self, node_id: str) -> Optional[BaseNode]:
+        """Materialize a node (a fresh TextNode each call), or None if absent."""
+        obj = self._objects.get(node_id)
+        if obj is not None:
+            return obj
+        slot = self._slots.get(node_id)
+        if slot is None or not self._present[slot]:
+            return None
+
+        relationships: Dict[NodeRelationship, Any] = {}
+        for relation, column in (
+            (NodeRelationship.SOURCE, self.source),
+            (NodeRelationship.PARENT, self.parent),
+            (NodeRelationship.PREVIOUS, self.prev),
+            (NodeRelationship.NEXT, self.next),
+        ):
+            if column[slot] != _NONE:
+                relationships[relation] = self._info(column[slot])
+        count = self.child_count[slot]
+        if count:
+            start = self.child_start[slot]
+            relationships[NodeRelationship.CHILD] = [
+                self._info(c) for c in self._child_pool[start:start + count]
+            ]
+
+        excluded_embed, excluded_llm = self._exclusions[self.excluded[slot]]
+        char_start, char_end = self.char_start[slot], self.char_end[slot]
+        return TextNode(
+            id_=node_id,
+            text=self._text(slot),
+            metadata=dict(self._metadata[self.meta[slot]]),
+            excluded_embed_metadata_keys=list(excluded_embed),
+            excluded_llm_metadata_keys=list(excluded_llm),
+            start_char_idx=None if char_start == _NONE else char_start,
+            end_char_idx=None if char_end == _NONE else char_end,
+            relationships=relationships,
+        )
+
+    def node_ids(self) -> List[str]:
+        ids = [node_id for node_id, slot in self._slots.items() if self._present[slot]]
+        return ids + list(self._objects)
+
+    def save(self, path: str, fs: Optional[Any] = None) -> None:
+        """Write ``<path>.columns.npz`` and ``<path>.ids.json`` (see the module docstring)."""
+        opener = fs.open if fs is not None else open
+        with self._lock:
+            if self._dead_bytes or self._dead_children:
+                self._compact()
+            columns = {
+                name: np.frombuffer(getattr(self, name), dtype=getattr(self, name).typecode)
+                for name in _COLUMNS
+            }
+            columns["child_pool"] = np.frombuffer(self._child_pool, dtype=self._child_pool.typecode)
+            columns["present"] = np.frombuffer(bytes(self._present), dtype=np.uint8)
+            columns["buffer"] = np.frombuffer(bytes(self._buffer), dtype=np.uint8)
+            sidecar = {
+                "ids": self._ids,
+                "metadata": self._metadata,
+                "exclusions": [list(map(list, key)) for key in self._exclusions],
+                "objects": {node_id: doc_to_json(node) for node_id, node in self._objects.items()},
+            }
+        if fs is None:
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with opener(f"{path}.columns.npz", "wb") as f:
+            np.savez(f, **columns)
+        # The id map last: a reader never finds it next to stale columns.
+        with opener(f"{path}.ids.json", "w") as f:
+            json.dump(sidecar, f)
+
+    @classmethod
+    def load(cls, path: str, fs: Optional[Any] = None) -> "CompactNodeStore":
+        """A store read back from the files written by ``save``."""
+        opener = fs.open if fs is not None else open
+        store = cls()
+        with opener(f"{path}.ids.json", "r") as f:
+            sidecar = json.load(f)
+        with opener(f"{path}.columns.npz", "rb") as f:
+            with np.load(f) as columns:
+                for name in _COLUMNS:
+                    getattr(store, name).frombytes(columns[name].tobytes())
+                store._child_pool.frombytes(columns["child_pool"].tobytes())
+                store._present = bytearray(columns["present"].tobytes())
+                store._buffer = bytearray(columns["buffer"].tobytes())
+        store._ids = sidecar["ids"]
+        store._slots = {node_id: slot for slot, node_id in enumerate(store._ids)}
+        for metadata in sidecar["metadata"]:
+            store._intern_metadata(metadata)
+        for embed_keys, llm_keys in sidecar["exclusions"]:
+            key = (tuple(embed_keys), tuple(llm_keys))
+            store._exclusion_ids[key] = len(store._exclusions)
+            store._exclusions.append(key)
+        store._objects = {node_id: json_to_doc(data) for node_id, data in sidecar["objects"].items()}
+        return store
+
+
+class CompactDocumentStore(SimpleDocumentStore):
+    """
+    ``SimpleDocumentStore`` backed by a ``CompactNodeStore``.
+
+    Covers the docstore operations used by ``VectorStoreIndex`` and
+    ``AutoMergingRetriever`` (add, get, exists, delete, ``docs``). Document
+    hashes and ref-doc info are kept in the key-value store like the
+    default docstore does; only the nodes themselves are stored column-wise.
+    """
+
+    def __init__(
+        self,
+        simple_kvstore: Optional[SimpleKVStore] = None,
+        namespace: Optional[str] = None,
+        batch_size: int = DEFAULT_BATCH_SIZE,
+    ) -> None:
+        super().__init__(simple_kvstore, namespace=namespace, batch_size=batch_size)
+        self._compact = CompactNodeStore()
+
+    @property
+    def compact(self) -> CompactNodeStore:
+        return self._compact
+
+    @property
+    def docs(self) -> Dict[str, BaseNode]:
+        return {node_id: self._compact.get(node_id) for node_id in self._compact.node_ids()}
+
+    def add_documents(
+        self,
+        docs: Sequence[BaseNode],
+        allow_update: bool = True,
+        batch_size: Optional[int] = None,
+        store_text: bool = True,
+    ) -> None:
+        metadata_pairs = []
+        ref_docs: Dict[str, Any] = {}
+        for node in docs:
+            if not allow_update and node.node_id in self._compact:
+                raise ValueError(
+                    f"node_id {node.node_id} already exists. "
+                    "Set allow_update to True to overwrite."
+                )
+            self._compact.add(node)
+            metadata = {"doc_hash": node.hash}
+            if node.source_node is not None and node.ref_doc_id:
+                ref_doc_id = node.ref_doc_id
+                info = ref_docs.get(ref_doc_id)
+                if info is None:
+                    info = ref_docs[ref_doc_id] = self.get_ref_doc_info(ref_doc_id) or RefDocInfo()
+                if node.node_id not in info.node_ids:
+                    info.node_ids.append(node.node_id)
+                if not info.metadata:
+                    info.metadata = node.metadata or {}
+                metadata["ref_doc_id"] = ref_doc_id
+            metadata_pairs.append((node.node_id, metadata))
+
+        batch_size = batch_size or self._batch_size
+        self._kvstore.put_all(metadata_pairs, collection=self._metadata_collection, batch_size=batch_size)
+        self._kvstore.put_all(
+            [(ref_doc_id, info.to_dict()) for ref_doc_id, info in ref_docs.items()],
+            collection=self._ref_doc_collection,
+            batch_size=batch_size,
+        )
+
+    async def async_add_documents(
+        self,
+        docs: Sequence[BaseNode],
+        allow_update: bool = True,
+        batch_size: Optional[int] = None,
+        store_text: bool = True,
+    ) -> None:
+        self.add_documents(docs, allow_update=allow_update, batch_size=batch_size, store_text=store_text)
+
+    def get_document(self, doc_id: str, raise_error: bool = True) -> Optional[BaseNode]:
+        node = self._compact.get(doc_id)
+        if node is None and raise_error:
+            raise ValueError(f"doc_id {doc_id} not found.")
+        return node
+
+    async def aget_document(self, doc_id: str, raise_error: bool = True) -> Optional[BaseNode]:
+        return self.get_document(doc_id, raise_error=raise_error)
+
+    def document_exists(self, doc_id: str) -> bool:
+        return doc_id in self._compact
+
+    async def adocument_exists(self, doc_id: str) -> bool:
+        return self.document_exists(doc_id)
+
+    def delete_document(self, doc_id: str, raise_error: bool = True) -> None:
+        self._remove_from_ref_doc_node(doc_id)
+        if not self._compact.delete(doc_id) and raise_error:
+            raise ValueError(f"doc_id {doc_id} not found.")
+        self._kvstore.delete(doc_id, collection=self._metadata_collection)
+
+    async def adelete_document(self, doc_id: str, raise_error: bool = True) -> None:
+        self.delete_document(doc_id, raise_error=raise_error)
+
+    def persist(self, persist_path: str = DEFAULT_PERSIST_PATH, fs: Optional[Any] = None) -> None:
+        """Write the hash / ref-doc records to ``persist_path`` and the nodes beside it."""
+        super().persist(persist_path, fs=fs)
+        self._compact.save(persist_path, fs=fs)
+
+    @classmethod
+    def from_persist_path(
+        cls,
+        persist_path: str,
+        namespace: Optional[str] = None,
+        fs: Optional[Any] = None,
+    ) -> "CompactDocumentStore":
+        store = cls(SimpleKVStore.from_persist_path(persist_path, fs=fs), namespace)
+        store._compact = CompactNodeStore.load(persist_path, fs=fs)
+        return store
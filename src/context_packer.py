@@ -0,0 +1,177 @@
+"""
+Token-budgeted context packing for the needle engine's compact synthesizer.
+
+Auto-merging can replace several small leaves with 512/1024-token parents,
+and the compact synthesizer sends whatever comes back. ``ContextPacker`` is a
+node postprocessor that sits between retrieval and synthesis and rewrites the
+retrieved nodes so the prompt context fits an explicit token budget:
+
+- nodes are split into sentences / lines, and a sentence already packed from
+  an earlier (higher-scored or overlapping) node is dropped;
+- for numeric questions (amounts, counts, dates) table-row nodes go first;
+- boilerplate is compressed: markdown emphasis and rules are stripped, and
+  document header fields (author, document type, ...) and binary noise are
+  dropped unless the question asks about them;
+- sentences are packed in order until the budget is reached.
+
+Node ids are kept, so sources and provenance still point at the original
+nodes. Each query's savings are logged and available via ``last_report``.
+"""
+
+import logging
+import re
+import threading
+from typing import Any, Dict, List, Optional
+
+from llama_index.core.bridge.pydantic import Field, PrivateAttr
+from llama_index.core.postprocessor.types import BaseNodePostprocessor
+from llama_index.core.schema import MetadataMode, NodeWithScore, QueryBundle
+from llama_index.core.utils import get_tokenizer
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CONTEXT_TOKEN_BUDGET = 1536
+
+# Sentences, or whole lines for tables / logs / bullet points.
+_UNIT_RE = re.compile(r"[^\n]+?(?:[.!?](?=\s)|$)", re.MULTILINE)
+_NUMERIC_QUESTION_RE = re.compile(
+    r"\b(how (much|many|long)|amount|cost|costs|total|paid|pay|price|sum|percent|"
+    r"date|when|nis|ils|usd|days?|weeks?)\b|\d",
+    re.IGNORECASE,
+)
+# Document header fields that repeat on every claim document.
+_BOILERPLATE_RE = re.compile(
+    r"^(document type|date created|author|prepared by|page \d+|confidential|"
+    r"internal note|claim file)\b",
+    re.IGNORECASE,
+)
+_RULE_RE = re.compile(r"^[-=_*|:\s]+$")
+_EMPHASIS_RE = re.compile(r"\*\*|__|`")
+_WORD_RE = re.compile(r"[a-z0-9]+")
+
+
+def _normalize(unit: str) -> str:
+    return " ".join(_WORD_RE.findall(unit.lower()))
+
+
+def _is_noise(unit: str) -> bool:
+    """Mostly non-letters, e.g. PDF byte streams read as text."""
+    letters = sum(ch.isalpha() or ch.isspace() for ch in unit)
+    return letters < 0.6 * len(unit)
+
+
+def is_numeric_question(question: str) -> bool:
+    return bool(_NUMERIC_QUESTION_RE.search(question))
+
+
+class ContextPacker(BaseNodePostprocessor):
+    """Pack retrieved nodes into at most ``token_budget`` prompt tokens."""
+
+    token_budget: int = Field(default=DEFAULT_CONTEXT_TOKEN_BUDGET, description="Max context tokens.")
+
+    _tokenizer: Any = PrivateAttr()
+    _local: threading.local = PrivateAttr(default_factory=threading.local)
+    _lock: Any = PrivateAttr(default_factory=threading.Lock)
+    _totals: Dict[str, int] = PrivateAttr(default_factory=dict)
+
+    def __init__(self, **kwargs: Any):
+        super().__init__(**kwargs)
+        self._tokenizer = get_tokenizer()
+        self._totals = {"queries": 0, "tokens_in": 0, "tokens_out": 0, "tokens_saved": 0}
+
+    @classmethod
+    def class_name(cls) -> str:
+        return "ContextPacker"
+
+    def _count(self, text: str) -> int:
+        return len(self._tokenizer(text))
+
+    @property
+    def last_report(self) -> Optional[Dict[str, int]]:
+        """Packing report for the most recent query on this thread."""
+        return getattr(self._local, "report", None)
+
+    def stats(self) -> Dict[str, int]:
+        """Totals over all queries packed so far."""
+        with self._lock:
+            return dict(self._totals)
+
+    def _order(self, nodes: List[NodeWithScore], question: str) -> List[NodeWithScore]:
+        ranked = sorted(nodes, key=lambda n: -(n.score or 0.0))
+        if is_numeric_question(question):
+            # Stable: table rows first, each group still by score.
+            ranked.sort(key=lambda n: n.node.metadata.get("node_type") != "table_row")
+        return ranked
+
+    def _postprocess_nodes(
+        self,
+        nodes: List[NodeWithScore],
+        query_bundle: Optional[QueryBundle] = None,
+    ) -> List[NodeWithScore]:
+        question = query_bundle.query_str if query_bundle else ""
+        question_words = set(_WORD_RE.findall(question.lower()))
+        report = {
+            "nodes_in": len(nodes),
+            "nodes_out": 0,
+            "tokens_in": 0,
+            "tokens_out": 0,
+            "tokens_saved": 0,
+            "duplicates_dropped": 0,
+            "boilerplate_dropped": 0,
+            "budget_dropped": 0,
+        }
+
+        seen = set()
+        remaining = self.token_budget
+        packed: List[NodeWithScore] = []
+        for nws in self._order(nodes, question):
+            node = nws.node
+            report["tokens_in"] += self._count(node.get_content(metadata_mode=MetadataMode.LLM))
+            # Metadata shown to the LLM is part of the node's cost.
+            overhead = self._count(node.get_metadata_str(mode=MetadataMode.LLM))
+
+            kept: List[str] = []
+            for m in _UNIT_RE.finditer(node.get_content(metadata_mode=MetadataMode.NONE)):
+                unit = _EMPHASIS_RE.sub("", m.group()).strip()
+                if not unit or _RULE_RE.match(unit):
+                    continue
+                key = _normalize(unit)
+                if not key or key in seen:
+                    report["duplicates_dropped"] += 1
+                    continue
+                if _is_noise(unit) or (
+                    _BOILERPLATE_RE.match(unit.lstrip("-#> ")) and not question_words & set(key.split())
+                ):
+                    report["boilerplate_dropped"] += 1
+                    continue
+                cost = self._count(unit) + (overhead if not kept else 0)
+                if cost > remaining:
+                    report["budget_dropped"] += 1
+                    continue
+                seen.add(key)
+                kept.append(unit)
+                remaining -= cost
+
+            if not kept:
+                continue
+            new_node = node.model_copy()
+            new_node.set_content("\n".join(kept))
+            packed.append(NodeWithScore(node=new_node, score=nws.score))
+            report["tokens_out"] += self._count(new_node.get_content(metadata_mode=MetadataMode.LLM))
+
+        report["nodes_out"] = len(packed)
+        report["tokens_saved"] = max(0, report["tokens_in"] - report["tokens_out"])
+        self._local.report = report
+        with self._lock:
+            self._totals["queries"] += 1
+            for key in ("tokens_in", "tokens_out", "tokens_saved"):
+                self._totals[key] += report[key]
+        logger.info(
+            "Packed context: %d -> %d tokens (saved %d), %d -> %d nodes",
+            report["tokens_in"],
+            report["tokens_out"],
+            report["tokens_saved"],
+            report["nodes_in"],
+            report["nodes_out"],
+        )
+        return packed
@@ -0,0 +1,197 @@
+"""
+Embedding cache keyed by (embedding model, text hash).
+
+Index variants that chunk the same documents differently still share most
+of their chunks (every paragraph group that fits both leaf sizes, every
+table row), and a sweep asks each variant the same questions.
+``CachedEmbedding`` wraps the embedding model so a text that was embedded
+once, by any index built in this process, is not sent to the API again.
+Only the texts missing from the cache go to the wrapped model, still in
+batches.
+
+Two tiers, like the retrieval cache:
+
+- an in-process LRU of float32 arrays (``EMBEDDING_CACHE_MEMORY`` entries,
+  default 50000), shared by every index built in the process;
+- an optional SQLite file (``EMBEDDING_CACHE_PATH``) that later runs and
+  other worker processes reuse.
+
+Text and query embeddings are cached separately (some models embed them
+differently). ``EMBEDDING_CACHE=0`` embeds everything as before.
+"""
+
+import hashlib
+import os
+import sqlite3
+import threading
+from array import array
+from collections import OrderedDict
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+
+from llama_index.core.base.embeddings.base import BaseEmbedding, Embedding
+from llama_index.core.bridge.pydantic import PrivateAttr
+
+
+DEFAULT_MEMORY_ENTRIES = 50_000
+
+
+class EmbeddingCache:
+    """
+    Two-tier (LRU + optional SQLite) store of embeddings by text hash.
+
+    ``memory_entries`` caps the in-process tier; 0 keeps no vectors in memory
+    (every lookup reads the file).
+    """
+
+    def __init__(self, path: Optional[Path] = None, memory_entries: int = DEFAULT_MEMORY_ENTRIES):
+        self.path = Path(path) if path else None
+        self.memory_entries = memory_entries
+        # float32 arrays: a quarter of the size of float lists.
+        self._memory: "OrderedDict[str, array]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._conn: Optional[sqlite3.Connection] = None
+        self.hits = 0
+        self.misses = 0
+        if self.path is not None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            self._conn = sqlite3.connect(str(self.path), check_same_thread=False, timeout=30)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("CREATE TABLE IF NOT EXISTS embeddings (key TEXT PRIMARY KEY, vector BLOB NOT NULL)")
+            self._conn.commit()
+
+    @staticmethod
+    def make_key(model_name: str, kind: str, text: str) -> str:
+        return hashlib.sha256(f"{model_name}\0{kind}\0{text}".encode("utf-8")).hexdigest()
+
+    def _remember(self, key: str, vector: array) -> None:
+        if self.memory_entries <= 0:
+            return
+        self._memory[key] = vector
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.memory_entries:
+            self._memory.popitem(last=False)
+
+    def get_many(self, keys: List[str]) -> List[Optional[List[float]]]:
+        with self._lock:
+            found: Dict[str, array] = {}
+            for key in keys:
+                vector = self._memory.get(key)
+                if vector is not None:
+                    self._memory.move_to_end(key)
+                    found[key] = vector
+            missing = [key for key in keys if key not in found]
+            if missing and self._conn is not None:
+                marks = ",".join("?" * len(missing))
+                for key, blob in self._conn.execute(
+                    f"SELECT key, vector FROM embeddings WHERE key IN ({marks})", missing
+                ):
+                    found[key] = array("f", array("d", blob))
+                    self._remember(key, found[key])
+            vectors = [found[key].tolist() if key in found else None for key in keys]
+            hits = sum(vector is not None for vector in vectors)
+            self.hits += hits
+            self.misses += len(keys) - hits
+            return vectors
+
+    def put_many(self, keys: List[str], vectors: List[List[float]]) -> None:
+        with self._lock:
+            for key, vector in zip(keys, vectors):
+                self._remember(key, array("f", vector))
+            if self._conn is not None:
+                self._conn.executemany(
+                    "INSERT OR REPLACE INTO embeddings (key, vector) VALUES (?, ?)",
+                    [(key, array("d", vector).tobytes()) for key, vector in zip(keys, vectors)],
+                )
+                self._conn.commit()
+
+    def stats(self) -> Dict[str, float]:
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "entries": len(self._memory),
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / total if total else 0.0,
+            }
+
+
+class CachedEmbedding(BaseEmbedding):
+    """Embedding model wrapper that only embeds texts missing from an ``EmbeddingCache``."""
+
+    _embed_model: BaseEmbedding = PrivateAttr()
+    _cache: EmbeddingCache = PrivateAttr()
+
+    def __init__(self, embed_model: BaseEmbedding, cache: EmbeddingCache):
+        super().__init__(
+            model_name=embed_model.model_name,
+            embed_batch_size=embed_model.embed_batch_size,
+            callback_manager=embed_model.callback_manager,
+        )
+        self._embed_model = embed_model
+        self._cache = cache
+
+    @classmethod
+    def class_name(cls) -> str:
+        return "CachedEmbedding"
+
+    @property
+    def cache(self) -> EmbeddingCache:
+        return self._cache
+
+    def _cached(self, kind: str, texts: List[str], embed: Callable[[List[str]], List[Embedding]]) -> List[Embedding]:
+        # The wrapped model's private methods are called so the embedding
+        # callback event is emitted once (by this wrapper), not twice.
+        keys = [EmbeddingCache.make_key(self.model_name, kind, text) for text in texts]
+        vectors = self._cache.get_many(keys)
+        missing = [i for i, vector in enumerate(vectors) if vector is None]
+        if missing:
+            new = embed([texts[i] for i in missing])
+            self._cache.put_many([keys[i] for i in missing], new)
+            for i, vector in zip(missing, new):
+                vectors[i] = vector
+        return vectors
+
+    def _get_query_embedding(self, query: str) -> Embedding:
+        return self._cached(
+            "query", [query], lambda texts: [self._embed_model._get_query_embedding(t) for t in texts]
+        )[0]
+
+    async def _aget_query_embedding(self, query: str) -> Embedding:
+        return self._get_query_embedding(query)
+
+    def _get_text_embedding(self, text: str) -> Embedding:
+        return self._get_text_embeddings([text])[0]
+
+    def _get_text_embeddings(self, texts: List[str]) -> List[Embedding]:
+        return self._cached("text", texts, self._embed_model._get_text_embeddings)
+
+
+_cache: Optional[EmbeddingCache] = None
+_cache_lock = threading.Lock()
+
+
+def get_embedding_cache() -> Optional[EmbeddingCache]:
+    """
+    Process-wide cache configured via EMBEDDING_CACHE / EMBEDDING_CACHE_PATH /
+    EMBEDDING_CACHE_MEMORY, or None when EMBEDDING_CACHE=0.
+    """
+    global _cache
+    if os.getenv("EMBEDDING_CACHE", "1") == "0":
+        return None
+    with _cache_lock:
+        if _cache is None:
+            path = os.getenv("EMBEDDING_CACHE_PATH") or None
+            _cache = EmbeddingCache(
+                Path(path) if path else None,
+                memory_entries=int(os.getenv("EMBEDDING_CACHE_MEMORY", DEFAULT_MEMORY_ENTRIES)),
+            )
+        return _cache
+
+
+def cached_embed_model(embed_model: BaseEmbedding) -> BaseEmbedding:
+    """``embed_model`` wrapped with the process-wide cache (unchanged when disabled)."""
+    cache = get_embedding_cache()
+    if cache is None or isinstance(embed_model, CachedEmbedding):
+        return embed_model
+    return CachedEmbedding(embed_model, cache)
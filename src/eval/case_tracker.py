@@ -0,0 +1,163 @@
+"""
+Per-case stage latencies and token usage for evaluation runs.
+
+``CaseTracker`` adds one LlamaIndex callback handler to the shared
+``Settings.callback_manager``, which the query engines, retrievers and
+``Settings.llm`` already hold, so no engine has to be rebuilt. For the case
+tracked on the current thread, the handler:
+
+- sums the wall time of each event type (retrieve, synthesize, llm,
+  embedding) while at least one event of the type is open, so wrapped
+  retrievers and concurrent sub-queries are not counted twice;
+- counts the answering LLM's prompt / completion tokens and the
+  query-embedding tokens, the way LlamaIndex's ``TokenCountingHandler``
+  does.
+
+Callbacks run on the thread that made the call, and the tracked case is a
+context variable, so several threads can each track their own case at the
+same time (the sweep runner answers variants concurrently). Threads started
+with a copy of the caller's context (the query planner's sub-queries) add
+to the caller's case. ``track()`` wraps one ``manager.answer`` call and
+fills a dict with the case's ``stage_ms`` and token counts.
+"""
+
+import contextvars
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, Optional
+
+from llama_index.core import Settings
+from llama_index.core.callbacks import CBEventType, EventPayload
+from llama_index.core.callbacks.base_handler import BaseCallbackHandler
+from llama_index.core.callbacks.token_counting import get_llm_token_counts
+from llama_index.core.utilities.token_counting import TokenCounter
+
+
+# Callback events reported as stages, by stage name ("answer" is the wall
+# time of the whole manager.answer call).
+STAGE_EVENTS = {
+    "retrieve": CBEventType.RETRIEVE,
+    "synthesize": CBEventType.SYNTHESIZE,
+    "llm": CBEventType.LLM,
+    "embedding": CBEventType.EMBEDDING,
+}
+
+
+class _CaseHandler(BaseCallbackHandler):
+    """Event times and token counts of the case tracked on each thread."""
+
+    def __init__(self):
+        super().__init__(event_starts_to_ignore=[], event_ends_to_ignore=[])
+        self._case_var: contextvars.ContextVar[Optional[Dict[str, Any]]] = contextvars.ContextVar(
+            f"case_{id(self)}", default=None
+        )
+        # Sub-query threads share their caller's case.
+        self._lock = threading.Lock()
+        self._counter = TokenCounter()
+
+    def begin(self) -> contextvars.Token:
+        return self._case_var.set({
+            "seconds": {},
+            "open": {},
+            "prompt_tokens": 0,
+            "completion_tokens": 0,
+            "embedding_tokens": 0,
+        })
+
+    def end(self, token: contextvars.Token) -> Dict[str, Any]:
+        case = self._case_var.get()
+        self._case_var.reset(token)
+        return case
+
+    def _case(self) -> Optional[Dict[str, Any]]:
+        return self._case_var.get()
+
+    def on_event_start(
+        self,
+        event_type: CBEventType,
+        payload: Optional[Dict[str, Any]] = None,
+        event_id: str = "",
+        parent_id: str = "",
+        **kwargs: Any,
+    ) -> str:
+        case = self._case()
+        if case is not None:
+            with self._lock:
+                count, started = case["open"].get(event_type, (0, time.perf_counter()))
+                case["open"][event_type] = (count + 1, started)
+        return event_id
+
+    def on_event_end(
+        self,
+        event_type: CBEventType,
+        payload: Optional[Dict[str, Any]] = None,
+        event_id: str = "",
+        **kwargs: Any,
+    ) -> None:
+        case = self._case()
+        if case is None:
+            return
+        with self._lock:
+            opened = case["open"].get(event_type)
+            if opened is not None:
+                count, started = opened
+                if count > 1:
+                    case["open"][event_type] = (count - 1, started)
+                else:
+                    del case["open"][event_type]
+                    seconds = case["seconds"]
+                    seconds[event_type] = seconds.get(event_type, 0.0) + time.perf_counter() - started
+        if payload is None:
+            return
+        if event_type == CBEventType.LLM:
+            counts = get_llm_token_counts(self._counter, payload, event_id)
+            with self._lock:
+                case["prompt_tokens"] += counts.prompt_token_count
+                case["completion_tokens"] += counts.completion_token_count
+        elif event_type == CBEventType.EMBEDDING:
+            tokens = sum(self._counter.get_string_tokens(chunk) for chunk in payload.get(EventPayload.CHUNKS, []))
+            with self._lock:
+                case["embedding_tokens"] += tokens
+
+    def start_trace(self, trace_id: Optional[str] = None) -> None:
+        return
+
+    def end_trace(self, trace_id: Optional[str] = None, trace_map: Optional[Dict[str, Any]] = None) -> None:
+        return
+
+
+class CaseTracker:
+    """Stage latencies and token counts of one answered question per thread (or context)."""
+
+    def __init__(self):
+        self._handler = _CaseHandler()
+        Settings.callback_manager.add_handler(self._handler)
+
+    @contextmanager
+    def track(self) -> Iterator[Dict[str, Any]]:
+        """
+        Measure the enclosed call; on exit the yielded dict holds
+        ``stage_ms`` ({stage: milliseconds}) and ``prompt_tokens``,
+        ``completion_tokens``, ``embedding_tokens``.
+        """
+        token = self._handler.begin()
+        usage: Dict[str, Any] = {}
+        start = time.perf_counter()
+        try:
+            yield usage
+        finally:
+            elapsed = time.perf_counter() - start
+            case = self._handler.end(token)
+            stage_ms = {"answer": elapsed * 1000.0}
+            for stage, event_type in STAGE_EVENTS.items():
+                if event_type in case["seconds"]:
+                    stage_ms[stage] = case["seconds"][event_type] * 1000.0
+            usage["stage_ms"] = {stage: round(ms, 3) for stage, ms in stage_ms.items()}
+            usage["prompt_tokens"] = case["prompt_tokens"]
+            usage["completion_tokens"] = case["completion_tokens"]
+            usage["embedding_tokens"] = case["embedding_tokens"]
+
+    def close(self) -> None:
+        """Remove the handler from the shared callback manager."""
+        Settings.callback_manager.remove_handler(self._handler)
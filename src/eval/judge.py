@@ -1,30 +1,64 @@
+from __future__ import annotations
+
 import json
 import os
-import re
 import sys
 from pathlib import Path
-from typing import Any, Dict, List
+from typing import TYPE_CHECKING, Any, Callable, Dict, List, Optional, Tuple
 
 from dotenv import load_dotenv
-from openai import OpenAI
 
 # Make sure we can import modules from src/
 PROJECT_ROOT = Path(__file__).resolve().parent.parent
 if str(PROJECT_ROOT) not in sys.path:
     sys.path.append(str(PROJECT_ROOT))
 
-from indexing import get_query_engines  # noqa: E402
-from agents.summarizer_agent import SummarizationAgent  # noqa: E402
-from agents.needle_agent import NeedleAgent  # noqa: E402
-from agents.manager import ManagerAgent  # noqa: E402
+from profiling import profiled  # noqa: E402
+from startup import BackgroundLoader, get_startup_timer  # noqa: E402
+
+# The OpenAI SDK, LlamaIndex and the agents are imported where they are
+# first needed (the manager is built on a background thread).
+if TYPE_CHECKING:
+    from openai import OpenAI
+    from agents.manager import ManagerAgent
+
+
+_engines: Dict[str, Any] = {}
 
 
 def build_manager() -> ManagerAgent:
     """Instantiate all agents and return the manager."""
+    from indexing import get_query_engines
+
     engines = get_query_engines()
-    summarizer = SummarizationAgent(engines["summary_engine"])
-    needle = NeedleAgent(engines["needle_engine"])
-    return ManagerAgent(summarizer, needle)
+    _engines.update(engines)
+    return manager_for_engines(engines)
+
+
+def manager_for_engines(engines: Dict[str, Any]) -> ManagerAgent:
+    """Agents over already-built query engines (from ``get_query_engines``)."""
+    from agents.summarizer_agent import SummarizationAgent
+    from agents.needle_agent import NeedleAgent
+    from agents.manager import ManagerAgent
+    from agents.planner import build_planner
+    from agents.speculation import build_speculator
+
+    summarizer = SummarizationAgent(
+        engines["summary_engine"], provenance=engines.get("provenance"), timeline=engines.get("timeline")
+    )
+    needle = NeedleAgent(
+        engines["needle_engine"],
+        claim_texts=engines.get("claim_texts"),
+        provenance=engines.get("provenance"),
+        context_packer=engines.get("context_packer"),
+    )
+    return ManagerAgent(
+        summarizer,
+        needle,
+        planner=build_planner(engines.get("claim_texts")),
+        timeline=engines.get("timeline"),
+        speculator=build_speculator(),
+    )
 
 
 def load_test_cases() -> List[Dict[str, Any]]:
@@ -34,49 +68,130 @@ def load_test_cases() -> List[Dict[str, Any]]:
 
 
 def build_judge_client() -> OpenAI:
-    load_dotenv()
-    # OPENAI_API_KEY is read from environment; same as the main system.
-    return OpenAI()
+    timer = get_startup_timer()
+    with timer.phase("openai", kind="import"):
+        from openai import OpenAI
 
+        from llm_recorder import RecordingChatClient, get_llm_recorder
 
-def normalize_text(text: str) -> str:
-    """
-    Normalize text for exact matching: lowercase, remove punctuation, normalize whitespace.
-    """
-    # Remove punctuation and convert to lowercase
-    text = re.sub(r'[^\w\s]', '', text.lower())
-    # Normalize whitespace
-    text = ' '.join(text.split())
-    return text
+    load_dotenv()
+    # OPENAI_API_KEY is read from environment; same as the main system.
+    client = OpenAI()
+    # With LLM_CACHE_MODE set, judge calls share the record/replay cache.
+    recorder = get_llm_recorder()
+    if recorder is not None:
+        return RecordingChatClient(client, recorder)
+    return client
+
+
+DEFAULT_JUDGE_BATCH_TOKENS = 6000
+# Expected judge output per case: three scores and three short explanations.
+_OUTPUT_TOKENS_PER_CASE = 200
+_MAX_OUTPUT_TOKENS = 4096
+_SCORE_KEYS = ("correctness_score", "relevance_score", "recall_score")
+_EXPLANATION_KEYS = ("correctness_explanation", "relevance_explanation", "recall_explanation")
+
+# Shared by the single-case and batched prompts, so both score the same way.
+_JUDGE_CRITERIA = (
+    "Evaluate three dimensions on a scale from 1 to 5 (integers):\n"
+    "1) correctness_score: how factually correct the system's answer is "
+    "compared to the ground truth.\n"
+    "2) relevance_score: how relevant the retrieved context is to the question.\n"
+    "3) recall_score: whether the retrieved context contains the key information "
+    "needed to answer the question.\n\n"
+)
+
+JUDGE_SYSTEM_PROMPT = (
+    "You are an impartial evaluator for a question-answering system over an "
+    "insurance claim. You will receive:\n"
+    "- the user question\n"
+    "- the ground truth answer\n"
+    "- the system's answer\n"
+    "- the retrieved context\n\n"
+    + _JUDGE_CRITERIA
+    + "Return ONLY a JSON object with the following keys:\n"
+    "{\n"
+    "  \"correctness_score\": int,\n"
+    "  \"relevance_score\": int,\n"
+    "  \"recall_score\": int,\n"
+    "  \"correctness_explanation\": str,\n"
+    "  \"relevance_explanation\": str,\n"
+    "  \"recall_explanation\": str\n"
+    "}\n"
+)
+
+BATCH_JUDGE_SYSTEM_PROMPT = (
+    "You are an impartial evaluator for a question-answering system over an "
+    "insurance claim. You will receive several test cases. Each starts with "
+    "\"### Case <case_id>\" and contains:\n"
+    "- the user question\n"
+    "- the ground truth answer\n"
+    "- the system's answer\n"
+    "- the retrieved context\n\n"
+    + _JUDGE_CRITERIA
+    + "Score every case independently of the others. Return ONLY a JSON object "
+    "with one entry per case, in the order given:\n"
+    "{\n"
+    "  \"results\": [\n"
+    "    {\n"
+    "      \"case_id\": the case's case_id,\n"
+    "      \"correctness_score\": int,\n"
+    "      \"relevance_score\": int,\n"
+    "      \"recall_score\": int,\n"
+    "      \"correctness_explanation\": str (one sentence),\n"
+    "      \"relevance_explanation\": str (one sentence),\n"
+    "      \"recall_explanation\": str (one sentence)\n"
+    "    }\n"
+    "  ]\n"
+    "}\n"
+)
+
+
+def _case_content(question: str, ground_truth: str, system_answer: str, context_text: str) -> str:
+    return (
+        f"Question: {question}\n\n"
+        f"Ground truth answer: {ground_truth}\n\n"
+        f"System answer: {system_answer}\n\n"
+        f"Retrieved context:\n{context_text}\n"
+    )
 
 
-def compute_exact_match(system_answer: str, ground_truth: str) -> bool:
-    """
-    Compute exact match (0 or 1) after normalization.
-    """
-    norm_system = normalize_text(system_answer)
-    norm_ground = normalize_text(ground_truth)
-    return norm_system == norm_ground
+def _chat_json(
+    client: OpenAI,
+    system_prompt: str,
+    user_content: str,
+    stats: Optional[Dict[str, int]] = None,
+    max_tokens: Optional[int] = None,
+) -> str:
+    """One JSON-mode judge call; token usage is added to ``stats`` if given."""
+    # Omitted (None) leaves the completion length to the API's default.
+    extra = {"max_tokens": max_tokens} if max_tokens is not None else {}
+    resp = client.chat.completions.create(
+        model="gpt-3.5-turbo",
+        response_format={"type": "json_object"},
+        messages=[
+            {"role": "system", "content": system_prompt},
+            {"role": "user", "content": user_content},
+        ],
+        temperature=0.0,
+        **extra,
+    )
+    if stats is not None:
+        stats["calls"] += 1
+        usage = getattr(resp, "usage", None)
+        if usage is not None:
+            stats["prompt_tokens"] += usage.prompt_tokens
+            stats["completion_tokens"] += usage.completion_tokens
+    return resp.choices[0].message.content
 
 
-def compute_context_hit(context_text: str, ground_truth: str) -> bool:
-    """
-    Check if the retrieved context contains the ground-truth substring (after normalization).
-    """
-    norm_context = normalize_text(context_text)
-    norm_ground = normalize_text(ground_truth)
-    # Check if ground truth (or key parts) appear in context
-    # For short ground truths, check exact substring
-    if len(norm_ground) < 20:
-        return norm_ground in norm_context
-    # For longer ground truths, check if key words/phrases appear
-    ground_words = set(norm_ground.split())
-    context_words = set(norm_context.split())
-    # Require at least 70% of ground truth words to appear
-    if len(ground_words) > 0:
-        overlap = len(ground_words & context_words) / len(ground_words)
-        return overlap >= 0.7
-    return False
+def _finalize_judgement(data: Dict[str, Any]) -> Dict[str, Any]:
+    # Rename correctness_score to llm_correctness for clarity
+    if "correctness_score" in data:
+        data["llm_correctness"] = data.pop("correctness_score")
+    if "correctness_explanation" in data:
+        data["llm_correctness_explanation"] = data.pop("correctness_explanation")
+    return data
 
 
 def judge_case(
@@ -85,6 +200,7 @@ def judge_case(
     ground_truth: str,
     system_answer: str,
     context_text: str,
+    stats: Optional[Dict[str, int]] = None,
 ) -> Dict[str, Any]:
     """
     Call an LLM-as-a-judge to score:
@@ -92,54 +208,15 @@ def judge_case(
     - relevance:   1–5
     - recall:      1–5
 
-    Also computes:
-    - exact_match: 0 or 1 (boolean)
-    - context_hit: 0 or 1 (boolean)
-
-    Returns a dict with scores and explanations.
+    Returns a dict with scores and explanations. The lexical metrics are
+    added by ``judge_cases``.
     """
-    system_prompt = (
-        "You are an impartial evaluator for a question-answering system over an "
-        "insurance claim. You will receive:\n"
-        "- the user question\n"
-        "- the ground truth answer\n"
-        "- the system's answer\n"
-        "- the retrieved context\n\n"
-        "Evaluate three dimensions on a scale from 1 to 5 (integers):\n"
-        "1) correctness_score: how factually correct the system's answer is "
-        "compared to the ground truth.\n"
-        "2) relevance_score: how relevant the retrieved context is to the question.\n"
-        "3) recall_score: whether the retrieved context contains the key information "
-        "needed to answer the question.\n\n"
-        "Return ONLY a JSON object with the following keys:\n"
-        "{\n"
-        "  \"correctness_score\": int,\n"
-        "  \"relevance_score\": int,\n"
-        "  \"recall_score\": int,\n"
-        "  \"correctness_explanation\": str,\n"
-        "  \"relevance_explanation\": str,\n"
-        "  \"recall_explanation\": str\n"
-        "}\n"
+    content = _chat_json(
+        client,
+        JUDGE_SYSTEM_PROMPT,
+        _case_content(question, ground_truth, system_answer, context_text),
+        stats,
     )
-
-    user_content = (
-        f"Question: {question}\n\n"
-        f"Ground truth answer: {ground_truth}\n\n"
-        f"System answer: {system_answer}\n\n"
-        f"Retrieved context:\n{context_text}\n"
-    )
-
-    resp = client.chat.completions.create(
-        model="gpt-3.5-turbo",
-        response_format={"type": "json_object"},
-        messages=[
-            {"role": "system", "content": system_prompt},
-            {"role": "user", "content": user_content},
-        ],
-        temperature=0.0,
-    )
-
-    content = resp.choices[0].message.content
     try:
         data = json.loads(content)
     except json.JSONDecodeError:
@@ -152,26 +229,168 @@ def judge_case(
             "relevance_explanation": "",
             "recall_explanation": "",
         }
-    
-    # Rename correctness_score to llm_correctness for clarity
-    if "correctness_score" in data:
-        data["llm_correctness"] = data.pop("correctness_score")
-    if "correctness_explanation" in data:
-        data["llm_correctness_explanation"] = data.pop("correctness_explanation")
-    
-    # Compute exact_match and context_hit
-    data["exact_match"] = 1 if compute_exact_match(system_answer, ground_truth) else 0
-    data["context_hit"] = 1 if compute_context_hit(context_text, ground_truth) else 0
+    return _finalize_judgement(data)
 
-    return data
 
+def _valid_judgement(entry: Any) -> bool:
+    if not isinstance(entry, dict):
+        return False
+    for key in _SCORE_KEYS:
+        score = entry.get(key)
+        if isinstance(score, bool) or not isinstance(score, int) or not 1 <= score <= 5:
+            return False
+    return True
 
+
+def plan_judge_batches(
+    cases: List[Dict[str, Any]],
+    token_budget: int,
+    count_tokens: Callable[[str], int],
+) -> List[List[Dict[str, Any]]]:
+    """
+    Split cases into consecutive batches whose request fits ``token_budget``.
+
+    A batch costs the batch system prompt, each case block, and the expected
+    output per case. A case that does not fit even alone gets a batch of its
+    own (and is judged with the single-case prompt).
+    """
+    overhead = count_tokens(BATCH_JUDGE_SYSTEM_PROMPT)
+    max_cases = max(1, _MAX_OUTPUT_TOKENS // _OUTPUT_TOKENS_PER_CASE)
+    batches: List[List[Dict[str, Any]]] = []
+    current: List[Dict[str, Any]] = []
+    used = overhead
+    for case in cases:
+        cost = count_tokens(case["content"]) + _OUTPUT_TOKENS_PER_CASE
+        if current and (used + cost > token_budget or len(current) >= max_cases):
+            batches.append(current)
+            current, used = [], overhead
+        current.append(case)
+        used += cost
+    if current:
+        batches.append(current)
+    return batches
+
+
+def judge_batch(
+    client: OpenAI,
+    cases: List[Dict[str, Any]],
+    stats: Dict[str, int],
+) -> Dict[Any, Dict[str, Any]]:
+    """
+    Judge several cases in one JSON-mode call.
+
+    Returns the raw judgements (score and explanation keys) of the cases whose
+    entry parsed and validated, keyed by case id; the rest are left out.
+    """
+    user_content = "\n".join(f"### Case {case['id']}\n{case['content']}" for case in cases)
+    # The output budget plan_judge_batches reserved for this batch; a
+    # truncated reply fails validation and its cases are re-judged singly.
+    max_tokens = min(_OUTPUT_TOKENS_PER_CASE * len(cases), _MAX_OUTPUT_TOKENS)
+    content = _chat_json(client, BATCH_JUDGE_SYSTEM_PROMPT, user_content, stats, max_tokens=max_tokens)
+    try:
+        entries = json.loads(content).get("results")
+    except (json.JSONDecodeError, AttributeError):
+        return {}
+    if not isinstance(entries, list):
+        return {}
+
+    wanted = {str(case["id"]): case["id"] for case in cases}
+    judged: Dict[Any, Dict[str, Any]] = {}
+    for entry in entries:
+        if not _valid_judgement(entry):
+            continue
+        case_id = wanted.get(str(entry.get("case_id")))
+        if case_id is None or case_id in judged:
+            continue
+        judged[case_id] = {
+            **{key: entry[key] for key in _SCORE_KEYS},
+            **{key: str(entry.get(key, "")) for key in _EXPLANATION_KEYS},
+        }
+    return judged
+
+
+def judge_cases(
+    client: OpenAI,
+    cases: List[Dict[str, Any]],
+    mode: str = "batch",
+    token_budget: int = DEFAULT_JUDGE_BATCH_TOKENS,
+) -> Tuple[List[Dict[str, Any]], Dict[str, int]]:
+    """
+    Judge (id, question, ground_truth, system_answer, context_text) cases.
+
+    ``mode="batch"`` packs cases into token-budgeted batch calls and
+    re-judges individually only the cases whose batch entry is missing or
+    invalid; ``mode="single"`` makes one call per case. Returns the
+    judgements in case order and call / token counts.
+
+    The lexical metrics (exact_match, context_hit, token_f1,
+    ngram_containment) are computed for all cases at once by ``metrics``.
+    """
+    stats = {"calls": 0, "batch_calls": 0, "rejudged": 0, "prompt_tokens": 0, "completion_tokens": 0}
+    cases = [
+        {**case, "content": _case_content(
+            case["question"], case["ground_truth"], case["system_answer"], case["context_text"]
+        )}
+        for case in cases
+    ]
+
+    judged: Dict[Any, Dict[str, Any]] = {}
+    if mode == "batch":
+        from llama_index.core.utils import get_tokenizer
+
+        tokenizer = get_tokenizer()
+        for batch in plan_judge_batches(cases, token_budget, lambda text: len(tokenizer(text))):
+            if len(batch) == 1:
+                continue
+            stats["batch_calls"] += 1
+            for case_id, data in judge_batch(client, batch, stats).items():
+                judged[case_id] = data
+            stats["rejudged"] += sum(case["id"] not in judged for case in batch)
+
+    results = []
+    for case in cases:
+        data = judged.get(case["id"])
+        if data is None:
+            results.append(judge_case(
+                client,
+                question=case["question"],
+                ground_truth=case["ground_truth"],
+                system_answer=case["system_answer"],
+                context_text=case["context_text"],
+                stats=stats,
+            ))
+        else:
+            results.append(_finalize_judgement(data))
+
+    from metrics import evaluate_rows
+
+    lexical = evaluate_rows(cases)
+    for i, result in enumerate(results):
+        result["exact_match"] = int(lexical["exact_match"][i])
+        result["context_hit"] = int(lexical["context_hit"][i])
+        result["token_f1"] = round(float(lexical["token_f1"][i]), 4)
+        result["ngram_containment"] = round(float(lexical["ngram_containment"][i]), 4)
+    return results, stats
+
+
+@profiled("eval")
 def run_evaluation():
+    # Indexes load in the background while the test cases and the judge
+    # client are set up.
+    loader = BackgroundLoader(build_manager)
     tests = load_test_cases()
-    manager = build_manager()
     client = build_judge_client()
+    manager = loader.result()
+    if os.getenv("STARTUP_REPORT") == "1":
+        print(get_startup_timer().report())
+
+    from case_tracker import CaseTracker
+
+    # Stage latencies and token usage of every answer, for the results store.
+    tracker = CaseTracker()
 
     results: List[Dict[str, Any]] = []
+    pending: List[Dict[str, Any]] = []
 
     for case in tests:
         q = case["question"]
@@ -181,7 +400,8 @@ def run_evaluation():
         print(f"Test {case['id']} – {case['type']}")
         print(f"Q: {q}")
 
-        system_result = manager.answer(q)
+        with tracker.track() as usage:
+            system_result = manager.answer(q)
         system_answer = system_result["answer"]
 
         # Concatenate retrieved context snippets
@@ -190,31 +410,47 @@ def run_evaluation():
             s.get("text", "") for s in sources if s.get("text")
         )
 
-        judge_result = judge_case(
-            client,
-            question=q,
-            ground_truth=gt,
-            system_answer=system_answer,
-            context_text=context_text,
-        )
-
-        # Merge and print
         record = {
             "id": case["id"],
             "type": case["type"],
             "question": q,
             "ground_truth": gt,
             "system_answer": system_answer,
-            **judge_result,
+            "chosen_agent": system_result.get("chosen_agent"),
+            **usage,
         }
+        if "context_tokens_saved" in system_result:
+            record["context_tokens"] = system_result["context_tokens"]
+            record["context_tokens_saved"] = system_result["context_tokens_saved"]
         results.append(record)
-
+        pending.append({
+            "id": case["id"],
+            "question": q,
+            "ground_truth": gt,
+            "system_answer": system_answer,
+            "context_text": context_text,
+        })
         print(f"System answer: {system_answer}")
+
+    # Judge all answers: JUDGE_MODE=batch (default) packs several cases into
+    # each judge call, sized by JUDGE_BATCH_TOKENS; "single" judges one by one.
+    judge_mode = os.getenv("JUDGE_MODE", "batch")
+    judgements, judge_stats = judge_cases(
+        client,
+        pending,
+        mode=judge_mode,
+        token_budget=int(os.getenv("JUDGE_BATCH_TOKENS", DEFAULT_JUDGE_BATCH_TOKENS)),
+    )
+
+    print("\n" + "=" * 80)
+    for record, judge_result in zip(results, judgements):
+        record.update(judge_result)
         llm_corr = judge_result.get('llm_correctness', judge_result.get('correctness_score', 'N/A'))
         print(
-            f"Metrics: llm_correctness={llm_corr}, "
+            f"Test {record['id']} metrics: llm_correctness={llm_corr}, "
             f"exact_match={judge_result.get('exact_match', 0)}, "
-            f"context_hit={judge_result.get('context_hit', 0)}"
+            f"context_hit={judge_result.get('context_hit', 0)}, "
+            f"token_f1={judge_result.get('token_f1', 0):.2f}"
         )
 
     # Compute simple averages for all metrics
@@ -226,6 +462,8 @@ def run_evaluation():
     avg_rec = 0.0
     avg_exact = 0.0
     avg_context = 0.0
+    avg_f1 = 0.0
+    avg_containment = 0.0
     
     if scored:
         # Handle both old and new field names
@@ -238,6 +476,8 @@ def run_evaluation():
     if results:
         avg_exact = sum(r.get("exact_match", 0) for r in results) / len(results)
         avg_context = sum(r.get("context_hit", 0) for r in results) / len(results)
+        avg_f1 = sum(r.get("token_f1", 0) for r in results) / len(results)
+        avg_containment = sum(r.get("ngram_containment", 0) for r in results) / len(results)
 
     print("\n" + "=" * 80)
     print("Summary Metrics (averages over all test cases):")
@@ -246,6 +486,8 @@ def run_evaluation():
     print(f"{'llm_correctness':<20} {avg_llm_corr:<10.2f}")
     print(f"{'exact_match':<20} {avg_exact:<10.2f}")
     print(f"{'context_hit':<20} {avg_context:<10.2f}")
+    print(f"{'token_f1':<20} {avg_f1:<10.2f}")
+    print(f"{'ngram_containment':<20} {avg_containment:<10.2f}")
     if scored:
         print(f"{'relevance_score':<20} {avg_rel:<10.2f}")
         print(f"{'recall_score':<20} {avg_rec:<10.2f}")
@@ -258,6 +500,8 @@ def run_evaluation():
             "llm_correctness": avg_llm_corr,
             "exact_match": avg_exact,
             "context_hit": avg_context,
+            "token_f1": avg_f1,
+            "ngram_containment": avg_containment,
             "relevance_score": avg_rel,
             "recall_score": avg_rec,
         },
@@ -269,6 +513,54 @@ def run_evaluation():
     
     print(f"\n✅ Evaluation report written to: {report_path}")
 
+    # Append the run to the results store (compare runs with scripts/eval_runs.py).
+    from results_store import ResultsStore
+
+    store = ResultsStore()
+    run_id = store.append_run(results, judge_stats={"mode": judge_mode, **judge_stats})
+    print(f"Run stored as {run_id} in {store.directory}")
+
+    print(
+        f"Judge ({judge_mode}): {judge_stats['calls']} calls "
+        f"({judge_stats['batch_calls']} batched, {judge_stats['rejudged']} cases re-judged), "
+        f"{judge_stats['prompt_tokens']} prompt + {judge_stats['completion_tokens']} completion tokens"
+    )
+
+    packed = [r for r in results if "context_tokens_saved" in r]
+    if packed:
+        saved = sum(r["context_tokens_saved"] for r in packed)
+        print(
+            f"Context packing: {saved} prompt tokens saved over {len(packed)} "
+            f"needle queries ({saved / len(packed):.0f} per query)"
+        )
+
+    retrieval_cache = _engines.get("retrieval_cache")
+    if retrieval_cache is not None:
+        stats = retrieval_cache.stats()
+        print(
+            f"Retrieval cache: {stats['memory_hits']} memory hits, {stats['disk_hits']} "
+            f"disk hits, {stats['misses']} misses, hit rate {stats['hit_rate']:.0%}"
+        )
+
+    speculator = getattr(manager, "speculator", None)
+    if speculator is not None and speculator.stats()["speculated"]:
+        stats = speculator.stats()
+        print(
+            f"Speculation: {stats['speculated']} borderline questions, needle won "
+            f"{stats['needle_won']} ({stats['needle_win_rate']:.0%}), {stats['summary_cancelled']} "
+            f"summaries cancelled in flight, {stats['interrupted_events']} summary steps skipped"
+        )
+
+    from llm_recorder import get_llm_recorder
+
+    recorder = get_llm_recorder()
+    if recorder is not None:
+        stats = recorder.stats()
+        print(
+            f"LLM cache ({stats['mode']}): {stats['hits']} hits, "
+            f"{stats['misses']} misses, hit rate {stats['hit_rate']:.0%}"
+        )
+
 
 if __name__ == "__main__":
     run_evaluation()
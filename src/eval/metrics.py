@@ -0,0 +1,243 @@
+"""
+Bulk lexical metrics for evaluation runs and offline retrieval sweeps.
+
+Scoring each row on its own would normalize both strings and build Python
+sets on every call. ``TokenCorpus`` instead normalizes and tokenizes each
+distinct text once (ground truths and contexts
+repeat across retriever variants), stores token ids in flat integer arrays
+with per-text offsets, and ``evaluate`` computes every metric for all
+(prediction, ground truth, context) rows in one pass with NumPy:
+
+- ``exact_match``: normalized prediction == normalized ground truth;
+- ``token_f1``: SQuAD-style token F1 (multiset overlap) of prediction vs truth;
+- ``recall_overlap``: share of the truth's distinct tokens found in the context;
+- ``ngram_containment``: share of the truth's distinct n-grams (default
+  bigrams) found in the context, i.e. word order matters; truths shorter than
+  n tokens fall back to ``recall_overlap``;
+- ``context_hit``: substring match for short truths, ``recall_overlap >=
+  0.7`` otherwise.
+
+Normalization: lowercase, punctuation removed, whitespace collapsed.
+"""
+
+import re
+from array import array
+from typing import Any, Dict, Iterable, List, Sequence, Tuple
+
+import numpy as np
+
+
+METRICS = ("exact_match", "token_f1", "recall_overlap", "ngram_containment", "context_hit")
+CONTEXT_HIT_OVERLAP = 0.7
+# Normalized truths shorter than this are matched as substrings by context_hit.
+SHORT_TRUTH_CHARS = 20
+
+_PUNCT_RE = re.compile(r"[^\w\s]")
+# Multiplier for folding (row, n token ids) into one uint64 key: injective
+# for unigrams (token ids < 2**32), a 64-bit hash for longer n-grams.
+_KEY_MULTIPLIER = np.uint64((1 << 32) + 15)
+
+
+def normalize_text(text: str) -> str:
+    """Lowercase, remove punctuation, collapse whitespace (as the judge does)."""
+    return " ".join(_PUNCT_RE.sub("", text.lower()).split())
+
+
+def _unique_rows(pairs: np.ndarray, keys: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Distinct (pair, key) rows, sorted, with their multiplicities."""
+    if not len(pairs):
+        empty = np.empty(0, dtype=np.int64)
+        return empty, keys[:0], empty
+    order = np.lexsort((keys, pairs))
+    pairs, keys = pairs[order], keys[order]
+    starts = np.ones(len(pairs), dtype=bool)
+    starts[1:] = (pairs[1:] != pairs[:-1]) | (keys[1:] != keys[:-1])
+    first = np.flatnonzero(starts)
+    counts = np.diff(np.append(first, len(pairs)))
+    return pairs[first], keys[first], counts
+
+
+def _matches(
+    a: Tuple[np.ndarray, np.ndarray, np.ndarray],
+    b: Tuple[np.ndarray, np.ndarray, np.ndarray],
+) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """(pair, count in a, count in b) for rows present in both distinct-row sets."""
+    pairs = np.concatenate([a[0], b[0]])
+    keys = np.concatenate([a[1], b[1]])
+    counts = np.concatenate([a[2], b[2]])
+    side = np.concatenate([np.zeros(len(a[0]), np.int8), np.ones(len(b[0]), np.int8)])
+    order = np.lexsort((side, keys, pairs))
+    pairs, keys, counts = pairs[order], keys[order], counts[order]
+    # Both inputs are distinct, so a shared row is an a-row followed by a b-row.
+    hit = (pairs[1:] == pairs[:-1]) & (keys[1:] == keys[:-1])
+    return pairs[1:][hit], counts[:-1][hit], counts[1:][hit]
+
+
+class TokenCorpus:
+    """
+    Interned, tokenized texts: each distinct text is normalized once and its
+    token ids appended to one flat array.
+    """
+
+    def __init__(self):
+        self.vocab: Dict[str, int] = {}
+        self._text_ids: Dict[str, int] = {}
+        self._normalized_ids: Dict[str, int] = {}
+        self.normalized: List[str] = []
+        self.normalized_id = array("q")
+        self.starts = array("q")
+        self.lengths = array("q")
+        self.tokens = array("q")
+
+    def __len__(self) -> int:
+        return len(self.starts)
+
+    def add(self, text: str) -> int:
+        """Text id of ``text``, tokenizing it on first sight."""
+        text_id = self._text_ids.get(text)
+        if text_id is not None:
+            return text_id
+        normalized = normalize_text(text)
+        text_id = self._text_ids[text] = len(self.starts)
+        norm_id = self._normalized_ids.get(normalized)
+        if norm_id is None:
+            norm_id = self._normalized_ids[normalized] = len(self._normalized_ids)
+        self.normalized.append(normalized)
+        self.normalized_id.append(norm_id)
+        words = normalized.split()
+        self.starts.append(len(self.tokens))
+        self.lengths.append(len(words))
+        vocab = self.vocab
+        for word in set(words).difference(vocab):
+            vocab[word] = len(vocab)
+        self.tokens.extend(map(vocab.__getitem__, words))
+        return text_id
+
+    def add_all(self, texts: Iterable[str]) -> np.ndarray:
+        return np.fromiter((self.add(t) for t in texts), dtype=np.int64)
+
+    def _gather(self, text_ids: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """(row index, position in text, token id) for every token of every row."""
+        starts = np.frombuffer(self.starts, dtype=np.int64)[text_ids]
+        lengths = np.frombuffer(self.lengths, dtype=np.int64)[text_ids]
+        rows = np.repeat(np.arange(len(text_ids)), lengths)
+        row_offsets = np.repeat(np.cumsum(lengths) - lengths, lengths)
+        positions = np.arange(len(rows)) - row_offsets
+        tokens = np.frombuffer(self.tokens, dtype=np.int64)[np.repeat(starts, lengths) + positions]
+        return rows, positions, tokens
+
+    def _ngram_keys(self, text_ids: np.ndarray, n: int) -> Tuple[np.ndarray, np.ndarray]:
+        """(row index, (row, n-gram) key) for every n-gram inside each row's text."""
+        rows, positions, tokens = self._gather(text_ids)
+        lengths = np.frombuffer(self.lengths, dtype=np.int64)[text_ids][rows]
+        valid = np.flatnonzero(positions <= lengths - n)
+        # Wrapping uint64 arithmetic (numpy does not raise on overflow here).
+        keys = rows[valid].astype(np.uint64)
+        for k in range(n):
+            keys = keys * _KEY_MULTIPLIER + tokens[valid + k].astype(np.uint64)
+        return rows[valid], keys
+
+    def _set_recall(self, truth_ids: np.ndarray, context_ids: np.ndarray, n: int) -> Tuple[np.ndarray, np.ndarray]:
+        """(share of each truth's distinct n-grams found in its context, n-gram count)."""
+        size = len(truth_ids)
+        truth_rows, truth_keys = self._ngram_keys(truth_ids, n)
+        truth_keys, first = np.unique(truth_keys, return_index=True)
+        truth_rows = truth_rows[first]
+        # Truths are short and contexts long: look every context key up in
+        # the sorted truth keys instead of sorting the contexts.
+        _, context_keys = self._ngram_keys(context_ids, n)
+        found = np.zeros(len(truth_keys), dtype=bool)
+        if len(truth_keys):
+            slots = np.minimum(np.searchsorted(truth_keys, context_keys), len(truth_keys) - 1)
+            found[slots[truth_keys[slots] == context_keys]] = True
+        hits = np.bincount(truth_rows[found], minlength=size)
+        total = np.bincount(truth_rows, minlength=size)
+        return np.divide(hits, total, out=np.zeros(size), where=total > 0), total
+
+    def _token_f1(self, prediction_ids: np.ndarray, truth_ids: np.ndarray) -> np.ndarray:
+        size = len(prediction_ids)
+        pred_rows, _, pred_tokens = self._gather(prediction_ids)
+        truth_rows, _, truth_tokens = self._gather(truth_ids)
+        rows, pred_counts, truth_counts = _matches(
+            _unique_rows(pred_rows, pred_tokens), _unique_rows(truth_rows, truth_tokens)
+        )
+        common = np.bincount(rows, weights=np.minimum(pred_counts, truth_counts), minlength=size)
+        pred_len = np.frombuffer(self.lengths, dtype=np.int64)[prediction_ids]
+        truth_len = np.frombuffer(self.lengths, dtype=np.int64)[truth_ids]
+        precision = np.divide(common, pred_len, out=np.zeros(size), where=pred_len > 0)
+        recall = np.divide(common, truth_len, out=np.zeros(size), where=truth_len > 0)
+        denominator = precision + recall
+        f1 = np.divide(2 * precision * recall, denominator, out=np.zeros(size), where=denominator > 0)
+        # An empty prediction or truth only scores when both are empty.
+        empty = (pred_len == 0) | (truth_len == 0)
+        f1[empty] = (pred_len[empty] == truth_len[empty]).astype(float)
+        return f1
+
+    def evaluate(
+        self,
+        predictions: Sequence[str],
+        ground_truths: Sequence[str],
+        contexts: Sequence[str],
+        ngram: int = 2,
+    ) -> Dict[str, np.ndarray]:
+        """All METRICS for aligned rows, as arrays of length ``len(predictions)``."""
+        if not len(predictions) == len(ground_truths) == len(contexts):
+            raise ValueError("predictions, ground_truths and contexts must have the same length")
+        prediction_ids = self.add_all(predictions)
+        truth_ids = self.add_all(ground_truths)
+        context_ids = self.add_all(contexts)
+        normalized_id = np.frombuffer(self.normalized_id, dtype=np.int64)
+
+        recall_overlap, _ = self._set_recall(truth_ids, context_ids, 1)
+        if ngram > 1:
+            containment, ngrams = self._set_recall(truth_ids, context_ids, ngram)
+            containment = np.where(ngrams > 0, containment, recall_overlap)
+        else:
+            containment = recall_overlap
+
+        context_hit = recall_overlap >= CONTEXT_HIT_OVERLAP
+        for row, (truth_id, context_id) in enumerate(zip(truth_ids, context_ids)):
+            truth = self.normalized[truth_id]
+            if len(truth) < SHORT_TRUTH_CHARS:
+                context_hit[row] = truth in self.normalized[context_id]
+
+        return {
+            "exact_match": (normalized_id[prediction_ids] == normalized_id[truth_ids]).astype(np.int8),
+            "token_f1": self._token_f1(prediction_ids, truth_ids),
+            "recall_overlap": recall_overlap,
+            "ngram_containment": containment,
+            "context_hit": context_hit.astype(np.int8),
+        }
+
+
+def evaluate_rows(
+    rows: Sequence[Dict[str, Any]],
+    prediction_key: str = "system_answer",
+    truth_key: str = "ground_truth",
+    context_key: str = "context_text",
+    ngram: int = 2,
+    corpus: "TokenCorpus | None" = None,
+) -> Dict[str, np.ndarray]:
+    """``TokenCorpus.evaluate`` over result dicts (e.g. every case x variant of a sweep)."""
+    corpus = corpus if corpus is not None else TokenCorpus()
+    return corpus.evaluate(
+        [row[prediction_key] for row in rows],
+        [row[truth_key] for row in rows],
+        [row.get(context_key) or "" for row in rows],
+        ngram=ngram,
+    )
+
+
+def summarize(metrics: Dict[str, np.ndarray], groups: Sequence[Any]) -> Dict[Any, Dict[str, float]]:
+    """Mean of every metric per group (e.g. per retriever variant), in one pass."""
+    labels, inverse = np.unique(np.asarray([str(g) for g in groups]), return_inverse=True)
+    sizes = np.bincount(inverse, minlength=len(labels))
+    originals = {str(g): g for g in groups}
+    summary: Dict[Any, Dict[str, float]] = {}
+    for i, label in enumerate(labels):
+        summary[originals[label]] = {"cases": int(sizes[i])}
+    for name, values in metrics.items():
+        means = np.bincount(inverse, weights=values.astype(float), minlength=len(labels)) / sizes
+        for i, label in enumerate(labels):
+            summary[originals[label]][name] = float(means[i])
+    return summary
@@ -0,0 +1,333 @@
+"""
+Append-only store of evaluation runs, and run-over-run comparison.
+
+``eval/eval_report.json`` only holds the latest run. ``ResultsStore`` keeps
+every run as one compressed NumPy archive under ``runs/`` next to the
+report (override with ``EVAL_RUNS_DIR``), written once and never rewritten:
+
+- a case table, one row per case: id, type, agent, quality metrics (judge
+  scores and lexical metrics, NaN when missing) and the answering LLM's
+  token usage;
+- a stage table, one row per (case, stage): latency in milliseconds for
+  ``answer`` (the whole call), ``retrieve``, ``synthesize``, ``llm`` and
+  ``embedding``;
+- the run's metadata: config (the pipeline's env toggles and git commit,
+  plus a short ``config_id`` hash of them) and judge call / token counts.
+
+``runs.jsonl`` lists the runs in the order they were written.
+
+``compare`` checks a candidate run against a baseline on the cases both
+ran: quality drops, p95 latency per stage, and tokens per case, each
+against a threshold in ``Gates``. ``scripts/eval_runs.py compare`` exits
+non-zero when any check fails, so it can gate a deployment.
+"""
+
+import hashlib
+import json
+import os
+import subprocess
+import time
+from pathlib import Path
+from typing import Any, Dict, List, NamedTuple, Optional, Sequence
+
+import numpy as np
+
+
+EVAL_DIR = Path(__file__).resolve().parent
+DEFAULT_RUNS_DIR = EVAL_DIR / "runs"
+
+# Quality metrics and the width of their scale (judge scores are 1-5).
+QUALITY_METRICS = {
+    "llm_correctness": 4.0,
+    "relevance_score": 4.0,
+    "recall_score": 4.0,
+    "exact_match": 1.0,
+    "context_hit": 1.0,
+    "token_f1": 1.0,
+    "ngram_containment": 1.0,
+}
+TOKEN_COLUMNS = ("prompt_tokens", "completion_tokens", "embedding_tokens")
+STAGES = ("answer", "retrieve", "synthesize", "llm", "embedding")
+
+# Env toggles that change what the pipeline does, recorded with every run.
+CONFIG_ENV = (
+    "CHUNKING_MODE",
+    "CHUNK_SIZES",
+    "LEAF_MAX_TOKENS",
+    "SIMILARITY_TOP_K",
+    "NEEDLE_RESPONSE_MODE",
+    "SUMMARY_RESPONSE_MODE",
+    "NODE_STORE",
+    "VECTOR_STORE",
+    "VECTOR_DTYPE",
+    "RETRIEVAL_MODE",
+    "RETRIEVAL_CACHE",
+    "CONTEXT_PACKING",
+    "CONTEXT_TOKEN_BUDGET",
+    "USE_REAL_MCP",
+    "ALLOW_MCP_FALLBACK",
+    "LLM_CACHE_MODE",
+    "JUDGE_MODE",
+    "JUDGE_BATCH_TOKENS",
+)
+
+
+class Gates(NamedTuple):
+    """Regression thresholds for ``compare``."""
+
+    # Largest allowed drop of a quality mean, as a fraction of its scale.
+    max_quality_drop: float = 0.05
+    # Largest allowed relative p95 increase of a stage latency...
+    max_latency_increase: float = 0.20
+    # ...ignored when the p95 grew by less than this (timer noise).
+    min_latency_ms: float = 50.0
+    # Largest allowed relative increase of mean tokens per case.
+    max_token_increase: float = 0.05
+    # Smallest share of the baseline's cases the candidate must also have run.
+    min_case_overlap: float = 0.5
+
+
+def current_config() -> Dict[str, Any]:
+    """Pipeline env toggles that are set, and the git commit of the tree."""
+    config: Dict[str, Any] = {name: os.environ[name] for name in CONFIG_ENV if name in os.environ}
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=EVAL_DIR, capture_output=True, text=True, timeout=5,
+        ).stdout.strip()
+    except (OSError, subprocess.SubprocessError):
+        commit = ""
+    if commit:
+        config["git_commit"] = commit
+    return config
+
+
+def config_id(config: Dict[str, Any]) -> str:
+    """Short hash of a config without its git commit (same toggles, same id)."""
+    toggles = {k: v for k, v in config.items() if k != "git_commit"}
+    return hashlib.sha1(json.dumps(toggles, sort_keys=True).encode("utf-8")).hexdigest()[:8]
+
+
+def _float_column(results: Sequence[Dict[str, Any]], key: str) -> np.ndarray:
+    """Numeric values of ``key`` (bools as 0/1), NaN where missing or not a number."""
+    values = [r.get(key) for r in results]
+    return np.array([float(v) if isinstance(v, (int, float)) else np.nan for v in values], dtype=np.float32)
+
+
+class Run:
+    """One stored run: metadata plus its case and stage columns."""
+
+    def __init__(self, run_id: str, meta: Dict[str, Any], columns: Dict[str, np.ndarray]):
+        self.run_id = run_id
+        self.meta = meta
+        self.columns = columns
+
+    @property
+    def case_ids(self) -> np.ndarray:
+        return self.columns["case_id"]
+
+    def case_values(self, name: str, case_ids: Sequence[str]) -> np.ndarray:
+        """Column ``name`` for ``case_ids``, in that order."""
+        rows = {case_id: i for i, case_id in enumerate(self.case_ids)}
+        return self.columns[name][[rows[c] for c in case_ids]]
+
+    def stage_latencies(self, stage: str, case_ids: Sequence[str]) -> np.ndarray:
+        """Latencies (ms) of ``stage`` for the cases in ``case_ids`` that ran it."""
+        names = list(self.columns["stage_names"])
+        if stage not in names:
+            return np.empty(0, dtype=np.float32)
+        wanted = np.isin(self.case_ids, np.asarray(case_ids, dtype=self.case_ids.dtype))
+        mask = (self.columns["stage_code"] == names.index(stage)) & wanted[self.columns["stage_case"]]
+        return self.columns["stage_ms"][mask]
+
+
+class ResultsStore:
+    """Append-only directory of run archives plus a ``runs.jsonl`` listing."""
+
+    def __init__(self, directory: Optional[Path] = None):
+        self.directory = Path(directory or os.getenv("EVAL_RUNS_DIR") or DEFAULT_RUNS_DIR)
+        self.index_path = self.directory / "runs.jsonl"
+
+    def append_run(
+        self,
+        results: Sequence[Dict[str, Any]],
+        config: Optional[Dict[str, Any]] = None,
+        judge_stats: Optional[Dict[str, Any]] = None,
+    ) -> str:
+        """
+        Store one run; ``results`` are the evaluation records (id, type,
+        chosen_agent, metric keys, token counts and ``stage_ms``).
+        Returns the new run id.
+        """
+        config = current_config() if config is None else config
+        cid = config_id(config)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        stamp = time.strftime("%Y%m%d-%H%M%S")
+        run_id = f"{stamp}-{cid}"
+        suffix = 1
+        while (self.directory / f"{run_id}.npz").exists():
+            suffix += 1
+            run_id = f"{stamp}-{cid}-{suffix}"
+
+        columns: Dict[str, np.ndarray] = {
+            "case_id": np.array([str(r["id"]) for r in results]),
+            "case_type": np.array([str(r.get("type", "")) for r in results]),
+            "agent": np.array([str(r.get("chosen_agent", "")) for r in results]),
+        }
+        for metric in QUALITY_METRICS:
+            columns[metric] = _float_column(results, metric)
+        for key in TOKEN_COLUMNS:
+            columns[key] = np.array([int(r.get(key) or 0) for r in results], dtype=np.int32)
+
+        stage_case: List[int] = []
+        stage_code: List[int] = []
+        stage_ms: List[float] = []
+        for row, record in enumerate(results):
+            for stage, ms in (record.get("stage_ms") or {}).items():
+                if stage in STAGES:
+                    stage_case.append(row)
+                    stage_code.append(STAGES.index(stage))
+                    stage_ms.append(ms)
+        columns["stage_names"] = np.array(STAGES)
+        columns["stage_case"] = np.array(stage_case, dtype=np.int32)
+        columns["stage_code"] = np.array(stage_code, dtype=np.int8)
+        columns["stage_ms"] = np.array(stage_ms, dtype=np.float32)
+
+        meta = {
+            "run_id": run_id,
+            "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "config_id": cid,
+            "config": config,
+            "cases": len(results),
+            "judge": dict(judge_stats or {}),
+        }
+        columns["meta"] = np.array(json.dumps(meta))
+
+        # Write under a temporary name, then rename: readers never see a
+        # partial archive, and an existing run is never overwritten.
+        path = self.directory / f"{run_id}.npz"
+        tmp = self.directory / f".{run_id}.npz.tmp"
+        with open(tmp, "wb") as f:
+            np.savez_compressed(f, **columns)
+        os.replace(tmp, path)
+
+        averages = {
+            metric: (None if np.all(np.isnan(columns[metric])) else round(float(np.nanmean(columns[metric])), 4))
+            for metric in QUALITY_METRICS
+        }
+        with open(self.index_path, "a", encoding="utf-8") as f:
+            f.write(json.dumps({**meta, "averages": averages}) + "\n")
+        return run_id
+
+    def runs(self) -> List[Dict[str, Any]]:
+        """Index entries of all runs, oldest first."""
+        if not self.index_path.exists():
+            return []
+        with open(self.index_path, "r", encoding="utf-8") as f:
+            return [json.loads(line) for line in f if line.strip()]
+
+    def resolve(self, ref: str) -> str:
+        """
+        Run id for ``ref``: a run id or unique prefix of one, ``latest``, or
+        ``latest~N`` (N runs before the latest).
+        """
+        ids = [entry["run_id"] for entry in self.runs()]
+        if ref == "latest" or ref.startswith("latest~"):
+            back = int(ref.partition("~")[2] or 0)
+            if back >= len(ids):
+                raise ValueError(f"Only {len(ids)} runs stored in {self.directory}")
+            return ids[-1 - back]
+        matches = [run_id for run_id in ids if run_id.startswith(ref)]
+        if len(matches) != 1:
+            raise ValueError(f"{ref!r} matches {len(matches)} runs in {self.directory}")
+        return matches[0]
+
+    def load(self, ref: str) -> Run:
+        run_id = self.resolve(ref)
+        with np.load(self.directory / f"{run_id}.npz", allow_pickle=False) as data:
+            columns = {name: data[name] for name in data.files}
+        meta = json.loads(str(columns.pop("meta")))
+        return Run(run_id, meta, columns)
+
+
+def _p95(values: np.ndarray) -> Optional[float]:
+    return float(np.percentile(values, 95)) if len(values) else None
+
+
+def compare(baseline: Run, candidate: Run, gates: Gates = Gates()) -> Dict[str, Any]:
+    """
+    Check ``candidate`` against ``baseline`` on the cases both ran.
+
+    Returns {"baseline", "candidate", "cases", "checks", "passed"}; each check
+    has "check", "baseline", "candidate", "limit" and "failed". With no
+    common cases, or fewer than ``gates.min_case_overlap`` of the baseline's,
+    the "common cases" check fails: the means would not be comparable.
+    """
+    baseline_ids = set(baseline.case_ids)
+    common = [c for c in candidate.case_ids if c in baseline_ids]
+    min_cases = gates.min_case_overlap * len(baseline_ids)
+    checks: List[Dict[str, Any]] = [{
+        "check": "common cases",
+        "baseline": float(len(baseline_ids)),
+        "candidate": float(len(common)),
+        "limit": min_cases,
+        "failed": not common or len(common) < min_cases,
+    }]
+    if not common:
+        return {
+            "baseline": baseline.run_id,
+            "candidate": candidate.run_id,
+            "cases": 0,
+            "checks": checks,
+            "passed": False,
+        }
+
+    for metric, scale in QUALITY_METRICS.items():
+        before = baseline.case_values(metric, common)
+        after = candidate.case_values(metric, common)
+        if np.all(np.isnan(before)) or np.all(np.isnan(after)):
+            continue
+        b, a = float(np.nanmean(before)), float(np.nanmean(after))
+        limit = b - gates.max_quality_drop * scale
+        checks.append({"check": f"{metric} mean", "baseline": b, "candidate": a, "limit": limit, "failed": a < limit})
+
+    for stage in STAGES:
+        b = _p95(baseline.stage_latencies(stage, common))
+        a = _p95(candidate.stage_latencies(stage, common))
+        if b is None or a is None:
+            continue
+        limit = max(b * (1 + gates.max_latency_increase), b + gates.min_latency_ms)
+        checks.append({"check": f"{stage} p95 ms", "baseline": b, "candidate": a, "limit": limit, "failed": a > limit})
+
+    token_totals = {"llm tokens/case": ("prompt_tokens", "completion_tokens"), "embedding tokens/case": ("embedding_tokens",)}
+    for label, keys in token_totals.items():
+        b = float(sum(baseline.case_values(k, common).astype(np.int64) for k in keys).mean())
+        a = float(sum(candidate.case_values(k, common).astype(np.int64) for k in keys).mean())
+        if b == 0 and a == 0:
+            continue
+        limit = b * (1 + gates.max_token_increase)
+        checks.append({"check": label, "baseline": b, "candidate": a, "limit": limit, "failed": a > limit})
+
+    return {
+        "baseline": baseline.run_id,
+        "candidate": candidate.run_id,
+        "cases": len(common),
+        "checks": checks,
+        "passed": not any(c["failed"] for c in checks),
+    }
+
+
+def format_comparison(report: Dict[str, Any]) -> str:
+    lines = [
+        f"Baseline {report['baseline']} vs candidate {report['candidate']} ({report['cases']} common cases)",
+        f"  {'check':<24} {'baseline':>10} {'candidate':>10} {'limit':>10}",
+    ]
+    for c in report["checks"]:
+        status = "FAIL" if c["failed"] else "ok"
+        lines.append(
+            f"  {c['check']:<24} {c['baseline']:>10.2f} {c['candidate']:>10.2f} {c['limit']:>10.2f}  {status}"
+        )
+    lines.append("PASSED" if report["passed"] else "REGRESSION: " + ", ".join(
+        c["check"] for c in report["checks"] if c["failed"]
+    ))
+    return "\n".join(lines)
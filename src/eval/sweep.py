@@ -0,0 +1,282 @@
+"""
+Parameter sweep over index and query-engine configs.
+
+Builds every variant of a grid of ``IndexConfig`` values (chunking, chunk
+sizes, leaf size, top-k, response modes), answers the test cases against
+all variants concurrently, scores them and prints a quality vs latency vs
+cost table with the Pareto-optimal variants marked.
+
+- Variants that differ only in response modes share one built index
+  (``IndexConfig.index_key``). The other variants are built one after
+  another through the process-wide embedding cache, so a chunk that
+  several variants share is embedded once.
+- Each variant answers its cases on its own worker thread (``--workers``).
+  ``CaseTracker`` times stages and counts tokens per thread.
+- Quality: lexical metrics for all cases x variants in one pass
+  (``metrics.evaluate_rows``). ``--judge`` adds the LLM judge, batched.
+- Every variant is appended to the results store as its own run, so any
+  two can be compared with ``scripts/eval_runs.py compare``.
+
+Usage:
+    python src/eval/sweep.py --top-k 4 6 8 --needle-response-mode compact refine
+    python src/eval/sweep.py --chunking tokens --chunk-sizes 1024,512,128 512,256,64 --judge
+"""
+
+import argparse
+import itertools
+import json
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+# Make sure we can import modules from src/
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+if str(PROJECT_ROOT) not in sys.path:
+    sys.path.append(str(PROJECT_ROOT))
+
+from indexing import DEFAULT_CHUNK_SIZES, IndexConfig  # noqa: E402
+
+from judge import DEFAULT_JUDGE_BATCH_TOKENS, load_test_cases, manager_for_engines  # noqa: E402
+
+
+def expand_grid(
+    chunking: Sequence[str],
+    chunk_sizes: Sequence[Tuple[int, ...]],
+    leaf_max_tokens: Sequence[Optional[int]],
+    top_k: Sequence[Optional[int]],
+    needle_response_modes: Sequence[str],
+    summary_response_modes: Sequence[str],
+) -> List[IndexConfig]:
+    """
+    Every combination, in order and without duplicates. Chunk sizes only
+    vary token chunking and leaf sizes only structure chunking.
+    """
+    configs: List[IndexConfig] = []
+    for mode in chunking:
+        sizes = chunk_sizes if mode == "tokens" else [DEFAULT_CHUNK_SIZES]
+        leaves = leaf_max_tokens if mode == "structure" else [None]
+        for combo in itertools.product(sizes, leaves, top_k, needle_response_modes, summary_response_modes):
+            config = IndexConfig(mode, *combo)
+            if config not in configs:
+                configs.append(config)
+    return configs
+
+
+def pareto_front(points: Sequence[Tuple[float, float, float]]) -> List[bool]:
+    """
+    For (quality, latency, cost) points, whether each one is Pareto-optimal:
+    no other point is at least as good on all three (higher quality, lower
+    latency and cost) and strictly better on one.
+    """
+    optimal = []
+    for q, lat, cost in points:
+        dominated = any(
+            q2 >= q and lat2 <= lat and cost2 <= cost and (q2 > q or lat2 < lat or cost2 < cost)
+            for q2, lat2, cost2 in points
+        )
+        optimal.append(not dominated)
+    return optimal
+
+
+def build_variants(configs: Sequence[IndexConfig]) -> List[Dict[str, Any]]:
+    """Build each distinct index once and a manager per config."""
+    from indexing import build_indexes, get_query_engines
+
+    built: Dict[Tuple[Any, ...], Dict[str, Any]] = {}
+    variants = []
+    for config in configs:
+        start = time.perf_counter()
+        key = config.index_key()
+        if key not in built:
+            built[key] = build_indexes(config)
+        engines = get_query_engines(config, indexes=built[key])
+        variants.append({
+            "config": config,
+            "manager": manager_for_engines(engines),
+            "build_seconds": time.perf_counter() - start,
+        })
+    return variants
+
+
+def answer_cases(variant: Dict[str, Any], tests: List[Dict[str, Any]], tracker: Any) -> List[Dict[str, Any]]:
+    """Answer every test case with one variant's manager (on the calling thread)."""
+    records = []
+    for case in tests:
+        with tracker.track() as usage:
+            system_result = variant["manager"].answer(case["question"])
+        sources = system_result.get("sources", [])
+        records.append({
+            "id": case["id"],
+            "type": case["type"],
+            "question": case["question"],
+            "ground_truth": case["ground_truth"],
+            "system_answer": system_result["answer"],
+            "context_text": "\n\n---\n\n".join(s.get("text", "") for s in sources if s.get("text")),
+            "chosen_agent": system_result.get("chosen_agent"),
+            **usage,
+        })
+    return records
+
+
+def _percentile(values: List[float], p: float) -> float:
+    import numpy as np
+
+    return float(np.percentile(values, p)) if values else 0.0
+
+
+def run_sweep(
+    configs: Sequence[IndexConfig],
+    workers: int = 4,
+    judge: bool = False,
+    objective: Optional[str] = None,
+    store: bool = True,
+) -> List[Dict[str, Any]]:
+    """Build, answer, score and summarize every config; returns one summary per variant."""
+    from case_tracker import CaseTracker
+    from embedding_cache import get_embedding_cache
+    from metrics import evaluate_rows
+
+    tests = load_test_cases()
+    variants = build_variants(configs)
+    cache = get_embedding_cache()
+    if cache is not None:
+        stats = cache.stats()
+        print(
+            f"Built {len(variants)} variants; embedding cache: {stats['hits']} hits, "
+            f"{stats['misses']} texts embedded"
+        )
+
+    tracker = CaseTracker()
+    with ThreadPoolExecutor(max_workers=max(1, workers), thread_name_prefix="variant") as pool:
+        answered = list(pool.map(lambda v: answer_cases(v, tests, tracker), variants))
+    tracker.close()
+
+    rows = [record for records in answered for record in records]
+    lexical = evaluate_rows(rows)
+    for i, record in enumerate(rows):
+        for metric in ("exact_match", "context_hit"):
+            record[metric] = int(lexical[metric][i])
+        for metric in ("token_f1", "ngram_containment"):
+            record[metric] = round(float(lexical[metric][i]), 4)
+
+    if judge:
+        from judge import build_judge_client, judge_cases
+
+        pending = [
+            {**record, "id": f"{v}:{record['id']}"}
+            for v, records in enumerate(answered)
+            for record in records
+        ]
+        judgements, _ = judge_cases(
+            build_judge_client(),
+            pending,
+            mode=os.getenv("JUDGE_MODE", "batch"),
+            token_budget=int(os.getenv("JUDGE_BATCH_TOKENS", DEFAULT_JUDGE_BATCH_TOKENS)),
+        )
+        for record, judgement in zip(rows, judgements):
+            record.update(judgement)
+
+    objective = objective or ("llm_correctness" if judge else "token_f1")
+    summaries = []
+    for variant, records in zip(variants, answered):
+        config: IndexConfig = variant["config"]
+        latencies = [r["stage_ms"]["answer"] for r in records]
+        scores = [r.get(objective) for r in records if r.get(objective) is not None]
+        summary = {
+            "variant": config.label(),
+            "config": config._asdict(),
+            "build_seconds": round(variant["build_seconds"], 3),
+            "quality": sum(scores) / len(scores) if scores else 0.0,
+            "p50_ms": _percentile(latencies, 50),
+            "p95_ms": _percentile(latencies, 95),
+            "tokens_per_case": sum(r["prompt_tokens"] + r["completion_tokens"] for r in records) / len(records),
+        }
+        for metric in ("exact_match", "token_f1", "ngram_containment", "context_hit"):
+            summary[metric] = sum(r[metric] for r in records) / len(records)
+        if store:
+            from results_store import ResultsStore, current_config
+
+            summary["run_id"] = ResultsStore().append_run(
+                records, config={**current_config(), **{f"index.{k}": v for k, v in config._asdict().items()}}
+            )
+        summaries.append(summary)
+
+    front = pareto_front([(s["quality"], s["p95_ms"], s["tokens_per_case"]) for s in summaries])
+    for summary, optimal in zip(summaries, front):
+        summary["pareto"] = optimal
+    summaries.sort(key=lambda s: (-s["quality"], s["p95_ms"], s["tokens_per_case"]))
+    for summary in summaries:
+        summary["objective"] = objective
+    return summaries
+
+
+def format_table(summaries: List[Dict[str, Any]]) -> str:
+    objective = summaries[0]["objective"] if summaries else "quality"
+    lines = [
+        f"{'':1} {'variant':<44} {objective[:15]:>15} {'em':>5} {'f1':>5} {'hit':>5} "
+        f"{'p50 ms':>8} {'p95 ms':>8} {'tokens/case':>11}"
+    ]
+    for s in summaries:
+        lines.append(
+            f"{'*' if s['pareto'] else ' ':1} {s['variant']:<44} {s['quality']:>15.3f} "
+            f"{s['exact_match']:>5.2f} {s['token_f1']:>5.2f} {s['context_hit']:>5.2f} "
+            f"{s['p50_ms']:>8.0f} {s['p95_ms']:>8.0f} {s['tokens_per_case']:>11.0f}"
+        )
+    lines.append(f"* Pareto-optimal on ({objective}, p95 latency, tokens per case)")
+    return "\n".join(lines)
+
+
+def _chunk_sizes(text: str) -> Tuple[int, ...]:
+    return tuple(int(s) for s in text.split(","))
+
+
+def _optional_int(text: str) -> Optional[int]:
+    return None if text in ("", "default") else int(text)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--chunking", nargs="+", choices=("structure", "tokens"),
+                        default=[os.getenv("CHUNKING_MODE", "structure")])
+    parser.add_argument("--chunk-sizes", nargs="+", type=_chunk_sizes, default=[DEFAULT_CHUNK_SIZES],
+                        help="Token hierarchies, e.g. 1024,512,128 (tokens chunking)")
+    parser.add_argument("--leaf-max-tokens", nargs="+", type=_optional_int, default=[None],
+                        help="Paragraph leaf caps (structure chunking)")
+    parser.add_argument("--top-k", nargs="+", type=_optional_int, default=[None], help="similarity_top_k values")
+    parser.add_argument("--needle-response-mode", nargs="+", default=["compact"])
+    parser.add_argument("--summary-response-mode", nargs="+", default=["tree_summarize"])
+    parser.add_argument("--workers", type=int, default=4, help="Variants answered concurrently")
+    parser.add_argument("--judge", action="store_true", help="Also score answers with the LLM judge")
+    parser.add_argument("--objective", help="Quality metric of the Pareto table (default: llm_correctness with --judge, else token_f1)")
+    parser.add_argument("--no-store", action="store_true", help="Do not append the variants to the results store")
+    parser.add_argument("--output", type=Path, help="Also write the summaries as JSON")
+    args = parser.parse_args(argv)
+
+    configs = expand_grid(
+        args.chunking,
+        args.chunk_sizes,
+        args.leaf_max_tokens,
+        args.top_k,
+        args.needle_response_mode,
+        args.summary_response_mode,
+    )
+    print(f"Sweeping {len(configs)} variants")
+    summaries = run_sweep(
+        configs,
+        workers=min(args.workers, len(configs)),
+        judge=args.judge,
+        objective=args.objective,
+        store=not args.no_store,
+    )
+    print(format_table(summaries))
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(summaries, f, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,30 +1,86 @@
+from __future__ import annotations
+
+import hashlib
 import os
-import re
 from pathlib import Path
-from typing import List, Dict, Any
+from typing import TYPE_CHECKING, List, Dict, Any, NamedTuple, Optional, Tuple
 
 from dotenv import load_dotenv
 
-from llama_index.core import (
-    SimpleDirectoryReader,
-    StorageContext,
-    VectorStoreIndex,
-    SummaryIndex,
-    Settings,
-    Document,
-)
-from llama_index.core.node_parser import HierarchicalNodeParser, get_leaf_nodes
-from llama_index.core.retrievers import AutoMergingRetriever
-from llama_index.core.schema import TextNode
-from llama_index.llms.openai import OpenAI
-from llama_index.embeddings.openai import OpenAIEmbedding
-from llama_index.core.query_engine import RetrieverQueryEngine
+from markdown_tree import MarkdownTree, parse_markdown
+from profiling import profiled
+from startup import get_startup_timer
+
+# LlamaIndex, the OpenAI integrations and the retrieval modules built on them
+# are imported inside the functions that use them, so importing this module
+# (e.g. to start the CLI) does not pay several seconds for them up front.
+if TYPE_CHECKING:
+    from llama_index.core import Document
+    from llama_index.core.schema import TextNode
+
+    from claims import ClaimTexts
 
 
 # Paths
 PROJECT_ROOT = Path(__file__).resolve().parent.parent
 DATA_DIR = PROJECT_ROOT / "data"
 
+DEFAULT_CHUNK_SIZES = (1024, 512, 128)
+
+
+def _env_int(name: str) -> Optional[int]:
+    value = os.getenv(name)
+    return int(value) if value else None
+
+
+class IndexConfig(NamedTuple):
+    """
+    Chunking, retrieval and synthesis parameters of the indexes and query
+    engines. The defaults are the values that used to be hard-coded; None
+    means the default of the module that owns the parameter.
+    """
+
+    # "structure" (heading-aligned hierarchy) or "tokens" (token-size hierarchy)
+    chunking: str = "structure"
+    # Hierarchy chunk sizes, chunking="tokens" only
+    chunk_sizes: Tuple[int, ...] = DEFAULT_CHUNK_SIZES
+    # Paragraph leaf cap, chunking="structure" only (structure_chunker default)
+    leaf_max_tokens: Optional[int] = None
+    # Leaves fetched per needle query (adaptive_retriever.DEFAULT_MAX_K)
+    similarity_top_k: Optional[int] = None
+    needle_response_mode: str = "compact"
+    summary_response_mode: str = "tree_summarize"
+
+    @classmethod
+    def from_env(cls) -> "IndexConfig":
+        """
+        Defaults overridden by CHUNKING_MODE, CHUNK_SIZES (e.g. "1024,512,128"),
+        LEAF_MAX_TOKENS, SIMILARITY_TOP_K, NEEDLE_RESPONSE_MODE and
+        SUMMARY_RESPONSE_MODE.
+        """
+        chunk_sizes = os.getenv("CHUNK_SIZES")
+        return cls(
+            chunking=os.getenv("CHUNKING_MODE", "structure"),
+            chunk_sizes=tuple(int(s) for s in chunk_sizes.split(",")) if chunk_sizes else DEFAULT_CHUNK_SIZES,
+            leaf_max_tokens=_env_int("LEAF_MAX_TOKENS"),
+            similarity_top_k=_env_int("SIMILARITY_TOP_K"),
+            needle_response_mode=os.getenv("NEEDLE_RESPONSE_MODE", "compact"),
+            summary_response_mode=os.getenv("SUMMARY_RESPONSE_MODE", "tree_summarize"),
+        )
+
+    def index_key(self) -> Tuple[Any, ...]:
+        """The fields that change the built indexes and retrievers (not the response modes)."""
+        chunking = self.chunk_sizes if self.chunking == "tokens" else self.leaf_max_tokens
+        return (self.chunking, chunking, self.similarity_top_k)
+
+    def label(self) -> str:
+        if self.chunking == "tokens":
+            chunking = "tokens " + "/".join(str(s) for s in self.chunk_sizes)
+        else:
+            chunking = f"structure {self.leaf_max_tokens or 'default'}"
+        k = self.similarity_top_k or "default"
+        return f"{chunking}, k={k}, {self.needle_response_mode}/{self.summary_response_mode}"
+
 
 def parse_markdown_table(table_text: str, table_name: str) -> List[Dict[str, Any]]:
     """
@@ -37,50 +93,10 @@ def parse_markdown_table(table_text: str, table_name: str) -> List[Dict[str, Any
     Returns:
         List of dictionaries, each representing a row with headers as keys
     """
-    # Split by lines and filter out empty lines
-    all_lines = table_text.strip().split('\n')
-    lines = []
-    for line in all_lines:
-        stripped = line.strip()
-        if stripped:  # Only include non-empty lines
-            lines.append(stripped)
-    
-    if len(lines) < 2:
-        return []
-    
-    # Find the separator line (e.g., |---|---|)
-    separator_idx = None
-    for i, line in enumerate(lines):
-        if re.match(r'^\|[\s\-\|:]+\|$', line):
-            separator_idx = i
-            break
-    
-    if separator_idx is None or separator_idx == 0:
-        return []
-    
-    # Extract headers (line before separator)
-    header_line = lines[separator_idx - 1]
-    if not header_line.startswith('|'):
-        return []
-    headers = [h.strip() for h in header_line.split('|')[1:-1]]
-    
-    if not headers:
-        return []
-    
-    # Extract rows (lines after separator)
-    rows = []
-    for line in lines[separator_idx + 1:]:
-        if not line.startswith('|'):
-            continue
-        cells = [c.strip() for c in line.split('|')[1:-1]]
-        # Allow rows with same or fewer cells (pad with empty strings)
-        while len(cells) < len(headers):
-            cells.append('')
-        if len(cells) >= len(headers):
-            row_dict = dict(zip(headers, cells[:len(headers)]))
-            rows.append(row_dict)
-    
-    return rows
+    tree = parse_markdown(table_text)
+    for _, table in tree.iter_tables():
+        return table.row_dicts()
+    return []
 
 
 def serialize_table_row(row: Dict[str, str], headers: List[str], table_name: str) -> str:
@@ -93,68 +109,75 @@ def serialize_table_row(row: Dict[str, str], headers: List[str], table_name: str
     return ", ".join(parts)
 
 
-def extract_and_serialize_tables(documents: List[Document]) -> List[TextNode]:
+def parse_documents(documents: List[Document]) -> List[MarkdownTree]:
+    """
+    Parse every document once into a markdown section tree.
+
+    The trees are shared by the table-row extraction and the chunker so the
+    raw text is only scanned a single time per document.
+    """
+    return [parse_markdown(doc.get_content()) for doc in documents]
+
+
+def collect_claim_texts(documents: List[Document], trees: List[MarkdownTree]) -> "ClaimTexts":
+    """
+    The markdown claim documents by file, for date extraction scoped to the
+    claim a question is about.
+
+    Documents without any headings (e.g. a PDF read as raw bytes) are skipped;
+    the date tools only need the structured timeline text.
+    """
+    from claims import ClaimTexts
+
+    texts: Dict[str, str] = {}
+    for doc, tree in zip(documents, trees):
+        if tree.root.children:
+            file = doc.metadata.get("file_path", doc.doc_id)
+            texts[file] = f"{texts[file]}\n\n{tree.text}" if file in texts else tree.text
+    return ClaimTexts(texts)
+
+
+def extract_and_serialize_tables(
+    documents: List[Document],
+    trees: Optional[List[MarkdownTree]] = None,
+) -> List[TextNode]:
     """
     Detect markdown tables in documents, serialize rows, and create nodes.
     
     Returns a list of TextNode objects, one per table row, with metadata.
+    Pass ``trees`` (from ``parse_documents``) to reuse already-parsed documents.
     """
+    from llama_index.core.schema import TextNode
+
+    from structure_chunker import make_node_id
+
+    if trees is None:
+        trees = parse_documents(documents)
+
     table_nodes = []
     
-    for doc in documents:
-        text = doc.get_content()
-        
-        # Find all markdown tables (look for | header | patterns)
-        # Match table blocks: header row (optional blank line), separator, data rows
-        # Allow blank lines between header and separator
-        table_pattern = r'(\|.+\|\n(?:\s*\n)?\|[\s\-\|:]+\|\n(?:\|.+\|\n?)+)'
-        tables = re.finditer(table_pattern, text, re.MULTILINE)
-        
-        # Also try to find table names from preceding headers
-        lines = text.split('\n')
-        
-        for match in tables:
-            table_text = match.group(1)
-            table_start_pos = match.start()
-            
-            # Find the table name by looking backwards for a header
-            table_name = "Unknown Table"
-            # Find which line the table starts on
-            text_before = text[:table_start_pos]
-            line_num = text_before.count('\n')
-            
-            # Look backwards from the table for a header (up to 5 lines back)
-            for i in range(max(0, line_num - 5), line_num):
-                if i < len(lines):
-                    line = lines[i]
-                    if line.startswith('###') and 'Table' in line:
-                        # Extract table name (e.g., "Table 1 — Event Ledger")
-                        table_name_match = re.search(r'Table \d+[^—]*—\s*(.+)', line)
-                        if table_name_match:
-                            table_name = table_name_match.group(1).strip()
-                        else:
-                            # Fallback: use the header text
-                            table_name = line.replace('###', '').strip()
-                        break
-            
-            # Parse the table
-            rows = parse_markdown_table(table_text, table_name)
-            if not rows:
+    for doc, tree in zip(documents, trees):
+        for _, table in tree.iter_tables():
+            if not table.rows:
                 continue
-            
-            # Get headers from first row keys
-            headers = list(rows[0].keys()) if rows else []
+
+            headers = table.headers
             
             # Create a node for each row
-            for row_idx, row in enumerate(rows):
-                row_sentence = serialize_table_row(row, headers, table_name)
+            for row_idx, row in enumerate(table.row_dicts()):
+                row_sentence = serialize_table_row(row, headers, table.name)
                 
                 # Create node with metadata
+                span = table.rows[row_idx]
                 node = TextNode(
+                    # Same id as the structure chunker gives the row.
+                    id_=make_node_id(doc.metadata.get("file_path", doc.doc_id), "table_row", span.start, span.end),
                     text=row_sentence,
+                    start_char_idx=table.rows[row_idx].start,
+                    end_char_idx=table.rows[row_idx].end,
                     metadata={
                         "node_type": "table_row",
-                        "table": table_name,
+                        "table": table.name,
                         "row_index": row_idx,
                         "source": doc.metadata.get("file_path", "unknown"),
                     }
@@ -164,6 +187,94 @@ def extract_and_serialize_tables(documents: List[Document]) -> List[TextNode]:
     return table_nodes
 
 
+def claims_reader_kwargs() -> Dict[str, Any]:
+    """
+    ``SimpleDirectoryReader`` arguments for the claim documents: CLAIMS_DIR
+    (default data/), CLAIMS_RECURSIVE=1 to include subdirectories (e.g. a
+    corpus from scripts/generate_claim_corpus.py) and CLAIMS_EXTS to only
+    read some file types (e.g. ".md,.pdf").
+    """
+    exts = os.getenv("CLAIMS_EXTS")
+    return {
+        "input_dir": os.getenv("CLAIMS_DIR") or str(DATA_DIR),
+        "recursive": os.getenv("CLAIMS_RECURSIVE", "0") == "1",
+        "required_exts": [e.strip() for e in exts.split(",")] if exts else None,
+    }
+
+
+class ChunkedDocuments(NamedTuple):
+    """Loaded documents with their section trees and nodes (see ``chunk_documents``)."""
+
+    documents: List[Document]
+    trees: List[MarkdownTree]
+    # Every node of the hierarchy, parents and leaves
+    nodes: List[TextNode]
+    # The nodes to embed
+    leaf_nodes: List[TextNode]
+    # Table-row leaves kept outside the hierarchy (chunking="tokens" only)
+    table_row_nodes: List[TextNode]
+
+
+def _chunk_node_id(i: int, parent: "TextNode") -> str:
+    """Id of the i-th chunk split from ``parent`` (a document or a larger chunk)."""
+    from llama_index.core import Document
+
+    from structure_chunker import make_node_id
+
+    if isinstance(parent, Document):
+        # Document ids are random too: identify it by file and content.
+        digest = hashlib.sha1(parent.get_content().encode("utf-8")).hexdigest()
+        source = f"{parent.metadata.get('file_path', '')}|{digest}"
+    else:
+        source = parent.node_id
+    return make_node_id(source, "chunk", i, i)
+
+
+def chunk_documents(documents: List[Document], config: IndexConfig) -> ChunkedDocuments:
+    """
+    Parse each document once into a section tree and build its hierarchical
+    nodes as configured by ``config``.
+    """
+    from llama_index.core.node_parser import HierarchicalNodeParser, get_leaf_nodes
+
+    from structure_chunker import DEFAULT_LEAF_MAX_TOKENS, get_structure_nodes
+
+    trees = parse_documents(documents)
+
+    # Build hierarchical nodes (multi-granularity chunking)
+    if config.chunking == "tokens":
+        # Legacy token-size hierarchy: [1024, 512, 128]-token chunks by
+        # default, with table rows serialized separately and added as extra
+        # atomic leaves.
+        table_row_nodes = extract_and_serialize_tables(documents, trees)
+        node_parser = HierarchicalNodeParser.from_defaults(
+            chunk_sizes=list(config.chunk_sizes)
+        )
+        # Deterministic ids instead of uuid4, so the same input yields the
+        # same index version (and retrieval cache keys) on every build.
+        for level_parser in node_parser.node_parser_map.values():
+            level_parser.id_func = _chunk_node_id
+        nodes = node_parser.get_nodes_from_documents(documents)
+
+        # Leaf nodes are the smallest chunks; these will be embedded.
+        leaf_nodes = get_leaf_nodes(nodes)
+    
+        # Add table row nodes to leaf nodes (they are already atomic units)
+        leaf_nodes.extend(table_row_nodes)
+    else:
+        # Heading-aligned hierarchy: claim -> document -> section -> paragraph
+        # group / table row. Table rows are leaves of their section here.
+        nodes = get_structure_nodes(
+            documents,
+            trees,
+            serialize_table_row,
+            leaf_max_tokens=config.leaf_max_tokens or DEFAULT_LEAF_MAX_TOKENS,
+        )
+        leaf_nodes = get_leaf_nodes(nodes)
+        table_row_nodes = []
+    return ChunkedDocuments(documents, trees, nodes, leaf_nodes, table_row_nodes)
+
+
 def init_llama_settings() -> None:
     """
     Load environment variables and configure the global LlamaIndex settings.
@@ -177,15 +288,30 @@ def init_llama_settings() -> None:
             "Create a .env file in the project root with OPENAI_API_KEY=..."
         )
 
+    timer = get_startup_timer()
+    with timer.phase("llama_index.llms/embeddings.openai", kind="import"):
+        from llama_index.core import Settings
+        from llama_index.embeddings.openai import OpenAIEmbedding
+        from llama_index.llms.openai import OpenAI
+
+        from llm_recorder import RecordingOpenAI, get_llm_recorder
+
     # Configure LLM + embedding model (adjust models if needed)
-    Settings.llm = OpenAI(model="gpt-3.5-turbo", temperature=0.0)
-    Settings.embed_model = OpenAIEmbedding(model="text-embedding-ada-002")
+    # With LLM_CACHE_MODE set, completions go through the record/replay cache.
+    with timer.phase("LLM + embedding clients, settings"):
+        recorder = get_llm_recorder()
+        if recorder is not None:
+            Settings.llm = RecordingOpenAI(recorder, model="gpt-3.5-turbo", temperature=0.0)
+        else:
+            Settings.llm = OpenAI(model="gpt-3.5-turbo", temperature=0.0)
+        Settings.embed_model = OpenAIEmbedding(model="text-embedding-ada-002")
 
-    # Optional global chunk size hint (not critical but fine to set)
-    Settings.chunk_size = 1024
+        # Optional global chunk size hint (not critical but fine to set)
+        Settings.chunk_size = 1024
 
 
-def build_indexes():
+@profiled("build")
+def build_indexes(config: Optional[IndexConfig] = None):
     """
     Build:
     - hierarchical nodes over the claim timeline
@@ -193,96 +319,219 @@ def build_indexes():
     - an AutoMergingRetriever
     - a SummaryIndex over the full documents
 
-    Returns a dict with the main objects.
+    ``config`` defaults to ``IndexConfig.from_env()``.
+
+    Returns a dict with the main objects. Node and document lists are not
+    returned (only their counts), so they can be freed once indexed; nodes
+    are read back from the storage context's docstore.
     """
+    timer = get_startup_timer()
+    with timer.phase("llama_index.core + retrieval modules", kind="import"):
+        from llama_index.core import (
+            SimpleDirectoryReader,
+            StorageContext,
+            VectorStoreIndex,
+            SummaryIndex,
+            Settings,
+        )
+        from llama_index.core.retrievers import AutoMergingRetriever
+
+        from adaptive_retriever import DEFAULT_MAX_K, AdaptiveAutoMergingRetriever
+        from compact_store import CompactDocumentStore
+        from embedding_cache import cached_embed_model
+        from ingest import IngestPipeline, IngestSettings, use_ingest_pipeline
+        from mmap_vector_store import get_vector_store
+        from provenance import ProvenanceIndex
+        from retrieval_cache import CachedRetriever, compute_index_version, get_retrieval_cache
+
+    if config is None:
+        config = IndexConfig.from_env()
     init_llama_settings()
-
-    # 1. Load the claim timeline document(s)
-    documents = SimpleDirectoryReader(str(DATA_DIR)).load_data()
+    lap = timer.stopwatch()
+
+    # 1-2. Load the claim documents, parse each once into a section tree and
+    #      build hierarchical nodes (multi-granularity chunking). Large claim
+    #      directories (INGEST_MIN_FILES files or more, or INGEST_PIPELINE=1)
+    #      go through the parallel, resumable ingestion pipeline, which also
+    #      embeds the leaves into a persistent embedding cache as it goes.
+    #      INGEST_PIPELINE=0 always loads and chunks in a single pass.
+    reader = SimpleDirectoryReader(**claims_reader_kwargs())
+    ingest_settings = IngestSettings.from_env()
+    ingest_embed_model, ingest_stats = None, None
+    if use_ingest_pipeline(len(reader.input_files), ingest_settings):
+        pipeline = IngestPipeline(config, Settings.embed_model, ingest_settings)
+        chunked = pipeline.run(reader.input_files)
+        ingest_embed_model, ingest_stats = pipeline.embed_model, pipeline.stats()
+        lap("ingest pipeline (load + parse + chunk + embed)")
+    else:
+        chunked = chunk_documents(reader.load_data(), config)
+        lap("load + parse + chunk")
+    documents, trees, nodes, leaf_nodes, table_row_nodes = chunked
     if not documents:
-        raise RuntimeError(f"No documents found in {DATA_DIR}")
-
-    # 1.5. Extract and serialize markdown tables into row nodes
-    table_row_nodes = extract_and_serialize_tables(documents)
-
-    # 2. Build hierarchical nodes (multi-granularity chunking)
-    # Default chunk sizes roughly: [2048, 512, 128] – we make them explicit.
-    node_parser = HierarchicalNodeParser.from_defaults(
-        chunk_sizes=[1024, 512, 128]
-    )
-    nodes = node_parser.get_nodes_from_documents(documents)
-
-    # Leaf nodes are the smallest chunks; these will be embedded.
-    leaf_nodes = get_leaf_nodes(nodes)
-    
-    # Add table row nodes to leaf nodes (they are already atomic units)
-    leaf_nodes.extend(table_row_nodes)
+        raise RuntimeError(f"No documents found in {reader.input_dir}")
 
     # 3. Set up storage + base vector index on leaf nodes
-    storage_context = StorageContext.from_defaults()
+    #    NODE_STORE=compact (default) keeps nodes column-wise and only
+    #    materializes TextNodes for retrieved results; "simple" uses the
+    #    default dict-per-node docstore.
+    #    Leaf embeddings go to a memory-mapped matrix per index version
+    #    (VECTOR_STORE=mmap, default) that worker processes share read-only;
+    #    a process finding the matrix already written maps it and embeds
+    #    nothing. VECTOR_STORE=simple keeps the in-process SimpleVectorStore.
+    #    Texts already embedded in this process (or in EMBEDDING_CACHE_PATH)
+    #    are not embedded again, so variants share their common chunks.
+    index_version = compute_index_version(leaf_nodes, Settings.embed_model.model_name)
+    embed_model = ingest_embed_model or cached_embed_model(Settings.embed_model)
+    vector_store = get_vector_store(index_version)
+    docstore = None if os.getenv("NODE_STORE", "compact") == "simple" else CompactDocumentStore()
+    storage_context = StorageContext.from_defaults(docstore=docstore, vector_store=vector_store)
     storage_context.docstore.add_documents(nodes)
     # Also add table row nodes to docstore
     if table_row_nodes:
         storage_context.docstore.add_documents(table_row_nodes)
 
-    base_index = VectorStoreIndex(
-        leaf_nodes,
-        storage_context=storage_context,
-    )
+    if vector_store is not None and vector_store.is_mapped:
+        # Already embedded by an earlier build: only register the leaves
+        # (already in the docstore) with the index.
+        base_index = VectorStoreIndex(nodes=[], storage_context=storage_context, embed_model=embed_model)
+        for node in leaf_nodes:
+            base_index.index_struct.add_node(node, text_id=node.node_id)
+        storage_context.index_store.add_index_struct(base_index.index_struct)
+    else:
+        base_index = VectorStoreIndex(
+            leaf_nodes,
+            storage_context=storage_context,
+            embed_model=embed_model,
+        )
+        if vector_store is not None:
+            vector_store.flush()
 
-    base_retriever = base_index.as_retriever(similarity_top_k=6)
+    lap("vector index (embed or map)")
+
+    base_retriever = base_index.as_retriever(similarity_top_k=config.similarity_top_k or DEFAULT_MAX_K)
+
+    # 3.5. Cache ranked results per (index version, normalized question),
+    #      so repeated questions skip the query embedding and the scan.
+    retrieval_cache = get_retrieval_cache(index_version)
+    if retrieval_cache is not None:
+        base_retriever = CachedRetriever(base_retriever, retrieval_cache, storage_context.docstore)
 
     # 4. Auto-merging retriever: replaces many tiny chunks
     #    with their parents when that’s more coherent.
-    auto_merging_retriever = AutoMergingRetriever(
-        base_retriever,
-        storage_context=storage_context,
-        verbose=True,
-    )
+    #    "adaptive" (default) keeps only as many of the top-k leaves as the
+    #    score distribution supports; "fixed" always merges all k.
+    if os.getenv("RETRIEVAL_MODE", "adaptive") == "fixed":
+        auto_merging_retriever = AutoMergingRetriever(
+            base_retriever,
+            storage_context=storage_context,
+            verbose=True,
+        )
+    else:
+        auto_merging_retriever = AdaptiveAutoMergingRetriever(
+            base_retriever,
+            storage_context=storage_context,
+            verbose=True,
+        )
+
+    # 4.5. Offset table: exact source span + section path for every node
+    provenance = ProvenanceIndex.build(documents, trees, nodes + table_row_nodes)
+    lap("retrievers + provenance")
+
+    # 4.6. Claim timeline: every dated event, sorted and indexed by time,
+    #      type and label words, for temporal questions without retrieval.
+    #      TIMELINE_INDEX=0 leaves them to retrieval.
+    timeline = None
+    if os.getenv("TIMELINE_INDEX", "1") != "0":
+        from timeline import ClaimTimelines
+
+        timeline = ClaimTimelines.build(documents, trees)
+        lap("claim timeline")
 
     # 5. Summary index over the whole documents
     #    (used later by the Summarization Agent).
     summary_index = SummaryIndex.from_documents(documents)
+    lap("summary index")
 
     return {
         "storage_context": storage_context,
-        "documents": documents,
-        "nodes": nodes,
-        "leaf_nodes": leaf_nodes,
+        "num_documents": len(documents),
+        "num_nodes": len(nodes) + len(table_row_nodes),
+        "num_leaf_nodes": len(leaf_nodes),
         "base_index": base_index,
         "auto_retriever": auto_merging_retriever,
         "summary_index": summary_index,
+        "claim_texts": collect_claim_texts(documents, trees),
+        "timeline": timeline,
+        "provenance": provenance,
+        "retrieval_cache": retrieval_cache,
+        "vector_store": vector_store,
+        "ingest_stats": ingest_stats,
+        "config": config,
     }
 
-def get_query_engines():
+def get_query_engines(config: Optional[IndexConfig] = None, indexes: Optional[Dict[str, Any]] = None):
     """
     Convenience helper:
     - builds indexes
     - returns two query engines:
       * summary_engine: for high-level / timeline questions
       * needle_engine: for precise, 'needle-in-haystack' questions
+    plus the claim texts used by the date tools, the indexed claim
+    timeline and the provenance index used to attach source spans to answers.
+
+    ``config`` defaults to ``IndexConfig.from_env()``. Pass ``indexes``
+    (from ``build_indexes``) to reuse indexes built for a config with the
+    same ``index_key()``; only the response modes are taken from ``config``.
     """
-    idx = build_indexes()
+    if config is None:
+        config = IndexConfig.from_env()
+    idx = indexes if indexes is not None else build_indexes(config)
+
+    timer = get_startup_timer()
+    with timer.phase("query engine modules", kind="import"):
+        from llama_index.core.query_engine import RetrieverQueryEngine
+
+        from context_packer import DEFAULT_CONTEXT_TOKEN_BUDGET, ContextPacker
+    lap = timer.stopwatch()
 
     # High-level summary engine over the SummaryIndex
     summary_engine = idx["summary_index"].as_query_engine(
-        response_mode="tree_summarize"
+        response_mode=config.summary_response_mode
     )
 
-    # Needle engine over the auto-merging retriever
+    # Needle engine over the auto-merging retriever. Merged parents are
+    # packed into a fixed token budget before the compact synthesizer.
+    # CONTEXT_PACKING=0 sends the retrieved nodes unchanged.
+    node_postprocessors = []
+    context_packer = None
+    if os.getenv("CONTEXT_PACKING", "1") != "0":
+        context_packer = ContextPacker(
+            token_budget=int(os.getenv("CONTEXT_TOKEN_BUDGET", DEFAULT_CONTEXT_TOKEN_BUDGET))
+        )
+        node_postprocessors.append(context_packer)
+
     needle_engine = RetrieverQueryEngine.from_args(
         idx["auto_retriever"],
-        response_mode="compact",
+        response_mode=config.needle_response_mode,
+        node_postprocessors=node_postprocessors,
     )
+    lap("query engines")
 
     return {
         "summary_engine": summary_engine,
         "needle_engine": needle_engine,
+        "claim_texts": idx["claim_texts"],
+        "timeline": idx["timeline"],
+        "provenance": idx["provenance"],
+        "context_packer": context_packer,
+        "retrieval_cache": idx["retrieval_cache"],
+        "config": config,
     }
 
 if __name__ == "__main__":
     idx = build_indexes()
     print("✅ Indexes built successfully.")
-    print(f"- Documents loaded: {len(idx['documents'])}")
-    print(f"- Total nodes:      {len(idx['nodes'])}")
-    print(f"- Leaf nodes:       {len(idx['leaf_nodes'])}")
+    print(f"- Documents loaded: {idx['num_documents']}")
+    print(f"- Total nodes:      {idx['num_nodes']}")
+    print(f"- Leaf nodes:       {idx['num_leaf_nodes']}")
+    print(get_startup_timer().report())
@@ -0,0 +1,467 @@
+"""
+Staged, parallel and resumable ingestion for large claim directories.
+
+``build_indexes`` used to load, parse, chunk and embed every file in one
+pass on one core. For a drop of thousands of claims, ``IngestPipeline``
+splits this into two overlapping stages:
+
+1. **Load + parse + chunk** (CPU-bound: PDF extraction, markdown parsing,
+   tokenization) runs in a process pool, one file per task. Each worker
+   writes the file's documents, section trees and nodes to a shard on disk
+   and returns them.
+2. **Embed** (I/O-bound) runs on a few threads. The main process streams
+   the leaves of each finished file into a bounded queue of batches, and
+   the threads send the batches to the embedding model concurrently. The
+   embeddings land in a persistent ``EmbeddingCache`` (SQLite) as each batch
+   completes, so the index build that follows finds every leaf embedded.
+
+The queue is bounded and at most ``2 * workers`` files are in flight. When
+embedding falls behind (e.g. at the rate limit), chunking waits instead of
+piling up nodes.
+
+A SQLite manifest records each file's fingerprint (size, mtime and chunking
+parameters) and progress: ``chunked`` once its shard is written,
+``embedded`` once all its leaves are in the cache, ``failed`` if it could
+not be read. After a crash or an interrupt, the next run loads the shards
+of unchanged files instead of chunking them again. It only embeds the
+leaves of files that are not ``embedded`` yet, and the cache skips any
+leaf that was embedded before the crash.
+
+Settings (``IngestSettings.from_env``):
+- ``INGEST_WORKERS``: chunking processes (CPU count);
+- ``INGEST_EMBED_WORKERS``: concurrent embedding requests (4);
+- ``INGEST_EMBED_BATCH``: texts per request (the model's batch size);
+- ``INGEST_QUEUE_BATCHES``: batches waiting for an embedding thread (16);
+- ``INGEST_EMBED_RPM``: a cap on embedding requests per minute (0: none,
+  the client retries on rate-limit errors);
+- ``INGEST_DIR``: shards, manifest and embedding cache (storage/ingest);
+- ``INGEST_MIN_FILES``: smallest directory that ``build_indexes`` ingests
+  with the pipeline (64).
+
+``INGEST_PIPELINE=1`` always uses the pipeline, and ``INGEST_PIPELINE=0``
+never does. With ``EMBEDDING_CACHE=0`` the pipeline only chunks; the index
+build then embeds as before.
+"""
+
+import hashlib
+import multiprocessing
+import os
+import pickle
+import queue
+import sqlite3
+import sys
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, Future, ProcessPoolExecutor, wait
+from pathlib import Path
+from typing import Any, Dict, List, NamedTuple, Optional, Sequence, Tuple
+
+from indexing import ChunkedDocuments, IndexConfig, chunk_documents
+
+
+DEFAULT_INGEST_DIR = Path(__file__).resolve().parent.parent / "storage" / "ingest"
+DEFAULT_EMBED_WORKERS = 4
+DEFAULT_QUEUE_BATCHES = 16
+DEFAULT_MIN_FILES = 64
+PROGRESS_EVERY = 500  # files
+
+
+def _env_int(name: str, default: int) -> int:
+    value = os.getenv(name)
+    return int(value) if value else default
+
+
+class IngestSettings(NamedTuple):
+    """Pipeline sizes and locations; see the module docstring."""
+
+    workers: int = os.cpu_count() or 1
+    embed_workers: int = DEFAULT_EMBED_WORKERS
+    # Texts per embedding request; 0: the embedding model's batch size
+    embed_batch_size: int = 0
+    queue_batches: int = DEFAULT_QUEUE_BATCHES
+    requests_per_minute: int = 0
+    min_files: int = DEFAULT_MIN_FILES
+    directory: Path = DEFAULT_INGEST_DIR
+
+    @classmethod
+    def from_env(cls) -> "IngestSettings":
+        """Defaults overridden by the INGEST_* variables."""
+        return cls(
+            workers=_env_int("INGEST_WORKERS", os.cpu_count() or 1),
+            embed_workers=_env_int("INGEST_EMBED_WORKERS", DEFAULT_EMBED_WORKERS),
+            embed_batch_size=_env_int("INGEST_EMBED_BATCH", 0),
+            queue_batches=_env_int("INGEST_QUEUE_BATCHES", DEFAULT_QUEUE_BATCHES),
+            requests_per_minute=_env_int("INGEST_EMBED_RPM", 0),
+            min_files=_env_int("INGEST_MIN_FILES", DEFAULT_MIN_FILES),
+            directory=Path(os.getenv("INGEST_DIR") or DEFAULT_INGEST_DIR),
+        )
+
+
+def use_ingest_pipeline(num_files: int, settings: IngestSettings) -> bool:
+    """Whether ``build_indexes`` should ingest ``num_files`` files with the pipeline."""
+    mode = os.getenv("INGEST_PIPELINE", "auto")
+    if mode in ("0", "1"):
+        return mode == "1"
+    return num_files >= settings.min_files
+
+
+def file_fingerprint(path: Path, config: IndexConfig) -> str:
+    """Changes when the file or the chunking parameters change."""
+    stat = path.stat()
+    chunking = config.chunk_sizes if config.chunking == "tokens" else config.leaf_max_tokens
+    return f"{stat.st_size}:{stat.st_mtime_ns}:{config.chunking}:{chunking}"
+
+
+class IngestManifest:
+    """Per-file ingestion progress in a SQLite file (see the module docstring)."""
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(self.path), check_same_thread=False, timeout=30)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS files ("
+            "path TEXT PRIMARY KEY, fingerprint TEXT NOT NULL, status TEXT NOT NULL, "
+            "nodes INTEGER NOT NULL DEFAULT 0, leaves INTEGER NOT NULL DEFAULT 0, "
+            "error TEXT, updated REAL NOT NULL)"
+        )
+        self._conn.commit()
+
+    def get(self, path: str) -> Optional[Tuple[str, str]]:
+        """(fingerprint, status) recorded for ``path``, or None."""
+        with self._lock:
+            return self._conn.execute(
+                "SELECT fingerprint, status FROM files WHERE path = ?", (path,)
+            ).fetchone()
+
+    def mark(
+        self,
+        path: str,
+        fingerprint: str,
+        status: str,
+        nodes: int = 0,
+        leaves: int = 0,
+        error: Optional[str] = None,
+    ) -> None:
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO files (path, fingerprint, status, nodes, leaves, error, updated) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (path, fingerprint, status, nodes, leaves, error, time.time()),
+            )
+            self._conn.commit()
+
+    def set_status(self, path: str, status: str) -> None:
+        with self._lock:
+            self._conn.execute(
+                "UPDATE files SET status = ?, updated = ? WHERE path = ?", (status, time.time(), path)
+            )
+            self._conn.commit()
+
+    def counts(self) -> Dict[str, int]:
+        with self._lock:
+            return dict(self._conn.execute("SELECT status, COUNT(*) FROM files GROUP BY status"))
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+def _shard_path(directory: Path, path: str) -> Path:
+    return directory / "shards" / f"{hashlib.sha1(path.encode('utf-8')).hexdigest()[:20]}.pkl"
+
+
+def _chunk_file(job: Tuple[str, IndexConfig, str]) -> Tuple[Optional[bytes], Optional[str]]:
+    """
+    Process-pool task: load, parse and chunk one file and write its shard.
+
+    Returns (pickled ``ChunkedDocuments``, None) or (None, error message).
+    The payload is pickled once, for both the shard and the result.
+    """
+    path, config, shard = job
+    try:
+        from llama_index.core import SimpleDirectoryReader
+
+        documents = SimpleDirectoryReader(input_files=[path], raise_on_error=True).load_data()
+        data = pickle.dumps(chunk_documents(documents, config), protocol=pickle.HIGHEST_PROTOCOL)
+        # Temporary name + rename: a crash never leaves a truncated shard.
+        tmp = f"{shard}.tmp-{os.getpid()}"
+        with open(tmp, "wb") as f:
+            f.write(data)
+        os.replace(tmp, shard)
+        return data, None
+    except Exception as exc:
+        return None, f"{type(exc).__name__}: {exc}"
+
+
+class _RateLimiter:
+    """Spaces request starts at least 60 / requests_per_minute seconds apart (0: no limit)."""
+
+    def __init__(self, requests_per_minute: int):
+        self.interval = 60.0 / requests_per_minute if requests_per_minute > 0 else 0.0
+        self._next = 0.0
+        self._lock = threading.Lock()
+
+    def wait(self) -> None:
+        if not self.interval:
+            return
+        with self._lock:
+            now = time.monotonic()
+            start = max(now, self._next)
+            self._next = start + self.interval
+        if start > now:
+            time.sleep(start - now)
+
+
+def persistent_embed_model(embed_model: Any, directory: Path) -> Optional[Any]:
+    """
+    ``embed_model`` behind an embedding cache that survives the process: the
+    process-wide cache's file (EMBEDDING_CACHE_PATH), else one in
+    ``directory``. None when EMBEDDING_CACHE=0.
+
+    The cache keeps no vectors in memory: a large ingest would otherwise hold
+    every embedding of the corpus in the process; they are read back from
+    the file when the index is built.
+    """
+    from embedding_cache import CachedEmbedding, EmbeddingCache, get_embedding_cache
+
+    shared = get_embedding_cache()
+    if shared is None:
+        return None
+    cache = EmbeddingCache(shared.path or directory / "embeddings.sqlite", memory_entries=0)
+    if isinstance(embed_model, CachedEmbedding):
+        embed_model = embed_model._embed_model
+    return CachedEmbedding(embed_model, cache)
+
+
+class IngestPipeline:
+    """
+    Parallel, resumable load + parse + chunk + embed of many claim files.
+
+    Args:
+        config: Chunking parameters (as for ``build_indexes``).
+        embed_model: The embedding model; the pipeline caches its results
+            persistently (``embed_model`` is the cached wrapper to index with).
+        settings: Pool, queue and batch sizes (``IngestSettings.from_env()``).
+    """
+
+    def __init__(self, config: IndexConfig, embed_model: Any, settings: Optional[IngestSettings] = None):
+        self.config = config
+        self.settings = settings or IngestSettings.from_env()
+        self.embed_model = persistent_embed_model(embed_model, self.settings.directory)
+        self.batch_size = self.settings.embed_batch_size or (
+            self.embed_model.embed_batch_size if self.embed_model is not None else 0
+        ) or 100
+        self._limiter = _RateLimiter(self.settings.requests_per_minute)
+        self._lock = threading.Lock()
+        self._stats: Dict[str, Any] = {}
+
+    # Embedding stage ------------------------------------------------------
+
+    def _embed_worker(
+        self,
+        batches: "queue.Queue[Optional[List[Tuple[int, Any]]]]",
+        remaining: Dict[int, int],
+        files: List[str],
+        manifest: IngestManifest,
+        errors: List[BaseException],
+    ) -> None:
+        from llama_index.core.schema import MetadataMode
+
+        while True:
+            batch = batches.get()
+            if batch is None:
+                return
+            if errors:
+                continue  # drain the queue after a failure
+            try:
+                self._limiter.wait()
+                texts = [node.get_content(metadata_mode=MetadataMode.EMBED) for _, node in batch]
+                start = time.perf_counter()
+                self.embed_model.get_text_embedding_batch(texts)
+                elapsed = time.perf_counter() - start
+            except BaseException as exc:
+                errors.append(exc)
+                continue
+            done = []
+            with self._lock:
+                self._stats["batches"] += 1
+                self._stats["embedded_leaves"] += len(batch)
+                self._stats["embed_request_seconds"] += elapsed
+                for file_index, _ in batch:
+                    remaining[file_index] -= 1
+                    if remaining[file_index] == 0:
+                        done.append(file_index)
+            # Only now are all the file's leaves in the persistent cache.
+            for file_index in done:
+                manifest.set_status(files[file_index], "embedded")
+
+    # Pipeline -------------------------------------------------------------
+
+    def run(self, input_files: Sequence[Any]) -> ChunkedDocuments:
+        """
+        Ingest ``input_files`` (paths, e.g. ``SimpleDirectoryReader.input_files``).
+
+        Returns the documents, trees and nodes of all readable files, in input
+        order, as ``chunk_documents`` does. Unreadable files are skipped and
+        counted in ``stats()``.
+        """
+        settings = self.settings
+        files = [str(path) for path in input_files]
+        (settings.directory / "shards").mkdir(parents=True, exist_ok=True)
+        manifest = IngestManifest(settings.directory / "manifest.sqlite")
+        cache = self.embed_model.cache if self.embed_model is not None else None
+        misses_before = cache.misses if cache is not None else 0
+        self._stats = {
+            "files": len(files),
+            "chunked": 0,
+            "reused": 0,
+            "failed": 0,
+            "nodes": 0,
+            "leaves": 0,
+            "skipped_leaves": 0,
+            "embedded_leaves": 0,
+            "batches": 0,
+            "embed_request_seconds": 0.0,
+        }
+        start = time.perf_counter()
+
+        results: List[Optional[ChunkedDocuments]] = [None] * len(files)
+        remaining: Dict[int, int] = {}
+        errors: List[BaseException] = []
+        batches: "queue.Queue[Optional[List[Tuple[int, Any]]]]" = queue.Queue(maxsize=settings.queue_batches)
+        threads: List[threading.Thread] = []
+        if self.embed_model is not None:
+            threads = [
+                threading.Thread(
+                    target=self._embed_worker,
+                    args=(batches, remaining, files, manifest, errors),
+                    name=f"ingest-embed-{i}",
+                    daemon=True,
+                )
+                for i in range(max(1, settings.embed_workers))
+            ]
+            for thread in threads:
+                thread.start()
+        pending: List[Tuple[int, Any]] = []
+
+        def accept(index: int, chunked: ChunkedDocuments, status: str) -> None:
+            # Runs on the main thread: record the file and stream its leaves.
+            results[index] = chunked
+            with self._lock:
+                self._stats["nodes"] += len(chunked.nodes) + len(chunked.table_row_nodes)
+                self._stats["leaves"] += len(chunked.leaf_nodes)
+            if self.embed_model is None:
+                return
+            if status == "embedded" or not chunked.leaf_nodes:
+                with self._lock:
+                    self._stats["skipped_leaves"] += len(chunked.leaf_nodes)
+                if status != "embedded":
+                    manifest.set_status(files[index], "embedded")
+                return
+            with self._lock:
+                remaining[index] = len(chunked.leaf_nodes)
+            for node in chunked.leaf_nodes:
+                pending.append((index, node))
+                if len(pending) >= self.batch_size:
+                    batches.put(list(pending))  # blocks while the queue is full
+                    pending.clear()
+                if errors:
+                    raise errors[0]
+
+        def progress(done: int) -> None:
+            if done % PROGRESS_EVERY == 0:
+                elapsed = time.perf_counter() - start
+                print(f"Ingest: {done}/{len(files)} files in {elapsed:.1f}s", file=sys.stderr)
+
+        try:
+            # Resume: unchanged files with a shard are loaded, not chunked again.
+            jobs: List[Tuple[int, str]] = []
+            fingerprints = [file_fingerprint(Path(path), self.config) for path in files]
+            for index, path in enumerate(files):
+                shard = _shard_path(settings.directory, path)
+                recorded = manifest.get(path)
+                if recorded and recorded[0] == fingerprints[index] and recorded[1] != "failed" and shard.exists():
+                    with open(shard, "rb") as f:
+                        chunked = pickle.load(f)
+                    self._stats["reused"] += 1
+                    accept(index, chunked, recorded[1])
+                else:
+                    jobs.append((index, path))
+
+            done = self._stats["reused"]
+            if jobs:
+                # The embed threads are already running: a forked worker would
+                # inherit their locks in whatever state they are in, so the
+                # workers are spawned instead.
+                pool = ProcessPoolExecutor(
+                    max_workers=max(1, settings.workers), mp_context=multiprocessing.get_context("spawn")
+                )
+                try:
+                    in_flight: Dict[Future, int] = {}
+                    next_job = 0
+                    while next_job < len(jobs) or in_flight:
+                        # At most 2 files per worker in flight: backpressure
+                        # from the embedding queue reaches the pool.
+                        while next_job < len(jobs) and len(in_flight) < 2 * max(1, settings.workers):
+                            index, path = jobs[next_job]
+                            job = (path, self.config, str(_shard_path(settings.directory, path)))
+                            in_flight[pool.submit(_chunk_file, job)] = index
+                            next_job += 1
+                        finished, _ = wait(list(in_flight), return_when=FIRST_COMPLETED)
+                        for future in finished:
+                            index = in_flight.pop(future)
+                            data, error = future.result()
+                            done += 1
+                            progress(done)
+                            if error is not None:
+                                self._stats["failed"] += 1
+                                manifest.mark(files[index], fingerprints[index], "failed", error=error)
+                                print(f"Ingest: skipped {files[index]}: {error}", file=sys.stderr)
+                                continue
+                            chunked = pickle.loads(data)
+                            self._stats["chunked"] += 1
+                            manifest.mark(
+                                files[index],
+                                fingerprints[index],
+                                "chunked",
+                                nodes=len(chunked.nodes) + len(chunked.table_row_nodes),
+                                leaves=len(chunked.leaf_nodes),
+                            )
+                            accept(index, chunked, "chunked")
+                finally:
+                    # Interrupted: files not started yet are left for the next run.
+                    pool.shutdown(wait=True, cancel_futures=True)
+            self._stats["chunk_seconds"] = time.perf_counter() - start
+
+            if pending:
+                batches.put(list(pending))
+                pending.clear()
+        finally:
+            for _ in threads:
+                batches.put(None)
+            for thread in threads:
+                thread.join()
+            manifest.close()
+        if errors:
+            raise errors[0]
+
+        self._stats["seconds"] = time.perf_counter() - start
+        self._stats["api_texts"] = (cache.misses - misses_before) if cache is not None else 0
+
+        merged = ChunkedDocuments([], [], [], [], [])
+        for chunked in results:
+            if chunked is not None:
+                for field, values in zip(merged, chunked):
+                    field.extend(values)
+        return merged
+
+    def stats(self) -> Dict[str, Any]:
+        """Counts and timings of the last ``run``."""
+        with self._lock:
+            stats = dict(self._stats)
+        seconds = stats.get("seconds") or 0.0
+        stats["leaves_per_second"] = stats.get("leaves", 0) / seconds if seconds else 0.0
+        return stats
@@ -0,0 +1,404 @@
+"""
+Record/replay cache for LLM completions.
+
+Both the answering LLM (``Settings.llm``) and the judge's OpenAI client can be
+wrapped so that every (model, prompt, params) -> completion pair is persisted
+to a small SQLite file. Modes (``LLM_CACHE_MODE``):
+
+- ``off`` (default): no caching, calls go straight to the API.
+- ``record``: always call the API and (over)write the stored completion.
+- ``replay``: only serve stored completions; a miss raises ``ReplayMissError``.
+- ``record_missing``: serve stored completions, call the API on a miss and store it.
+
+Completions are zlib-compressed and keyed by a SHA-256 of the canonical JSON
+of the request, so reruns of unchanged pipelines cost nothing and are not
+affected by LLM sampling variance.
+"""
+
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import zlib
+from pathlib import Path
+from types import SimpleNamespace
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, Iterator, Optional, Sequence, Tuple
+
+from llama_index.core.base.llms.types import (
+    ChatMessage,
+    ChatResponse,
+    ChatResponseAsyncGen,
+    ChatResponseGen,
+    CompletionResponse,
+    CompletionResponseAsyncGen,
+    CompletionResponseGen,
+    MessageRole,
+)
+from llama_index.core.bridge.pydantic import PrivateAttr
+from llama_index.llms.openai import OpenAI
+
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+DEFAULT_CACHE_PATH = PROJECT_ROOT / ".llm_cache" / "completions.sqlite"
+
+MODES = ("off", "record", "replay", "record_missing")
+
+
+class ReplayMissError(RuntimeError):
+    """Raised in replay mode when a request has no stored completion."""
+
+
+class LLMRecorder:
+    """
+    Persistent (model, prompt, params) -> completion store with record/replay modes.
+    """
+
+    def __init__(self, path: Path, mode: str = "record_missing"):
+        if mode not in MODES:
+            raise ValueError(f"Unknown LLM cache mode {mode!r}; expected one of {MODES}")
+        self.path = Path(path)
+        self.mode = mode
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(self.path), check_same_thread=False)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS completions ("
+            " key TEXT PRIMARY KEY, model TEXT NOT NULL, completion BLOB NOT NULL)"
+        )
+        self._conn.commit()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def make_key(model: str, prompt: Any, params: Dict[str, Any]) -> str:
+        payload = json.dumps(
+            {"model": model, "prompt": prompt, "params": params},
+            sort_keys=True,
+            ensure_ascii=False,
+            default=str,
+        )
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def lookup(self, key: str) -> Optional[str]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT completion FROM completions WHERE key = ?", (key,)
+            ).fetchone()
+        if row is None:
+            return None
+        return zlib.decompress(row[0]).decode("utf-8")
+
+    def store(self, key: str, model: str, completion: str) -> None:
+        blob = zlib.compress(completion.encode("utf-8"))
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO completions (key, model, completion) VALUES (?, ?, ?)",
+                (key, model, blob),
+            )
+            self._conn.commit()
+
+    def _resolve(self, model: str, prompt: Any, params: Dict[str, Any]) -> Tuple[str, Optional[str]]:
+        """(key, stored completion or None when the API must be called); raises on a replay miss."""
+        key = self.make_key(model, prompt, params)
+
+        if self.mode != "record":
+            cached = self.lookup(key)
+            if cached is not None:
+                self.hits += 1
+                return key, cached
+            if self.mode == "replay":
+                raise ReplayMissError(
+                    f"No recorded completion for model={model} (key={key[:12]}…). "
+                    "Re-run with LLM_CACHE_MODE=record_missing to fill the cache."
+                )
+
+        self.misses += 1
+        return key, None
+
+    def call(
+        self,
+        model: str,
+        prompt: Any,
+        params: Dict[str, Any],
+        fn: Callable[[], str],
+    ) -> str:
+        """
+        Resolve a completion according to the recorder mode.
+
+        Args:
+            model: Model name, part of the cache key.
+            prompt: JSON-serializable prompt (string or list of chat messages).
+            params: Sampling parameters that influence the completion.
+            fn: Zero-argument callable performing the real API call.
+        """
+        key, cached = self._resolve(model, prompt, params)
+        if cached is not None:
+            return cached
+        completion = fn()
+        self.store(key, model, completion or "")
+        return completion
+
+    async def acall(
+        self,
+        model: str,
+        prompt: Any,
+        params: Dict[str, Any],
+        fn: Callable[[], Awaitable[str]],
+    ) -> str:
+        """``call`` for an async API call."""
+        key, cached = self._resolve(model, prompt, params)
+        if cached is not None:
+            return cached
+        completion = await fn()
+        self.store(key, model, completion or "")
+        return completion
+
+    def call_stream(
+        self,
+        model: str,
+        prompt: Any,
+        params: Dict[str, Any],
+        fn: Callable[[], Iterator[str]],
+    ) -> Iterator[str]:
+        """
+        ``call`` for a streamed completion: yields text deltas. A stored
+        completion comes back as one delta; a streamed one is stored once
+        the stream is exhausted.
+        """
+        key, cached = self._resolve(model, prompt, params)
+        if cached is not None:
+            yield cached
+            return
+        parts = []
+        for delta in fn():
+            parts.append(delta)
+            yield delta
+        self.store(key, model, "".join(parts))
+
+    async def acall_stream(
+        self,
+        model: str,
+        prompt: Any,
+        params: Dict[str, Any],
+        fn: Callable[[], AsyncIterator[str]],
+    ) -> AsyncIterator[str]:
+        """``call_stream`` for an async stream."""
+        key, cached = self._resolve(model, prompt, params)
+        if cached is not None:
+            yield cached
+            return
+        parts = []
+        async for delta in fn():
+            parts.append(delta)
+            yield delta
+        self.store(key, model, "".join(parts))
+
+    def stats(self) -> Dict[str, Any]:
+        total = self.hits + self.misses
+        return {
+            "mode": self.mode,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0.0,
+        }
+
+
+_recorder: Optional[LLMRecorder] = None
+_recorder_lock = threading.Lock()
+
+
+def get_llm_recorder() -> Optional[LLMRecorder]:
+    """
+    Return the process-wide recorder configured via LLM_CACHE_MODE / LLM_CACHE_PATH,
+    or None when caching is off.
+    """
+    global _recorder
+
+    mode = os.getenv("LLM_CACHE_MODE", "off").strip().lower()
+    if mode == "off":
+        return None
+
+    path = Path(os.getenv("LLM_CACHE_PATH", str(DEFAULT_CACHE_PATH)))
+    with _recorder_lock:
+        if _recorder is None or _recorder.mode != mode or _recorder.path != path:
+            _recorder = LLMRecorder(path, mode=mode)
+        return _recorder
+
+
+def _messages_to_prompt(messages: Sequence[ChatMessage]) -> list:
+    return [{"role": m.role.value, "content": m.content} for m in messages]
+
+
+class RecordingOpenAI(OpenAI):
+    """
+    OpenAI LLM whose chat/complete calls go through an LLMRecorder.
+
+    Used as ``Settings.llm`` so the query engines' synthesis calls are cached.
+    The async and streaming variants share the same entries: a streamed
+    call records the joined text, and a stored completion is replayed as a
+    single delta.
+    """
+
+    _recorder: Any = PrivateAttr(default=None)
+
+    def __init__(self, recorder: LLMRecorder, **kwargs: Any):
+        super().__init__(**kwargs)
+        self._recorder = recorder
+
+    @classmethod
+    def class_name(cls) -> str:
+        return "recording_openai_llm"
+
+    def _params(self, kind: str, kwargs: Dict[str, Any]) -> Dict[str, Any]:
+        return {
+            "kind": kind,
+            "temperature": self.temperature,
+            "max_tokens": self.max_tokens,
+            **self.additional_kwargs,
+            **kwargs,
+        }
+
+    def chat(self, messages: Sequence[ChatMessage], **kwargs: Any) -> ChatResponse:
+        text = self._recorder.call(
+            self.model,
+            _messages_to_prompt(messages),
+            self._params("chat", kwargs),
+            lambda: OpenAI.chat(self, messages, **kwargs).message.content,
+        )
+        return ChatResponse(message=ChatMessage(role=MessageRole.ASSISTANT, content=text))
+
+    def complete(self, prompt: str, formatted: bool = False, **kwargs: Any) -> CompletionResponse:
+        text = self._recorder.call(
+            self.model,
+            prompt,
+            self._params("complete", {"formatted": formatted, **kwargs}),
+            lambda: OpenAI.complete(self, prompt, formatted=formatted, **kwargs).text,
+        )
+        return CompletionResponse(text=text)
+
+    async def achat(self, messages: Sequence[ChatMessage], **kwargs: Any) -> ChatResponse:
+        async def _call() -> Optional[str]:
+            return (await OpenAI.achat(self, messages, **kwargs)).message.content
+
+        text = await self._recorder.acall(
+            self.model, _messages_to_prompt(messages), self._params("chat", kwargs), _call
+        )
+        return ChatResponse(message=ChatMessage(role=MessageRole.ASSISTANT, content=text))
+
+    async def acomplete(self, prompt: str, formatted: bool = False, **kwargs: Any) -> CompletionResponse:
+        async def _call() -> str:
+            return (await OpenAI.acomplete(self, prompt, formatted=formatted, **kwargs)).text
+
+        text = await self._recorder.acall(
+            self.model, prompt, self._params("complete", {"formatted": formatted, **kwargs}), _call
+        )
+        return CompletionResponse(text=text)
+
+    def stream_chat(self, messages: Sequence[ChatMessage], **kwargs: Any) -> ChatResponseGen:
+        deltas = self._recorder.call_stream(
+            self.model,
+            _messages_to_prompt(messages),
+            self._params("chat", kwargs),
+            lambda: (r.delta or "" for r in OpenAI.stream_chat(self, messages, **kwargs)),
+        )
+
+        def gen() -> ChatResponseGen:
+            content = ""
+            for delta in deltas:
+                content += delta
+                yield ChatResponse(message=ChatMessage(role=MessageRole.ASSISTANT, content=content), delta=delta)
+
+        return gen()
+
+    def stream_complete(self, prompt: str, formatted: bool = False, **kwargs: Any) -> CompletionResponseGen:
+        deltas = self._recorder.call_stream(
+            self.model,
+            prompt,
+            self._params("complete", {"formatted": formatted, **kwargs}),
+            lambda: (r.delta or "" for r in OpenAI.stream_complete(self, prompt, formatted=formatted, **kwargs)),
+        )
+
+        def gen() -> CompletionResponseGen:
+            text = ""
+            for delta in deltas:
+                text += delta
+                yield CompletionResponse(text=text, delta=delta)
+
+        return gen()
+
+    async def astream_chat(self, messages: Sequence[ChatMessage], **kwargs: Any) -> ChatResponseAsyncGen:
+        async def _stream() -> AsyncIterator[str]:
+            async for r in await OpenAI.astream_chat(self, messages, **kwargs):
+                yield r.delta or ""
+
+        deltas = self._recorder.acall_stream(
+            self.model, _messages_to_prompt(messages), self._params("chat", kwargs), _stream
+        )
+
+        async def gen() -> ChatResponseAsyncGen:
+            content = ""
+            async for delta in deltas:
+                content += delta
+                yield ChatResponse(message=ChatMessage(role=MessageRole.ASSISTANT, content=content), delta=delta)
+
+        return gen()
+
+    async def astream_complete(
+        self, prompt: str, formatted: bool = False, **kwargs: Any
+    ) -> CompletionResponseAsyncGen:
+        async def _stream() -> AsyncIterator[str]:
+            async for r in await OpenAI.astream_complete(self, prompt, formatted=formatted, **kwargs):
+                yield r.delta or ""
+
+        deltas = self._recorder.acall_stream(
+            self.model, prompt, self._params("complete", {"formatted": formatted, **kwargs}), _stream
+        )
+
+        async def gen() -> CompletionResponseAsyncGen:
+            text = ""
+            async for delta in deltas:
+                text += delta
+                yield CompletionResponse(text=text, delta=delta)
+
+        return gen()
+
+
+class _RecordingCompletions:
+    def __init__(self, client: Any, recorder: LLMRecorder):
+        self._client = client
+        self._recorder = recorder
+
+    def create(self, **kwargs: Any) -> Any:
+        real_response = None
+
+        def _call() -> str:
+            nonlocal real_response
+            real_response = self._client.chat.completions.create(**kwargs)
+            return real_response.choices[0].message.content
+
+        params = {k: v for k, v in kwargs.items() if k not in ("model", "messages")}
+        content = self._recorder.call(
+            kwargs.get("model", ""), kwargs.get("messages"), params, _call
+        )
+        if real_response is not None:
+            return real_response
+
+        # Cache hit: expose the same shape the caller reads from the SDK response.
+        message = SimpleNamespace(content=content)
+        return SimpleNamespace(choices=[SimpleNamespace(message=message)], usage=None)
+
+
+class RecordingChatClient:
+    """
+    Minimal wrapper around an ``openai.OpenAI`` client that routes
+    ``chat.completions.create`` through an LLMRecorder (used by the judge).
+    """
+
+    def __init__(self, client: Any, recorder: LLMRecorder):
+        self._client = client
+        self.recorder = recorder
+        self.chat = SimpleNamespace(completions=_RecordingCompletions(client, recorder))
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self._client, name)
@@ -1,21 +1,77 @@
-from indexing import get_query_engines
-from agents.summarizer_agent import SummarizationAgent
-from agents.needle_agent import NeedleAgent
-from agents.manager import ManagerAgent
+import os
+import sys
 
+from startup import BackgroundLoader, get_startup_timer
+
+
+def build_manager():
+    """Build indexes, query engines and agents (the slow part of startup)."""
+    from indexing import get_query_engines
+    from agents.summarizer_agent import SummarizationAgent
+    from agents.needle_agent import NeedleAgent
+    from agents.manager import ManagerAgent
+    from agents.planner import build_planner
+    from agents.speculation import build_speculator
+
+    timer = get_startup_timer()
 
-def main():
     # Build indexes and query engines
     engines = get_query_engines()
 
     # Instantiate agents
-    summarizer = SummarizationAgent(engines["summary_engine"])
-    needle = NeedleAgent(engines["needle_engine"])
-    manager = ManagerAgent(summarizer, needle)
+    summarizer = SummarizationAgent(
+        engines["summary_engine"], provenance=engines.get("provenance"), timeline=engines.get("timeline")
+    )
+    needle = NeedleAgent(
+        engines["needle_engine"],
+        claim_texts=engines.get("claim_texts"),
+        provenance=engines.get("provenance"),
+        context_packer=engines.get("context_packer"),
+    )
+    manager = ManagerAgent(
+        summarizer,
+        needle,
+        planner=build_planner(engines.get("claim_texts")),
+        timeline=engines.get("timeline"),
+        speculator=build_speculator(),
+    )
+
+    # Interval questions go through the MCP date client; import it now
+    # rather than on the first such question.
+    timer.timed_import("mcp_integration.client")
+    timer.mark("agents ready")
+    return manager
+
+
+def _print_startup_report() -> None:
+    """STARTUP_REPORT=1 prints the import / startup breakdown to stderr."""
+    if os.getenv("STARTUP_REPORT") == "1":
+        print(get_startup_timer().report(), file=sys.stderr)
+
+
+def main():
+    timer = get_startup_timer()
+
+    # FAST_START=1 (default) loads indexes in a background thread while the
+    # prompt is already accepting input; FAST_START=0 builds them first.
+    if os.getenv("FAST_START", "1") == "0":
+        manager = build_manager()
+        loader = None
+        _print_startup_report()
+    else:
+        loader = BackgroundLoader(build_manager)
+        manager = None
 
     print("Midterm – Insurance Claim Agents")
     print("Ask questions about the claim timeline.")
     print("Type 'exit' or 'quit' to leave.")
+    # Follow-up questions are rewritten and may reuse the previous turns'
+    # context (SESSION_MODE=0 answers every question on its own).
+    use_session = os.getenv("SESSION_MODE", "1") != "0"
+    if use_session:
+        print("Type 'new' to start a new conversation.")
+    session = None
+    timer.mark("prompt shown")
 
     while True:
         q = input("\nQuestion: ").strip()
@@ -23,10 +79,35 @@ def main():
             break
         if not q:
             continue
+        if use_session and q.lower() == "new":
+            if session is not None:
+                session.reset()
+            print("(new conversation)")
+            continue
+
+        if manager is None:
+            if not loader.ready:
+                print("(loading indexes...)")
+            manager = loader.result()
+            _print_startup_report()
+
+        if use_session:
+            if session is None:
+                from agents.session import ConversationSession
 
-        result = manager.answer(q)
+                session = ConversationSession(manager)
+            result = session.ask(q)
+        else:
+            result = manager.answer(q)
 
-        print(f"\n[Chosen agent: {result['chosen_agent']}]")
+        label = result["chosen_agent"]
+        if result.get("context_reused"):
+            label += ", reused context"
+        print(f"\n[Chosen agent: {label}]")
+        if result.get("follow_up") and result["standalone_question"] != q:
+            print(f"(as: {result['standalone_question']})")
+        for sub in result.get("sub_queries", []):
+            print(f"  - [{sub['route']}, {sub['ms']:.0f} ms] {sub['question']}")
         print(result["answer"])
         # If you want to debug retrieval later, you can also print result["sources"]
 
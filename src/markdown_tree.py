@@ -0,0 +1,291 @@
+"""
+Single-pass markdown structure parser for claim files.
+
+``parse_markdown`` walks the text once, line by line, and produces a section
+tree (headings -> nested sections) whose blocks are paragraphs, tables and
+horizontal rules. Every element records ``start``/``end`` character offsets
+into the original text, so consumers slice the source lazily instead of
+copying it. Table cells are typed (dates, date ranges, money, numbers) while
+parsing, so downstream code never re-splits or re-scans table blocks.
+"""
+
+import re
+from datetime import date, datetime
+from typing import Any, Dict, Iterator, List, Optional
+
+
+_HEADING_RE = re.compile(r"(#{1,6})\s+(.*?)\s*#*\s*$")
+_SEPARATOR_RE = re.compile(r"^\|[\s\-\|:]+\|$")
+_TABLE_NAME_RE = re.compile(r"Table \d+[^—]*—\s*(.+)")
+_DATETIME_RE = re.compile(r"^\d{4}-\d{2}-\d{2}(?:[ T]\d{2}:\d{2}(?::\d{2})?)?$")
+_DATE_RANGE_RE = re.compile(r"^(\d{4}-\d{2}-\d{2})\s+(?:to|–|-)\s+(\d{4}-\d{2}-\d{2})$")
+_MONEY_RE = re.compile(r"^([A-Z]{3}|[$€£₪])\s?([\d,]+(?:\.\d+)?)$")
+_NUMBER_RE = re.compile(r"^(-?[\d,]+(?:\.\d+)?)(?:\s+(\w+))?$")
+_EMPTY_CELLS = {"", "n/a", "na", "-", "—"}
+
+# A table header may only be this many lines below a "### Table N — ..." heading
+# for the heading to be used as the table name (mirrors the legacy extractor).
+_TABLE_NAME_LOOKBACK = 5
+
+
+def _parse_iso(value: str) -> date:
+    if len(value) == 10:
+        return date.fromisoformat(value)
+    return datetime.fromisoformat(value.replace(" ", "T"))
+
+
+class Cell:
+    """A table cell with its raw text and a parsed value.
+
+    ``kind`` is one of: ``date``, ``date_range``, ``money``, ``number``,
+    ``empty`` or ``text``.
+    """
+
+    __slots__ = ("raw", "kind", "value")
+
+    def __init__(self, raw: str):
+        self.raw = raw
+        self.kind, self.value = _type_cell(raw)
+
+    def __repr__(self) -> str:
+        return f"Cell({self.raw!r}, kind={self.kind})"
+
+
+def _type_cell(raw: str):
+    lowered = raw.lower()
+    if lowered in _EMPTY_CELLS:
+        return "empty", None
+    if _DATETIME_RE.match(raw):
+        try:
+            return "date", _parse_iso(raw)
+        except ValueError:
+            return "text", raw
+    m = _DATE_RANGE_RE.match(raw)
+    if m:
+        try:
+            return "date_range", (date.fromisoformat(m.group(1)), date.fromisoformat(m.group(2)))
+        except ValueError:
+            return "text", raw
+    m = _MONEY_RE.match(raw)
+    if m:
+        return "money", (m.group(1), float(m.group(2).replace(",", "")))
+    m = _NUMBER_RE.match(raw)
+    if m:
+        return "number", float(m.group(1).replace(",", ""))
+    return "text", raw
+
+
+class Block:
+    """A leaf block (paragraph or rule) inside a section, addressed by offsets."""
+
+    __slots__ = ("kind", "start", "end")
+
+    def __init__(self, kind: str, start: int, end: int):
+        self.kind = kind
+        self.start = start
+        self.end = end
+
+    def __repr__(self) -> str:
+        return f"Block({self.kind}, {self.start}:{self.end})"
+
+
+class TableRow:
+    __slots__ = ("cells", "start", "end")
+
+    def __init__(self, cells: List[Cell], start: int, end: int):
+        self.cells = cells
+        self.start = start
+        self.end = end
+
+
+class Table:
+    """A markdown table: header names plus typed rows, addressed by offsets."""
+
+    __slots__ = ("kind", "name", "headers", "rows", "start", "end")
+
+    def __init__(self, name: str, headers: List[str], start: int):
+        self.kind = "table"
+        self.name = name
+        self.headers = headers
+        self.rows: List[TableRow] = []
+        self.start = start
+        self.end = start
+
+    def row_dicts(self) -> List[Dict[str, str]]:
+        """Rows as {header: raw cell text} dicts (the legacy row format)."""
+        return [
+            {h: c.raw for h, c in zip(self.headers, row.cells)}
+            for row in self.rows
+        ]
+
+
+class Section:
+    """A heading and everything up to the next heading of the same or higher level."""
+
+    __slots__ = ("title", "level", "start", "end", "blocks", "children", "parent", "line_no")
+
+    def __init__(self, title: str, level: int, start: int, line_no: int, parent: Optional["Section"]):
+        self.title = title
+        self.level = level
+        self.start = start
+        self.end = start
+        self.line_no = line_no
+        self.parent = parent
+        self.blocks: List[Any] = []
+        self.children: List["Section"] = []
+
+    def path(self) -> List[str]:
+        """Titles from the top-level heading down to this section."""
+        titles = []
+        node: Optional[Section] = self
+        while node is not None and node.level > 0:
+            titles.append(node.title)
+            node = node.parent
+        return titles[::-1]
+
+    def __repr__(self) -> str:
+        return f"Section({self.title!r}, level={self.level}, {self.start}:{self.end})"
+
+
+class MarkdownTree:
+    """Result of ``parse_markdown``: the source text plus its section tree."""
+
+    __slots__ = ("text", "root")
+
+    def __init__(self, text: str, root: Section):
+        self.text = text
+        self.root = root
+
+    def slice(self, element: Any) -> str:
+        return self.text[element.start:element.end]
+
+    def iter_sections(self) -> Iterator[Section]:
+        stack = [self.root]
+        while stack:
+            section = stack.pop()
+            yield section
+            stack.extend(reversed(section.children))
+
+    def iter_tables(self) -> Iterator[Any]:
+        """Yield (section, table) pairs in document order."""
+        for section in self.iter_sections():
+            for block in section.blocks:
+                if isinstance(block, Table):
+                    yield section, block
+
+
+def _split_row(line: str) -> List[str]:
+    return [c.strip() for c in line.split("|")[1:-1]]
+
+
+def parse_markdown(text: str) -> MarkdownTree:
+    """
+    Parse markdown into a section tree in one linear pass over the text.
+
+    Recognised structure: ATX headings (``#`` .. ``######``), pipe tables
+    (header, optional blank lines, separator, rows), horizontal rules
+    (``---``) and blank-line separated paragraphs. Anything else is paragraph
+    text; lists and emphasis are kept verbatim inside paragraphs.
+    """
+    root = Section("", 0, 0, -1, None)
+    current = root
+    para_start = -1
+    para_end = -1
+    table: Optional[Table] = None
+    # Candidate table header awaiting its separator: (line, start, line number, end)
+    pending_header = None
+
+    def close_paragraph():
+        nonlocal para_start
+        if para_start >= 0:
+            current.blocks.append(Block("paragraph", para_start, para_end))
+            para_start = -1
+
+    def flush_pending():
+        # A header candidate without separator is ordinary paragraph text.
+        nonlocal pending_header, para_start, para_end
+        if pending_header is not None:
+            _, start, _, end = pending_header
+            if para_start < 0:
+                para_start = start
+            para_end = end
+            pending_header = None
+
+    def table_name_for(line_no: int) -> str:
+        if current.level >= 3 and "Table" in current.title and line_no - current.line_no <= _TABLE_NAME_LOOKBACK:
+            m = _TABLE_NAME_RE.search(current.title)
+            return m.group(1).strip() if m else current.title
+        return "Unknown Table"
+
+    pos = 0
+    line_no = 0
+    n = len(text)
+    while pos < n:
+        nl = text.find("\n", pos)
+        line_end = n if nl < 0 else nl
+        next_pos = n if nl < 0 else nl + 1
+        line = text[pos:line_end].strip()
+
+        if table is not None:
+            if line.startswith("|"):
+                table.rows.append(TableRow([Cell(c) for c in _pad(_split_row(line), len(table.headers))], pos, line_end))
+                table.end = line_end
+                pos, line_no = next_pos, line_no + 1
+                continue
+            current.blocks.append(table)
+            table = None
+
+        if pending_header is not None:
+            if not line:
+                pos, line_no = next_pos, line_no + 1
+                continue
+            if _SEPARATOR_RE.match(line):
+                header_line, header_start, header_line_no, _ = pending_header
+                pending_header = None
+                close_paragraph()
+                headers = _split_row(header_line)
+                table = Table(table_name_for(header_line_no), headers, header_start)
+                table.end = line_end
+                pos, line_no = next_pos, line_no + 1
+                continue
+            flush_pending()
+
+        if not line:
+            close_paragraph()
+        elif line.startswith("#") and (m := _HEADING_RE.match(line)):
+            close_paragraph()
+            level = len(m.group(1))
+            while current.level >= level:
+                current.end = pos
+                current = current.parent
+            section = Section(m.group(2), level, pos, line_no, current)
+            current.children.append(section)
+            current = section
+        elif line.startswith("|") and line.endswith("|") and len(line) > 1:
+            close_paragraph()
+            pending_header = (line, pos, line_no, line_end)
+        elif line.startswith("---") and set(line) == {"-"}:
+            close_paragraph()
+            current.blocks.append(Block("rule", pos, line_end))
+        else:
+            if para_start < 0:
+                para_start = pos
+            para_end = line_end
+
+        pos, line_no = next_pos, line_no + 1
+
+    if table is not None:
+        current.blocks.append(table)
+    flush_pending()
+    close_paragraph()
+    while current is not None:
+        current.end = n
+        current = current.parent
+
+    return MarkdownTree(text, root)
+
+
+def _pad(cells: List[str], width: int) -> List[str]:
+    if len(cells) < width:
+        cells.extend([""] * (width - len(cells)))
+    return cells[:width]
@@ -1,11 +1,53 @@
 import os
 import logging
+import threading
+import time
 from datetime import date
+from typing import Any, Callable, Dict, List, Optional, Sequence
 
-from .date_client import call_days_between_dates
+from . import date_tools
+from .date_client import call_date_tool, call_days_between_dates
+from .resilience import CircuitBreaker, CircuitOpenError
 
 logger = logging.getLogger(__name__)
 
+# Resilience settings for real MCP calls (seconds unless noted).
+DEFAULT_MCP_TIMEOUT_S = 10.0
+DEFAULT_MCP_SLOW_CALL_S = 3.0
+DEFAULT_MCP_BREAKER_THRESHOLD = 3
+DEFAULT_MCP_BREAKER_COOLDOWN_S = 30.0
+
+_breaker: Optional[CircuitBreaker] = None
+_breaker_lock = threading.Lock()
+
+
+def _mcp_timeout() -> float:
+    return float(os.getenv("MCP_TIMEOUT_S", DEFAULT_MCP_TIMEOUT_S))
+
+
+def _probe_mcp() -> None:
+    if call_days_between_dates("2024-01-01", "2024-01-02", timeout=_mcp_timeout()) != 1:
+        raise RuntimeError("MCP probe returned an unexpected result")
+
+
+def get_circuit_breaker() -> CircuitBreaker:
+    """The process-wide breaker guarding real MCP calls, configured from env."""
+    global _breaker
+    with _breaker_lock:
+        if _breaker is None:
+            _breaker = CircuitBreaker(
+                probe=_probe_mcp,
+                failure_threshold=int(os.getenv("MCP_BREAKER_THRESHOLD", DEFAULT_MCP_BREAKER_THRESHOLD)),
+                slow_call_s=float(os.getenv("MCP_SLOW_CALL_S", DEFAULT_MCP_SLOW_CALL_S)),
+                cooldown_s=float(os.getenv("MCP_BREAKER_COOLDOWN_S", DEFAULT_MCP_BREAKER_COOLDOWN_S)),
+            )
+        return _breaker
+
+
+def get_mcp_stats() -> Dict[str, Any]:
+    """Breaker state plus counters (calls, failures, timeouts, fallbacks, ...) and latencies."""
+    return get_circuit_breaker().stats()
+
 
 def compute_days_between_dates_legacy(start: str, end: str) -> int:
     """
@@ -31,19 +73,95 @@ def compute_days_between_dates(start: str, end: str) -> int:
     Strict mode: If USE_REAL_MCP=1 and MCP fails, raise an error unless
     ALLOW_MCP_FALLBACK=1 is set.
     """
+    return _route_date_tool(
+        "days_between_dates",
+        lambda timeout: call_days_between_dates(start, end, absolute=True, timeout=timeout),
+        lambda: compute_days_between_dates_legacy(start, end),
+        describe=lambda days: f"days_between_dates({start}, {end}) -> {days}",
+    )
+
+
+def _route_date_tool(
+    name: str,
+    mcp_call: Callable[[float], Any],
+    legacy_call: Callable[[], Any],
+    describe: Optional[Callable[[Any], str]] = None,
+) -> Any:
+    """
+    Run a date tool via real MCP or the in-process implementation.
+
+    With USE_REAL_MCP=1 the call gets a deadline (MCP_TIMEOUT_S) and goes
+    through the circuit breaker. Failures, timeouts and an open breaker fall
+    back to legacy when ALLOW_MCP_FALLBACK=1; otherwise they raise (strict
+    mode), and an open breaker fails fast with CircuitOpenError.
+    """
     use_real = os.getenv("USE_REAL_MCP", "0") == "1"
     allow_fallback = os.getenv("ALLOW_MCP_FALLBACK", "0") == "1"
-    
-    if use_real:
-        try:
-            days = call_days_between_dates(start, end, absolute=True)
-            logger.info("[REAL MCP] days_between_dates(%s, %s) -> %s", start, end, days)
-            return days
-        except Exception:
-            logger.exception("Real MCP call failed.")
-            if allow_fallback:
-                logger.warning("Falling back to legacy because ALLOW_MCP_FALLBACK=1")
-                return compute_days_between_dates_legacy(start, end)
-            raise  # strict mode: fail loudly
-
-    return compute_days_between_dates_legacy(start, end)
+
+    if not use_real:
+        return legacy_call()
+
+    breaker = get_circuit_breaker()
+    if not breaker.allow_request():
+        if allow_fallback:
+            breaker.record_fallback()
+            logger.warning("MCP circuit breaker is %s; using legacy for %s", breaker.state, name)
+            return legacy_call()
+        raise CircuitOpenError(f"MCP circuit breaker is {breaker.state}; refusing {name}")
+
+    start = time.perf_counter()
+    try:
+        result = mcp_call(_mcp_timeout())
+    except Exception as exc:
+        breaker.record_failure(time.perf_counter() - start, timed_out=isinstance(exc, TimeoutError))
+        logger.exception("Real MCP call failed.")
+        if allow_fallback:
+            breaker.record_fallback()
+            logger.warning("Falling back to legacy because ALLOW_MCP_FALLBACK=1")
+            return legacy_call()
+        raise  # strict mode: fail loudly
+
+    breaker.record_success(time.perf_counter() - start)
+    logger.info("[REAL MCP] %s", describe(result) if describe else f"{name} -> ok")
+    return result
+
+
+def compute_event_interval(
+    text: str,
+    start_event: str,
+    end_event: str,
+    weekend: str = "sat-sun",
+) -> Dict[str, Any]:
+    """
+    Resolve two event descriptions against the dated events in ``text`` and
+    compute days / business days / weeks between them in one tool call.
+    """
+    args = {"text": text, "start_event": start_event, "end_event": end_event, "weekend": weekend}
+    return _route_date_tool(
+        "interval_between_events",
+        lambda timeout: call_date_tool("interval_between_events", args, timeout=timeout),
+        lambda: date_tools.interval_between_events(text, start_event, end_event, weekend=weekend),
+    )
+
+
+def extract_dated_events(text: str) -> List[Dict[str, str]]:
+    """All dated events found in ``text``, sorted chronologically."""
+    result = _route_date_tool(
+        "extract_dated_events",
+        lambda timeout: call_date_tool("extract_dated_events", {"text": text}, timeout=timeout),
+        lambda: {"events": date_tools.extract_dated_events(text)},
+    )
+    return result["events"]
+
+
+def compute_intervals(pairs: Sequence[Sequence[str]], weekend: str = "sat-sun") -> List[Dict[str, Any]]:
+    """Days / business days / weeks for many (start, end) pairs in one call."""
+    pairs = [list(p) for p in pairs]
+    result = _route_date_tool(
+        "compute_intervals",
+        lambda timeout: call_date_tool(
+            "compute_intervals", {"pairs": pairs, "weekend": weekend}, timeout=timeout
+        ),
+        lambda: {"intervals": date_tools.compute_intervals(pairs, weekend=weekend)},
+    )
+    return result["intervals"]
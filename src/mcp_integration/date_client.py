@@ -1,14 +1,16 @@
 from __future__ import annotations
 
-from __future__ import annotations
-
 import asyncio
+import atexit
+import concurrent.futures
 import json
 import logging
+import os
 import sys
+import threading
 from contextlib import AsyncExitStack
 from pathlib import Path
-from typing import Optional
+from typing import Any, Awaitable, Callable, Dict, Optional
 
 # Import from installed MCP package - no namespace conflict since we renamed our local module
 from mcp import ClientSession, StdioServerParameters
@@ -16,14 +18,49 @@ from mcp.client.stdio import stdio_client
 
 logger = logging.getLogger(__name__)
 
+SERVER_SCRIPT_PATH = Path(__file__).resolve().parent / "date_server.py"
+TRANSPORTS = ("stdio", "memory")
+
+
+def get_transport() -> str:
+    """MCP transport selected by MCP_TRANSPORT: "stdio" (default) or "memory"."""
+    transport = os.getenv("MCP_TRANSPORT", "stdio").strip().lower()
+    if transport not in TRANSPORTS:
+        raise ValueError(f"MCP_TRANSPORT must be one of {TRANSPORTS}, got {transport!r}")
+    return transport
+
 
 class MCPDateMathClient:
-    def __init__(self, server_script_path: Path):
+    """
+    MCP client session for the date server.
+
+    ``transport="stdio"`` spawns ``date_server.py`` as a subprocess and talks
+    JSON-RPC over its pipes. ``transport="memory"`` runs the same FastMCP
+    server inside this event loop, connected through in-memory streams: the
+    session still performs the MCP handshake and every call goes through
+    ``session.call_tool()``, but there is no subprocess and no pipe I/O.
+    """
+
+    def __init__(self, server_script_path: Path = SERVER_SCRIPT_PATH, transport: str = "stdio"):
+        if transport not in TRANSPORTS:
+            raise ValueError(f"Unknown MCP transport {transport!r}")
         self.server_script_path = server_script_path
+        self.transport = transport
         self.session: Optional[ClientSession] = None
         self.exit_stack = AsyncExitStack()
 
     async def __aenter__(self) -> "MCPDateMathClient":
+        if self.transport == "memory":
+            from mcp.shared.memory import create_connected_server_and_client_session
+
+            from .date_server import mcp as date_server
+
+            # Same server object and tool schema the subprocess would expose.
+            self.session = await self.exit_stack.enter_async_context(
+                create_connected_server_and_client_session(date_server._mcp_server)
+            )
+            return self
+
         server_params = StdioServerParameters(
             command=sys.executable,  # Use same Python interpreter (ensures same venv)
             args=[str(self.server_script_path)],
@@ -71,14 +108,152 @@ class MCPDateMathClient:
         # Last resort
         return int(str(result).strip())
 
+    async def call_tool_json(self, name: str, arguments: Dict[str, Any]) -> Any:
+        """Call a tool whose result is a JSON object and return it decoded."""
+        if not self.session:
+            raise RuntimeError("MCP session not initialized")
+
+        result = await self.session.call_tool(name, arguments)
+        if getattr(result, "isError", False):
+            raise RuntimeError(f"MCP tool {name} failed: {result.content}")
+
+        # The text block carries the tool's dict as JSON; structuredContent
+        # wraps non-model return types in {"result": ...}, so prefer the text.
+        block = result.content[0]
+        text = getattr(block, "text", None)
+        if text is None and isinstance(block, dict):
+            text = block.get("text")
+        return json.loads(text)
+
+
+class InMemoryDateSession:
+    """
+    A long-lived in-memory MCP session, shared by all synchronous callers.
+
+    The session lives on a private event loop in a daemon thread: one owner
+    task enters the client context (server task + handshake) once and keeps
+    it open, and calls are submitted to that loop from any thread. This
+    avoids paying for an event loop and an MCP handshake on every call.
+    """
+
+    def __init__(self):
+        self._loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(
+            target=self._loop.run_forever, name="mcp-date-memory", daemon=True
+        )
+        self._client: Optional[MCPDateMathClient] = None
+        self._stop: Optional[asyncio.Event] = None
+        self._ready = threading.Event()
+        self._thread.start()
+        self._owner = asyncio.run_coroutine_threadsafe(self._serve(), self._loop)
+        self._ready.wait()
+        if self._owner.done():
+            # Startup failed: surface the error (and stop the loop thread).
+            self._loop.call_soon_threadsafe(self._loop.stop)
+            self._owner.result()
+
+    async def _serve(self) -> None:
+        self._stop = asyncio.Event()
+        try:
+            async with MCPDateMathClient(transport="memory") as client:
+                self._client = client
+                self._ready.set()
+                await self._stop.wait()
+        finally:
+            self._client = None
+            self._ready.set()
+
+    def call(
+        self,
+        fn: Callable[[MCPDateMathClient], Awaitable[Any]],
+        timeout: Optional[float] = None,
+    ) -> Any:
+        """Run ``fn(client)`` on the session loop and wait up to ``timeout`` seconds."""
+        if self._client is None:
+            raise RuntimeError("In-memory MCP session is closed")
+        future = asyncio.run_coroutine_threadsafe(fn(self._client), self._loop)
+        try:
+            return future.result(timeout)
+        except concurrent.futures.TimeoutError:
+            future.cancel()
+            raise TimeoutError(f"MCP call did not finish within {timeout}s") from None
+
+    def close(self) -> None:
+        if self._owner.done():
+            return
+        self._loop.call_soon_threadsafe(self._stop.set)
+        self._owner.result()
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join()
+
+
+_memory_session: Optional[InMemoryDateSession] = None
+_memory_session_lock = threading.Lock()
+
+
+def get_memory_session() -> InMemoryDateSession:
+    """The process-wide in-memory session, started on first use."""
+    global _memory_session
+    with _memory_session_lock:
+        if _memory_session is None:
+            _memory_session = InMemoryDateSession()
+            atexit.register(_memory_session.close)
+        return _memory_session
+
+
+async def _with_deadline(awaitable: Awaitable[Any], timeout: Optional[float]) -> Any:
+    try:
+        return await asyncio.wait_for(awaitable, timeout)
+    except asyncio.TimeoutError:
+        raise TimeoutError(f"MCP call did not finish within {timeout}s") from None
+
+
+# Stdio calls with a deadline run here, so the caller is released at the
+# deadline while the cancelled call tears its server subprocess down.
+_stdio_executor = concurrent.futures.ThreadPoolExecutor(max_workers=4, thread_name_prefix="mcp-stdio")
+
+
+def _run_stdio(make_call: Callable[[], Awaitable[Any]], timeout: Optional[float]) -> Any:
+    if timeout is None:
+        # We're in a normal CLI app, so asyncio.run is fine.
+        return asyncio.run(make_call())
+    future = _stdio_executor.submit(lambda: asyncio.run(_with_deadline(make_call(), timeout)))
+    try:
+        return future.result(timeout)
+    except concurrent.futures.TimeoutError:
+        raise TimeoutError(f"MCP call did not finish within {timeout}s") from None
+
 
 async def _call_days_between_dates(date1: str, date2: str, absolute: bool = True) -> int:
-    server_path = Path(__file__).resolve().parent / "date_server.py"
-    async with MCPDateMathClient(server_path) as client:
+    async with MCPDateMathClient(SERVER_SCRIPT_PATH) as client:
         return await client.days_between_dates(date1, date2, absolute=absolute)
 
 
-def call_days_between_dates(date1: str, date2: str, absolute: bool = True) -> int:
-    # We're in a normal CLI app, so asyncio.run is fine.
-    return asyncio.run(_call_days_between_dates(date1, date2, absolute=absolute))
+def call_days_between_dates(
+    date1: str, date2: str, absolute: bool = True, timeout: Optional[float] = None
+) -> int:
+    """
+    Synchronous days_between_dates call. ``timeout`` bounds the whole call,
+    including the server spawn and handshake for the stdio transport.
+    """
+    if get_transport() == "memory":
+        return get_memory_session().call(
+            lambda client: client.days_between_dates(date1, date2, absolute=absolute),
+            timeout=timeout,
+        )
+    return _run_stdio(lambda: _call_days_between_dates(date1, date2, absolute=absolute), timeout)
+
+
+async def _call_date_tool(name: str, arguments: Dict[str, Any]) -> Any:
+    async with MCPDateMathClient(SERVER_SCRIPT_PATH) as client:
+        return await client.call_tool_json(name, arguments)
+
+
+def call_date_tool(name: str, arguments: Dict[str, Any], timeout: Optional[float] = None) -> Any:
+    """Synchronously call any JSON-returning tool on the date server."""
+    if get_transport() == "memory":
+        return get_memory_session().call(
+            lambda client: client.call_tool_json(name, arguments), timeout=timeout
+        )
+    return _run_stdio(lambda: _call_date_tool(name, arguments), timeout)
 
@@ -1,28 +1,22 @@
 from __future__ import annotations
 
 import logging
-from datetime import datetime, date
+from typing import Any, Dict, List
 
 # Import from installed MCP package - no namespace conflict since we renamed our local module
 from mcp.server.fastmcp import FastMCP
 
-# IMPORTANT: STDIO MCP servers must not print to stdout; use logging (stderr) instead.
-logging.basicConfig(level=logging.INFO)
+try:
+    from . import date_tools
+except ImportError:  # executed as a script by the STDIO client
+    import date_tools
+
 logger = logging.getLogger(__name__)
 
 mcp = FastMCP("date-math")
 
-
-def _parse_iso_date(s: str) -> date:
-    """
-    Accepts 'YYYY-MM-DD' or ISO datetime like '2024-01-03T19:40:00' (optionally with Z).
-    Returns a date() (day resolution), which is exactly what we need for day-diff.
-    """
-    s = s.strip().replace("Z", "+00:00")
-    try:
-        return datetime.fromisoformat(s).date()
-    except ValueError:
-        return datetime.strptime(s, "%Y-%m-%d").date()
+# Kept for backwards compatibility with code importing it from here.
+_parse_iso_date = date_tools.parse_iso_date
 
 
 @mcp.tool()
@@ -35,13 +29,72 @@ async def days_between_dates(date1: str, date2: str, absolute: bool = True) -> i
         date2: ISO date or datetime string
         absolute: If true, return abs(date2 - date1). If false, return signed difference.
     """
-    d1 = _parse_iso_date(date1)
-    d2 = _parse_iso_date(date2)
-    delta = (d2 - d1).days
-    return abs(delta) if absolute else delta
+    return date_tools.days_between(date1, date2, absolute=absolute)
+
+
+@mcp.tool()
+async def business_days_between(date1: str, date2: str, weekend: str = "sat-sun") -> int:
+    """
+    Count working days between two ISO dates (half-open interval).
+
+    Args:
+        date1: ISO date or datetime string
+        date2: ISO date or datetime string
+        weekend: "sat-sun" (default) or "fri-sat"
+    """
+    return date_tools.business_days_between(date1, date2, weekend=weekend)
+
+
+@mcp.tool()
+async def compute_intervals(pairs: List[List[str]], weekend: str = "sat-sun") -> Dict[str, Any]:
+    """
+    Bulk interval computation.
+
+    Args:
+        pairs: List of [start, end] ISO date strings
+        weekend: Weekend convention for business days ("sat-sun" or "fri-sat")
+
+    Returns {"intervals": [{start, end, days, business_days, weeks}, ...]}.
+    """
+    return {"intervals": date_tools.compute_intervals(pairs, weekend=weekend)}
+
+
+@mcp.tool()
+async def extract_dated_events(text: str) -> Dict[str, Any]:
+    """
+    Extract all dated events from claim text (Event Ledger rows, serialized
+    table rows, timestamped log entries, dated headings, other ISO dates).
+
+    Returns {"events": [{date, label, kind}, ...]} sorted chronologically.
+    """
+    return {"events": date_tools.extract_dated_events(text)}
+
+
+@mcp.tool()
+async def interval_between_events(
+    text: str,
+    start_event: str,
+    end_event: str,
+    weekend: str = "sat-sun",
+) -> Dict[str, Any]:
+    """
+    Resolve two event descriptions (e.g. "the accident", "the final settlement")
+    against the dated events in the text and compute the interval between them.
+
+    Returns {found, start_event, end_event, start_date, end_date, days, business_days, weeks}.
+    """
+    result = date_tools.interval_between_events(text, start_event, end_event, weekend=weekend)
+    logger.info(
+        "interval_between_events(%r, %r) -> %s days", start_event, end_event, result.get("days")
+    )
+    return result
 
 
 def main() -> None:
+    # IMPORTANT: STDIO MCP servers must not print to stdout; use logging (stderr) instead.
+    # Configured here rather than at import so the in-memory transport, which
+    # imports this module into the host process, leaves its logging alone.
+    logging.basicConfig(level=logging.INFO)
     mcp.run(transport="stdio")  # canonical way to run FastMCP over STDIO
 
 
@@ -0,0 +1,260 @@
+"""
+Pure-Python date/timeline computations shared by the MCP server and the
+legacy (in-process) path.
+
+The MCP server in ``date_server.py`` exposes these as tools; ``client.py``
+calls them directly when real MCP is disabled, so both paths return the same
+results.
+"""
+
+from __future__ import annotations
+
+import math
+import re
+from datetime import date, datetime, timedelta
+from typing import Any, Dict, Iterable, List, Optional, Sequence
+
+_ISO = r"\d{4}-\d{2}-\d{2}(?:[ T]\d{2}:\d{2}(?::\d{2})?)?"
+
+# Table row in markdown: | 2024-01-03 19:40 | Event | Document | Notes |
+_TABLE_ROW_RE = re.compile(rf"^\|\s*({_ISO})\s*\|\s*([^|]+?)\s*\|(.*)$", re.MULTILINE)
+# Serialized table-row node: "Date: 2024-01-03 19:40, Event: ..., Document: ..."
+_ROW_SENTENCE_RE = re.compile(
+    rf"Date:\s*({_ISO})\s*,\s*(?:Event|Item):\s*(.+?)(?:,\s*(?:Document|Amount|Notes):|$)",
+    re.MULTILINE,
+)
+# Log/bullet entries: **2024-01-03 19:35:00** – text   or   - **2024-01-05** – text
+_BOLD_ENTRY_RE = re.compile(rf"^[ \t]*(?:-\s*)?\*\*({_ISO})\*\*\s*[–—-]\s*(.+)$", re.MULTILINE)
+# Headings / bold labels that end in a date: ### Excerpt – 2024-05-10 (...)
+_LABELED_DATE_RE = re.compile(
+    rf"^[ \t]*(?:#+[ \t]*|\*\*)([^*\n]+?)\s*[–—-]\s*({_ISO})\b[^\n]*$", re.MULTILINE
+)
+_ANY_DATE_RE = re.compile(rf"\b({_ISO})\b")
+_LEADING_SPACE_RE = re.compile(r"[ \t]*")
+
+_WORD_RE = re.compile(r"[a-z0-9]+")
+_STOPWORDS = {
+    "the", "a", "an", "of", "and", "to", "on", "at", "in", "for", "from", "with",
+    "date", "day", "days", "was", "were", "did", "is", "her", "his", "their",
+    "insured", "claim", "when", "what", "which",
+}
+# Domain synonyms: question wording -> words used in the claim's event labels.
+_SYNONYMS = {
+    "accident": ["collision", "crash", "impact"],
+    "crash": ["collision", "accident"],
+    "er": ["emergency", "room"],
+    "hospital": ["emergency", "room"],
+    "physio": ["physiotherapy"],
+    "physiotherapy": ["physio"],
+    "settlement": ["settled"],
+    "settled": ["settlement"],
+    "fnol": ["initial", "loss", "report"],
+    "inspection": ["adjuster", "visit"],
+    "work": ["return"],
+}
+_STEM_LEN = 5
+_WEEKENDS = {"sat-sun": {5, 6}, "fri-sat": {4, 5}}
+
+
+def parse_iso_date(s: str) -> date:
+    """
+    Accepts 'YYYY-MM-DD' or ISO datetime like '2024-01-03T19:40:00' (optionally with Z).
+    Returns a date() (day resolution), which is exactly what we need for day-diff.
+    """
+    s = s.strip().replace("Z", "+00:00")
+    try:
+        return datetime.fromisoformat(s).date()
+    except ValueError:
+        return datetime.strptime(s, "%Y-%m-%d").date()
+
+
+def days_between(date1: str, date2: str, absolute: bool = True) -> int:
+    delta = (parse_iso_date(date2) - parse_iso_date(date1)).days
+    return abs(delta) if absolute else delta
+
+
+def business_days_between(date1: str, date2: str, weekend: str = "sat-sun") -> int:
+    """
+    Count working days in the half-open interval [earlier, later).
+
+    Args:
+        weekend: "sat-sun" (default) or "fri-sat" (Israeli work week).
+    """
+    weekend_days = _WEEKENDS.get(weekend, _WEEKENDS["sat-sun"])
+    d1, d2 = sorted((parse_iso_date(date1), parse_iso_date(date2)))
+    total = (d2 - d1).days
+    full_weeks, remainder = divmod(total, 7)
+    count = full_weeks * (7 - len(weekend_days))
+    for i in range(remainder):
+        if (d1 + timedelta(days=full_weeks * 7 + i)).weekday() not in weekend_days:
+            count += 1
+    return count
+
+
+def compute_intervals(pairs: Sequence[Sequence[str]], weekend: str = "sat-sun") -> List[Dict[str, Any]]:
+    """Bulk interval computation: days, business days and weeks per (start, end) pair."""
+    results = []
+    for start, end in pairs:
+        days = days_between(start, end, absolute=False)
+        results.append({
+            "start": start,
+            "end": end,
+            "days": days,
+            "business_days": business_days_between(start, end, weekend) * (1 if days >= 0 else -1),
+            "weeks": round(days / 7, 2),
+        })
+    return results
+
+
+def _clean_label(label: str) -> str:
+    return re.sub(r"\*\*|__", "", label).strip(" .|")
+
+
+def extract_dated_events(text: str, offsets: bool = False) -> List[Dict[str, Any]]:
+    """
+    Extract (date, label) events from claim text.
+
+    Recognises Event Ledger table rows, serialized table-row sentences,
+    timestamped log/bullet entries and headings ending in a date. Any other
+    ISO date is returned with its surrounding line as the label. Events are
+    de-duplicated and sorted chronologically. With ``offsets``, each event
+    also has the ``start`` / ``end`` offsets of its line in ``text``.
+    """
+    events: List[Dict[str, str]] = []
+    seen = set()
+    covered_lines = set()
+
+    def add(raw_date: str, label: str, kind: str, line_start: int):
+        label = _clean_label(label)
+        key = (raw_date, label.lower())
+        # The line has an event even when it repeats one already seen, so
+        # its date is not picked up again as a mention.
+        covered_lines.add(line_start)
+        if not label or key in seen:
+            return
+        seen.add(key)
+        event: Dict[str, Any] = {"date": raw_date, "label": label, "kind": kind}
+        if offsets:
+            # The span starts at the entry itself, past its indentation.
+            start = _LEADING_SPACE_RE.match(text, line_start).end()
+            line_end = text.find("\n", start)
+            event["start"], event["end"] = start, line_end if line_end >= 0 else len(text)
+        events.append(event)
+
+    def line_start_of(pos: int) -> int:
+        return text.rfind("\n", 0, pos) + 1
+
+    for m in _TABLE_ROW_RE.finditer(text):
+        add(m.group(1), m.group(2), "ledger", line_start_of(m.start()))
+    for m in _ROW_SENTENCE_RE.finditer(text):
+        add(m.group(1), m.group(2), "ledger", line_start_of(m.start()))
+    for m in _BOLD_ENTRY_RE.finditer(text):
+        add(m.group(1), m.group(2), "log", line_start_of(m.start(1)))
+    for m in _LABELED_DATE_RE.finditer(text):
+        add(m.group(2), m.group(1), "heading", line_start_of(m.start(2)))
+    for m in _ANY_DATE_RE.finditer(text):
+        start = line_start_of(m.start())
+        if start in covered_lines:
+            continue
+        end = text.find("\n", m.end())
+        line = text[start:end if end >= 0 else len(text)]
+        add(m.group(1), line.replace(m.group(1), "").strip(" -–—:*#|"), "mention", start)
+
+    events.sort(key=lambda e: (parse_iso_date(e["date"]), e["date"]))
+    return events
+
+
+def stems(text: str) -> List[str]:
+    """Word stems (first letters) used to match event labels."""
+    return [w[:_STEM_LEN] for w in _WORD_RE.findall(text.lower())]
+
+
+def query_terms(query: str) -> List[str]:
+    """Stems of the query words, stopwords dropped and domain synonyms added."""
+    terms = []
+    for word in _WORD_RE.findall(query.lower()):
+        if word in _STOPWORDS:
+            continue
+        terms.append(word)
+        terms.extend(_SYNONYMS.get(word, []))
+    return list(dict.fromkeys(w[:_STEM_LEN] for w in terms))
+
+
+# Structured sources are more trustworthy labels than a date mentioned in prose.
+KIND_WEIGHT = {"ledger": 1.0, "heading": 0.9, "log": 0.8, "mention": 0.6}
+
+
+def find_event(events: Sequence[Dict[str, str]], query: str) -> Optional[Dict[str, str]]:
+    """
+    Best-matching event for a natural-language description (e.g. "the accident").
+
+    Terms are weighted by inverse frequency across event labels, so a word that
+    only one event mentions ("settled") outweighs one that many share ("final").
+    Ledger rows are preferred over log entries and free-text mentions; ties
+    resolve to the earliest event.
+    """
+    terms = query_terms(query)
+    if not terms or not events:
+        return None
+
+    label_stems = [set(stems(e["label"])) for e in events]
+    n = len(events)
+    weights = {
+        t: math.log(1 + n / (1 + sum(t in label_set for label_set in label_stems)))
+        for t in terms
+    }
+    best, best_key = None, None
+    for event, label_set in zip(events, label_stems):
+        score = sum(w for t, w in weights.items() if t in label_set)
+        score *= KIND_WEIGHT.get(event.get("kind"), 0.5)
+        if score > 0 and (best_key is None or score > best_key):
+            best, best_key = event, score
+    return best
+
+
+def term_coverage(label: str, query: str) -> float:
+    """
+    Share of the query's words (stopwords aside) that ``label`` contains,
+    directly or through a domain synonym. 0.0 for a query without words.
+    """
+    label_set = set(stems(label))
+    words = [w for w in _WORD_RE.findall(query.lower()) if w not in _STOPWORDS]
+    if not words:
+        return 0.0
+    found = sum(
+        any(t[:_STEM_LEN] in label_set for t in [w] + _SYNONYMS.get(w, []))
+        for w in words
+    )
+    return found / len(words)
+
+
+def interval_between_events(
+    text: str,
+    start_query: str,
+    end_query: str,
+    weekend: str = "sat-sun",
+) -> Dict[str, Any]:
+    """
+    Resolve two event descriptions against the dated events in ``text`` and
+    compute the interval between them.
+
+    Returns a dict with ``found`` (bool), the matched ``start_event`` /
+    ``end_event`` and, when both were found, ``days``, ``business_days`` and
+    ``weeks`` plus the day-level ``start_date`` / ``end_date``.
+    """
+    events = extract_dated_events(text)
+    start = find_event(events, start_query)
+    end = find_event(events, end_query)
+    result: Dict[str, Any] = {"found": bool(start and end), "start_event": start, "end_event": end}
+    if start and end:
+        result.update(compute_intervals([(start["date"], end["date"])], weekend)[0])
+        # Report day-level dates, which is what interval answers quote.
+        result["start_date"] = parse_iso_date(start["date"]).isoformat()
+        result["end_date"] = parse_iso_date(end["date"]).isoformat()
+    return result
+
+
+def events_in_range(events: Iterable[Dict[str, str]], start: str, end: str) -> List[Dict[str, str]]:
+    """Events whose date falls within [start, end] (inclusive, day resolution)."""
+    d1, d2 = sorted((parse_iso_date(start), parse_iso_date(end)))
+    return [e for e in events if d1 <= parse_iso_date(e["date"]) <= d2]
@@ -0,0 +1,178 @@
+"""
+Circuit breaker and latency counters for the MCP date tools.
+
+``client.py`` wraps every real MCP call with a ``CircuitBreaker``:
+
+- failures, timeouts and calls slower than ``slow_call_s`` count against the
+  server; after ``failure_threshold`` of them in a row the breaker opens;
+- while open, calls skip MCP entirely (legacy fallback, or an immediate
+  ``CircuitOpenError`` in strict mode) so a misbehaving server cannot stall
+  requests;
+- after ``cooldown_s`` a single probe call runs in a background thread; if it
+  succeeds quickly the breaker closes again, otherwise it stays open for
+  another cooldown.
+"""
+
+from __future__ import annotations
+
+import logging
+import threading
+import time
+from collections import deque
+from typing import Any, Callable, Deque, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class CircuitOpenError(RuntimeError):
+    """Raised in strict mode when the breaker is open and no fallback is allowed."""
+
+
+class LatencyStats:
+    """Latencies of the most recent calls, with percentile summaries (in ms)."""
+
+    def __init__(self, window: int = 1000):
+        self._samples: Deque[float] = deque(maxlen=window)
+
+    def add(self, seconds: float) -> None:
+        self._samples.append(seconds * 1000.0)
+
+    def summary(self) -> Dict[str, Optional[float]]:
+        if not self._samples:
+            return {"count": 0, "p50_ms": None, "p95_ms": None, "max_ms": None}
+        ordered = sorted(self._samples)
+
+        def pct(p: float) -> float:
+            return round(ordered[min(len(ordered) - 1, int(p * len(ordered)))], 3)
+
+        return {
+            "count": len(ordered),
+            "p50_ms": pct(0.50),
+            "p95_ms": pct(0.95),
+            "max_ms": round(ordered[-1], 3),
+        }
+
+
+class CircuitBreaker:
+    """
+    Thread-safe circuit breaker with a background recovery probe.
+
+    Args:
+        probe: Zero-argument callable exercising the server (raises on failure).
+        failure_threshold: Consecutive failed or slow calls that open the breaker.
+        slow_call_s: Successful calls slower than this count as failures.
+        cooldown_s: Time the breaker stays open before a probe is attempted.
+    """
+
+    def __init__(
+        self,
+        probe: Callable[[], Any],
+        failure_threshold: int = 3,
+        slow_call_s: float = 2.0,
+        cooldown_s: float = 30.0,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.probe = probe
+        self.failure_threshold = failure_threshold
+        self.slow_call_s = slow_call_s
+        self.cooldown_s = cooldown_s
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._state = CLOSED
+        self._consecutive_failures = 0
+        self._opened_at = 0.0
+        self.latency = LatencyStats()
+        self.counters: Dict[str, int] = {
+            "calls": 0,
+            "successes": 0,
+            "failures": 0,
+            "timeouts": 0,
+            "slow_calls": 0,
+            "short_circuits": 0,
+            "fallbacks": 0,
+            "trips": 0,
+            "probes": 0,
+            "recoveries": 0,
+        }
+
+    @property
+    def state(self) -> str:
+        return self._state
+
+    def allow_request(self) -> bool:
+        """True if the call may go to MCP; False means short-circuit it."""
+        with self._lock:
+            if self._state == CLOSED:
+                self.counters["calls"] += 1
+                return True
+            self.counters["short_circuits"] += 1
+            if self._state == OPEN and self._clock() - self._opened_at >= self.cooldown_s:
+                self._state = HALF_OPEN
+                threading.Thread(target=self._run_probe, name="mcp-breaker-probe", daemon=True).start()
+            return False
+
+    def record_success(self, elapsed_s: float) -> None:
+        with self._lock:
+            self.latency.add(elapsed_s)
+            if elapsed_s > self.slow_call_s:
+                self.counters["slow_calls"] += 1
+                self._count_failure_locked()
+                return
+            self.counters["successes"] += 1
+            self._consecutive_failures = 0
+
+    def record_failure(self, elapsed_s: float, timed_out: bool = False) -> None:
+        with self._lock:
+            self.latency.add(elapsed_s)
+            self.counters["timeouts" if timed_out else "failures"] += 1
+            self._count_failure_locked()
+
+    def record_fallback(self) -> None:
+        with self._lock:
+            self.counters["fallbacks"] += 1
+
+    def _count_failure_locked(self) -> None:
+        self._consecutive_failures += 1
+        if self._state == CLOSED and self._consecutive_failures >= self.failure_threshold:
+            self._trip_locked()
+
+    def _trip_locked(self) -> None:
+        self._state = OPEN
+        self._opened_at = self._clock()
+        self.counters["trips"] += 1
+        logger.warning(
+            "MCP circuit breaker opened after %d failed or slow calls; retrying in %.0fs",
+            self._consecutive_failures,
+            self.cooldown_s,
+        )
+
+    def _run_probe(self) -> None:
+        start = self._clock()
+        try:
+            self.probe()
+            ok = self._clock() - start <= self.slow_call_s
+        except Exception:
+            logger.debug("MCP breaker probe failed", exc_info=True)
+            ok = False
+        with self._lock:
+            self.counters["probes"] += 1
+            if ok:
+                self._state = CLOSED
+                self._consecutive_failures = 0
+                self.counters["recoveries"] += 1
+                logger.info("MCP circuit breaker closed: probe succeeded")
+            else:
+                self._state = OPEN
+                self._opened_at = self._clock()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "state": self._state,
+                **self.counters,
+                "latency": self.latency.summary(),
+            }
@@ -0,0 +1,376 @@
+"""
+Memory-mapped leaf embedding matrix shared by worker processes.
+
+``MmapVectorStore`` replaces the default in-process ``SimpleVectorStore``
+(one Python list of floats per leaf, copied into every worker). Embeddings
+are written once per index version as a single row-major ``.npy`` matrix,
+with a sidecar JSON id map, and every process opens it with
+``numpy.load(mmap_mode="r")``: the pages are read-only and shared through
+the OS page cache, so N workers cost one copy of the matrix.
+
+Rows are L2-normalized at write time, so a dot product with the normalized
+query is the cosine similarity the default store returns. Three storage
+types trade footprint for recall (see ``measure_recall`` and
+``scripts/vector_recall.py``):
+
+- ``float32``: 4 bytes per dimension, exact;
+- ``float16``: 2 bytes per dimension;
+- ``int8``: 1 byte per dimension plus one float32 scale per row. Rows are
+  quantized as residuals from the matrix's mean vector: embeddings share a
+  large common component, and removing it leaves the 8 bits for what tells
+  rows apart. ``q . x = q . mean + q . residual``, so scores stay cosines.
+
+Files are ``<index version>-<dtype>.npy`` (+ ``.scales.npy`` and
+``.center.npy`` for int8) and ``.ids.json`` in ``VECTOR_STORE_DIR``. The id map is written last and marks
+the set as complete, so a worker never maps a half-written matrix.
+
+Every new index version writes a new set; ``get_vector_store`` deletes all
+but the ``VECTOR_STORE_KEEP`` (default 4) most recently written sets.
+Processes that still map a deleted matrix keep their mapping.
+"""
+
+import json
+import os
+import threading
+from pathlib import Path
+from typing import Any, Dict, List, NamedTuple, Optional, Sequence
+
+import numpy as np
+
+from llama_index.core.bridge.pydantic import PrivateAttr
+from llama_index.core.schema import BaseNode
+from llama_index.core.vector_stores.types import (
+    BasePydanticVectorStore,
+    VectorStoreQuery,
+    VectorStoreQueryResult,
+)
+
+
+DEFAULT_VECTOR_STORE_DIR = Path(__file__).resolve().parent.parent / "storage" / "vectors"
+DTYPES = ("float32", "float16", "int8")
+# Rows scored per block, bounding the float32 temporaries of float16/int8 scans.
+_BLOCK_ROWS = 8192
+# Matrix sets (index versions x dtypes) kept in VECTOR_STORE_DIR.
+DEFAULT_KEEP_VERSIONS = 4
+_SET_SUFFIXES = (".scales.npy", ".center.npy", ".ids.json", ".npy")
+
+
+def _normalize_rows(matrix: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return matrix / norms
+
+
+class Quantized(NamedTuple):
+    matrix: np.ndarray
+    scales: Optional[np.ndarray] = None  # int8: per-row scale
+    center: Optional[np.ndarray] = None  # int8: mean row the residuals are taken from
+
+    @property
+    def nbytes(self) -> int:
+        return sum(a.nbytes for a in self if a is not None)
+
+
+def quantize(matrix: np.ndarray, dtype: str) -> Quantized:
+    """Storage form of normalized float32 rows."""
+    if dtype == "float32":
+        return Quantized(np.ascontiguousarray(matrix, dtype=np.float32))
+    if dtype == "float16":
+        return Quantized(matrix.astype(np.float16))
+    if dtype == "int8":
+        center = matrix.mean(axis=0) if len(matrix) else np.zeros(matrix.shape[1], np.float32)
+        residuals = matrix - center
+        scales = np.abs(residuals).max(axis=1) / 127.0
+        scales[scales == 0] = 1.0
+        quantized = np.rint(residuals / scales[:, None]).astype(np.int8)
+        return Quantized(quantized, scales.astype(np.float32), center.astype(np.float32))
+    raise ValueError(f"Unsupported vector dtype {dtype!r}; expected one of {DTYPES}")
+
+
+def score_rows(stored: Quantized, queries: np.ndarray) -> np.ndarray:
+    """
+    Cosine similarities of normalized float32 queries against every stored row:
+    shape (rows,) for one query, (queries, rows) for a 2-D batch.
+    """
+    matrix = stored.matrix
+    if matrix.dtype == np.float32:
+        return queries @ matrix.T
+    scores = np.empty(queries.shape[:-1] + (matrix.shape[0],), dtype=np.float32)
+    for start in range(0, matrix.shape[0], _BLOCK_ROWS):
+        block = matrix[start:start + _BLOCK_ROWS].astype(np.float32)
+        scores[..., start:start + _BLOCK_ROWS] = queries @ block.T
+    if stored.scales is not None:
+        scores *= stored.scales
+    if stored.center is not None:
+        scores += (queries @ stored.center)[..., None]
+    return scores
+
+
+def top_k(scores: np.ndarray, k: int) -> np.ndarray:
+    """Indices of the ``k`` highest scores, best first."""
+    k = min(k, scores.shape[0])
+    if k <= 0:
+        return np.empty(0, dtype=np.int64)
+    candidates = np.argpartition(-scores, k - 1)[:k]
+    return candidates[np.argsort(-scores[candidates], kind="stable")]
+
+
+class MmapVectorStore(BasePydanticVectorStore):
+    """
+    Vector store over a memory-mapped, optionally quantized embedding matrix.
+
+    Build once with ``add`` + ``flush`` (which writes the files and re-opens
+    them mapped); later processes call ``open`` and skip embedding entirely.
+    Text is not stored: results are node ids resolved through the docstore.
+    """
+
+    stores_text: bool = False
+    path: str
+    dtype: str = "float32"
+
+    _ids: List[str] = PrivateAttr(default_factory=list)
+    _ref_doc_ids: List[Optional[str]] = PrivateAttr(default_factory=list)
+    _slots: Dict[str, int] = PrivateAttr(default_factory=dict)
+    _pending: List[np.ndarray] = PrivateAttr(default_factory=list)
+    _stored: Optional[Quantized] = PrivateAttr(default=None)
+    _deleted: Optional[np.ndarray] = PrivateAttr(default=None)
+    _mapped: bool = PrivateAttr(default=False)
+    _lock: Any = PrivateAttr(default_factory=threading.Lock)
+
+    def __init__(self, path: str, dtype: str = "float32", **kwargs: Any):
+        if dtype not in DTYPES:
+            raise ValueError(f"Unsupported vector dtype {dtype!r}; expected one of {DTYPES}")
+        super().__init__(path=str(path), dtype=dtype, **kwargs)
+
+    @classmethod
+    def class_name(cls) -> str:
+        return "MmapVectorStore"
+
+    @property
+    def client(self) -> Any:
+        return None
+
+    @property
+    def matrix_path(self) -> Path:
+        return Path(f"{self.path}.npy")
+
+    @property
+    def scales_path(self) -> Path:
+        return Path(f"{self.path}.scales.npy")
+
+    @property
+    def center_path(self) -> Path:
+        return Path(f"{self.path}.center.npy")
+
+    @property
+    def ids_path(self) -> Path:
+        return Path(f"{self.path}.ids.json")
+
+    @property
+    def is_mapped(self) -> bool:
+        return self._mapped
+
+    @property
+    def num_vectors(self) -> int:
+        # Not __len__: StorageContext.from_defaults tests the store's truthiness.
+        return len(self._ids)
+
+    def open(self) -> bool:
+        """Map a previously flushed matrix read-only; False if there is none."""
+        if not self.ids_path.exists():
+            return False
+        with open(self.ids_path, "r", encoding="utf-8") as f:
+            sidecar = json.load(f)
+        with self._lock:
+            if self.dtype == "int8":
+                self._stored = Quantized(
+                    np.load(self.matrix_path, mmap_mode="r"),
+                    np.load(self.scales_path, mmap_mode="r"),
+                    np.load(self.center_path),
+                )
+            else:
+                self._stored = Quantized(np.load(self.matrix_path, mmap_mode="r"))
+            self._ids = sidecar["ids"]
+            self._ref_doc_ids = sidecar["ref_doc_ids"]
+            self._slots = {node_id: i for i, node_id in enumerate(self._ids)}
+            self._deleted = np.zeros(len(self._ids), dtype=bool)
+            self._pending = []
+            self._mapped = True
+        return True
+
+    def add(self, nodes: Sequence[BaseNode], **kwargs: Any) -> List[str]:
+        if self._mapped:
+            raise RuntimeError("MmapVectorStore is read-only once mapped; build a new index version")
+        with self._lock:
+            for node in nodes:
+                self._slots[node.node_id] = len(self._ids)
+                self._ids.append(node.node_id)
+                self._ref_doc_ids.append(node.ref_doc_id)
+                self._pending.append(np.asarray(node.get_embedding(), dtype=np.float32))
+            self._stored = None
+        return [node.node_id for node in nodes]
+
+    def flush(self) -> None:
+        """Write the added embeddings and switch to the read-only mapping."""
+        if self._mapped:
+            return
+        with self._lock:
+            stored = quantize(self._pending_matrix(), self.dtype)
+            self.matrix_path.parent.mkdir(parents=True, exist_ok=True)
+            # Write to temporary names and rename, id map last: readers only
+            # ever see complete files, even with several builders racing.
+            tmp = f".tmp-{os.getpid()}.npy"
+            for path, array in (
+                (self.matrix_path, stored.matrix),
+                (self.scales_path, stored.scales),
+                (self.center_path, stored.center),
+            ):
+                if array is not None:
+                    np.save(f"{path}{tmp}", array)
+                    os.replace(f"{path}{tmp}", path)
+            tmp = f".tmp-{os.getpid()}"
+            with open(f"{self.ids_path}{tmp}", "w", encoding="utf-8") as f:
+                json.dump({"dtype": self.dtype, "ids": self._ids, "ref_doc_ids": self._ref_doc_ids}, f)
+            os.replace(f"{self.ids_path}{tmp}", self.ids_path)
+        self.open()
+
+    def _pending_matrix(self) -> np.ndarray:
+        if not self._pending:
+            return np.zeros((0, 0), dtype=np.float32)
+        return _normalize_rows(np.vstack(self._pending))
+
+    def _rows(self) -> Quantized:
+        with self._lock:
+            if self._stored is None:
+                # Not flushed yet: score the pending rows in memory.
+                self._stored = quantize(self._pending_matrix(), self.dtype)
+                self._deleted = np.zeros(len(self._ids), dtype=bool)
+            return self._stored
+
+    def query(self, query: VectorStoreQuery, **kwargs: Any) -> VectorStoreQueryResult:
+        if query.filters is not None:
+            raise ValueError("MmapVectorStore does not support metadata filters")
+        if query.query_embedding is None:
+            raise ValueError("MmapVectorStore needs a query embedding")
+        stored = self._rows()
+        if not self._ids:
+            return VectorStoreQueryResult(nodes=None, similarities=[], ids=[])
+
+        q = np.asarray(query.query_embedding, dtype=np.float32)
+        norm = np.linalg.norm(q)
+        if norm:
+            q = q / norm
+        scores = score_rows(stored, q)
+        if self._deleted.any():
+            scores[self._deleted] = -np.inf
+        if query.node_ids is not None:
+            allowed = np.zeros(len(self._ids), dtype=bool)
+            allowed[[self._slots[i] for i in query.node_ids if i in self._slots]] = True
+            scores[~allowed] = -np.inf
+
+        best = [int(i) for i in top_k(scores, query.similarity_top_k) if np.isfinite(scores[i])]
+        return VectorStoreQueryResult(
+            nodes=None,
+            similarities=[float(scores[i]) for i in best],
+            ids=[self._ids[i] for i in best],
+        )
+
+    def delete(self, ref_doc_id: str, **delete_kwargs: Any) -> None:
+        """Hide a document's rows; the shared matrix itself is never rewritten."""
+        self._rows()
+        for slot, ref in enumerate(self._ref_doc_ids):
+            if ref == ref_doc_id:
+                self._deleted[slot] = True
+
+    def persist(self, persist_path: str = "", fs: Optional[Any] = None) -> None:
+        """The matrix lives at ``path``; persisting just flushes it there."""
+        self.flush()
+
+    def nbytes(self) -> int:
+        """Bytes of the stored matrix (and scales), i.e. the shared footprint."""
+        return self._rows().nbytes
+
+
+def measure_recall(
+    reference: np.ndarray,
+    queries: np.ndarray,
+    dtype: str,
+    k: int = 6,
+    exclude_self: bool = False,
+) -> Dict[str, float]:
+    """
+    Recall@k of ``dtype`` storage against exact float32 search.
+
+    ``reference`` holds normalized float32 rows. With ``exclude_self`` the
+    queries are the first rows of ``reference`` (same order) and each row's
+    own match is left out of both result lists, so the measurement is about
+    neighbours.
+    """
+    stored = quantize(reference, dtype)
+    queries = _normalize_rows(np.asarray(queries, dtype=np.float32))
+    exact = queries @ reference.T
+    approx = score_rows(stored, queries)
+    if exclude_self:
+        own = np.arange(len(queries))
+        exact[own, own] = approx[own, own] = -np.inf
+    hits = sum(
+        len(set(top_k(e, k).tolist()) & set(top_k(a, k).tolist()))
+        for e, a in zip(exact, approx)
+    )
+    finite = np.isfinite(exact)
+    return {
+        "dtype": dtype,
+        "bytes_per_vector": stored.nbytes // max(len(reference), 1),
+        "recall": hits / (len(queries) * min(k, reference.shape[0])) if len(queries) else 1.0,
+        "max_score_error": float(np.abs(exact[finite] - approx[finite]).max()) if finite.any() else 0.0,
+    }
+
+
+def prune_vector_sets(directory: Path, keep: int, current: Optional[str] = None) -> List[str]:
+    """
+    Delete the files of all but the ``keep`` most recently written matrix
+    sets in ``directory`` (``current`` is always kept). Returns the deleted
+    set names.
+    """
+    if not directory.is_dir():
+        return []
+    sets: Dict[str, List[Path]] = {}
+    for path in directory.iterdir():
+        if ".tmp-" in path.name:
+            continue
+        for suffix in _SET_SUFFIXES:
+            if path.name.endswith(suffix):
+                sets.setdefault(path.name[: -len(suffix)], []).append(path)
+                break
+
+    def written(name: str) -> float:
+        return max((p.stat().st_mtime for p in sets[name] if p.exists()), default=0.0)
+
+    current_name = Path(current).name if current else None
+    stale = [name for name in sorted(sets, key=written, reverse=True) if name != current_name][max(keep - 1, 0):]
+    for name in stale:
+        for path in sets[name]:
+            try:
+                path.unlink()
+            except FileNotFoundError:
+                pass
+    return stale
+
+
+def get_vector_store(index_version: str) -> Optional[MmapVectorStore]:
+    """
+    Memory-mapped store for an index version, configured via VECTOR_STORE /
+    VECTOR_STORE_DIR / VECTOR_DTYPE / VECTOR_STORE_KEEP, or None when
+    VECTOR_STORE=simple.
+
+    The store is already mapped if this index version was flushed before.
+    Older matrix sets beyond VECTOR_STORE_KEEP are deleted.
+    """
+    if os.getenv("VECTOR_STORE", "mmap") == "simple":
+        return None
+    dtype = os.getenv("VECTOR_DTYPE", "float32")
+    directory = Path(os.getenv("VECTOR_STORE_DIR") or DEFAULT_VECTOR_STORE_DIR)
+    store = MmapVectorStore(path=str(directory / f"{index_version}-{dtype}"), dtype=dtype)
+    store.open()
+    prune_vector_sets(directory, int(os.getenv("VECTOR_STORE_KEEP", DEFAULT_KEEP_VERSIONS)), current=store.path)
+    return store
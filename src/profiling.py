@@ -0,0 +1,290 @@
+"""
+Opt-in sampling profiler for the ingest, query and evaluation pipelines.
+
+``PROFILE=1`` profiles every instrumented section, and ``PROFILE=build,answer``
+only the named ones:
+
+- ``build``: ``indexing.build_indexes`` (parsing, chunking, docstore inserts,
+  embedding, retrievers);
+- ``answer``: ``ManagerAgent.answer`` (routing, retrieval, auto-merge,
+  synthesis, response formatting);
+- ``eval``: ``run_evaluation`` (the whole evaluation; the sections inside
+  it are not profiled separately).
+
+A ``SamplingProfiler`` thread reads every thread's Python stack
+(``sys._current_frames``) every ``PROFILE_INTERVAL_MS`` (default 5 ms), so
+worker threads (sub-queries, speculative summaries, background loading) are
+included and the profiled code runs unmodified. Each sample is attributed
+to one category:
+
+- ``ours``: the innermost frame is in ``src/``;
+- ``network``: a frame is in socket / SSL / HTTP client code, i.e. waiting
+  on the OpenAI API or another server;
+- ``library``: the innermost frame is in LlamaIndex, tiktoken, NumPy or
+  other library or stdlib code;
+- ``idle``: the thread is blocked on a lock, a queue or an event, e.g. an
+  idle pool worker or a thread waiting for its sub-queries.
+
+Every profiled run writes a directory under ``PROFILE_DIR`` (default
+``profiles/``):
+
+- ``stacks.folded``: one ``thread;module:function;... count`` line per
+  distinct stack, root first and without idle samples. This is the
+  collapsed-stack format read by ``flamegraph.pl``, ``inferno-flamegraph``
+  and speedscope.
+- ``summary.json`` / ``summary.txt``:
+  - the share of each category;
+  - the functions and modules with the most self time;
+  - the functions of ours with the most inclusive time, including the
+    library calls they make.
+"""
+
+import json
+import os
+import re
+import sys
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+SRC_DIR = Path(__file__).resolve().parent
+DEFAULT_PROFILE_DIR = PROJECT_ROOT / "profiles"
+DEFAULT_INTERVAL_MS = 5.0
+SECTIONS = ("build", "answer", "eval")
+TOP_N = 25
+
+# Module prefixes whose frames mean the thread waits on the network.
+NETWORK_MODULES = (
+    "socket", "ssl", "selectors", "http.client", "httpx", "httpcore", "h11", "urllib3",
+    "requests", "anyio", "openai._base_client",
+)
+# Innermost frames that mean the thread is blocked, not working.
+IDLE_FUNCTIONS = {
+    ("threading", "wait"),
+    ("threading", "_wait_for_tstate_lock"),
+    ("threading", "join"),
+    ("queue", "get"),
+    ("concurrent.futures._base", "result"),
+    ("concurrent.futures._base", "wait"),
+    ("concurrent.futures.thread", "_worker"),
+}
+_THREAD_SUFFIX_RE = re.compile(r"[_-]\d+$")
+
+
+def _module_name(filename: str) -> Tuple[str, bool]:
+    """(dotted module name, whether the file is in src/) of a code object's file."""
+    path = Path(filename)
+    try:
+        rel = path.resolve().relative_to(SRC_DIR)
+        return ".".join(rel.with_suffix("").parts), True
+    except (ValueError, OSError):
+        pass
+    parts = path.with_suffix("").parts
+    for anchor in ("site-packages", "dist-packages"):
+        if anchor in parts:
+            return ".".join(parts[parts.index(anchor) + 1:]), False
+    # Standard library: the path below pythonX.Y/.
+    for i, part in enumerate(parts):
+        if part.startswith("python") and i + 1 < len(parts):
+            return ".".join(parts[i + 1:]), False
+    return path.stem, False
+
+
+class SamplingProfiler:
+    """Periodic samples of every thread's stack, aggregated as collapsed stacks."""
+
+    def __init__(self, interval_ms: float = DEFAULT_INTERVAL_MS):
+        self.interval = interval_ms / 1000.0
+        self.stacks: Counter = Counter()
+        self.categories: Counter = Counter()
+        self.self_time: Counter = Counter()
+        self.inclusive_ours: Counter = Counter()
+        self.samples = 0
+        self.started = 0.0
+        self.seconds = 0.0
+        self._names: Dict[Any, Tuple[str, bool]] = {}
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self) -> None:
+        self.started = time.perf_counter()
+        self._thread = threading.Thread(target=self._run, name="profiler", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+        self.seconds = time.perf_counter() - self.started
+
+    def _run(self) -> None:
+        own = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            names = {t.ident: t.name for t in threading.enumerate()}
+            for ident, frame in sys._current_frames().items():
+                if ident != own:
+                    self._sample(_THREAD_SUFFIX_RE.sub("", names.get(ident, "thread")), frame)
+
+    def _frame_name(self, code: Any) -> Tuple[str, bool]:
+        cached = self._names.get(code)
+        if cached is None:
+            module, ours = _module_name(code.co_filename)
+            cached = self._names[code] = (f"{module}:{code.co_name}", ours)
+        return cached
+
+    def _sample(self, thread: str, frame: Any) -> None:
+        frames: List[Tuple[str, bool]] = []
+        while frame is not None:
+            frames.append(self._frame_name(frame.f_code))
+            frame = frame.f_back
+        if not frames:
+            return
+        frames.reverse()  # root first
+        leaf, leaf_ours = frames[-1]
+        leaf_module, _, leaf_function = leaf.rpartition(":")
+
+        if (leaf_module, leaf_function) in IDLE_FUNCTIONS:
+            category = "idle"
+        elif any(name.split(":")[0].startswith(NETWORK_MODULES) for name, ours in frames if not ours):
+            category = "network"
+        else:
+            category = "ours" if leaf_ours else "library"
+        self.samples += 1
+        self.categories[category] += 1
+        if category == "idle":
+            return
+        self.stacks[";".join([f"thread:{thread}"] + [name for name, _ in frames])] += 1
+        self.self_time[leaf] += 1
+        for name in {name for name, ours in frames if ours}:
+            self.inclusive_ours[name] += 1
+
+    # Reports --------------------------------------------------------------
+
+    def summary(self, section: str) -> Dict[str, Any]:
+        busy = sum(n for c, n in self.categories.items() if c != "idle")
+        ms = self.interval * 1000.0
+        modules: Counter = Counter()
+        for name, count in self.self_time.items():
+            modules[name.split(":")[0]] += count
+        return {
+            "section": section,
+            "seconds": round(self.seconds, 3),
+            "interval_ms": ms,
+            "samples": self.samples,
+            "busy_samples": busy,
+            # Shares of the busy (non-idle) samples.
+            "categories": {
+                c: {"samples": n, "share": round(n / busy, 4) if busy and c != "idle" else None}
+                for c, n in sorted(self.categories.items())
+            },
+            "top_self": [
+                {"function": name, "samples": n, "ms": round(n * ms, 1)}
+                for name, n in self.self_time.most_common(TOP_N)
+            ],
+            "top_modules": [
+                {"module": name, "samples": n, "ms": round(n * ms, 1)}
+                for name, n in modules.most_common(TOP_N)
+            ],
+            "top_ours_inclusive": [
+                {"function": name, "samples": n, "ms": round(n * ms, 1)}
+                for name, n in self.inclusive_ours.most_common(TOP_N)
+            ],
+        }
+
+    def write(self, directory: Path, section: str) -> Dict[str, Any]:
+        """Write stacks.folded, summary.json and summary.txt; returns the summary."""
+        directory.mkdir(parents=True, exist_ok=True)
+        with open(directory / "stacks.folded", "w", encoding="utf-8") as f:
+            for stack, count in sorted(self.stacks.items()):
+                f.write(f"{stack} {count}\n")
+        summary = self.summary(section)
+        with open(directory / "summary.json", "w", encoding="utf-8") as f:
+            json.dump(summary, f, indent=2)
+        with open(directory / "summary.txt", "w", encoding="utf-8") as f:
+            f.write(format_summary(summary) + "\n")
+        return summary
+
+
+def format_summary(summary: Dict[str, Any]) -> str:
+    lines = [
+        f"Profile of {summary['section']}: {summary['seconds']:.2f} s, {summary['samples']} samples "
+        f"every {summary['interval_ms']:g} ms ({summary['busy_samples']} busy)",
+        "",
+        "Time by category (share of busy samples; ms below add up over threads):",
+    ]
+    for category, stats in summary["categories"].items():
+        share = f"{stats['share']:>6.1%}" if stats["share"] is not None else "     -"
+        lines.append(f"  {category:<10} {share} {stats['samples']:>8} samples")
+    for title, key, field in (
+        ("Self time by function", "top_self", "function"),
+        ("Self time by module", "top_modules", "module"),
+        ("Inclusive time of our functions", "top_ours_inclusive", "function"),
+    ):
+        lines += ["", f"{title}:"]
+        lines += [f"  {row['ms']:>10.1f} ms  {row[field]}" for row in summary[key]]
+    return "\n".join(lines)
+
+
+def enabled_sections() -> Tuple[str, ...]:
+    """Sections selected by PROFILE ("1" / "all": every section; "0" or unset: none)."""
+    value = os.getenv("PROFILE", "").strip().lower()
+    if value in ("", "0"):
+        return ()
+    if value in ("1", "all"):
+        return SECTIONS
+    return tuple(s.strip() for s in value.split(",") if s.strip())
+
+
+_active_lock = threading.Lock()
+_active_count = 0
+_run_counter = 0
+
+
+@contextmanager
+def profiled(section: str) -> Iterator[Optional[SamplingProfiler]]:
+    """
+    Profile the enclosed code when PROFILE selects ``section``. Sections
+    entered while another profile is running are not profiled again (the
+    running profile already samples every thread). Also usable as a
+    decorator.
+    """
+    global _active_count, _run_counter
+    if section not in enabled_sections():
+        yield None
+        return
+    with _active_lock:
+        if _active_count:
+            nested = True
+        else:
+            nested = False
+            _active_count += 1
+            _run_counter += 1
+            run = _run_counter
+    if nested:
+        yield None
+        return
+
+    profiler = SamplingProfiler(float(os.getenv("PROFILE_INTERVAL_MS", DEFAULT_INTERVAL_MS)))
+    profiler.start()
+    try:
+        yield profiler
+    finally:
+        profiler.stop()
+        with _active_lock:
+            _active_count -= 1
+        directory = Path(os.getenv("PROFILE_DIR") or DEFAULT_PROFILE_DIR) / (
+            f"{section}-{time.strftime('%Y%m%d-%H%M%S')}-{os.getpid()}-{run}"
+        )
+        summary = profiler.write(directory, section)
+        shares = ", ".join(
+            f"{c} {s['share']:.0%}" for c, s in summary["categories"].items() if s["share"] is not None
+        )
+        print(
+            f"Profile ({section}): {summary['seconds']:.2f} s, {shares or 'no samples'} -> {directory}",
+            file=sys.stderr,
+        )
@@ -0,0 +1,278 @@
+"""
+Answer provenance: exact source spans for retrieved nodes and the answer
+sentences they support.
+
+At ingestion time ``ProvenanceIndex.build`` records, for every hierarchical
+node and table row, the document number, the ``[start, end)`` character
+offsets into that document's text and the heading path of the section the
+span starts in. The records live in a compact columnar ``OffsetTable``
+(integer arrays plus interned section paths) rather than in node metadata,
+so nothing extra is embedded or sent to the LLM.
+
+At answer time ``source_span`` turns a retrieved node into a span, and
+``align`` picks the sentences inside those spans that support the answer
+using lexical overlap only (no LLM calls). Offsets always index the loaded
+document text, which for markdown files is the file content itself.
+"""
+
+import bisect
+import re
+from array import array
+from typing import Any, Dict, Iterable, List, Optional
+
+from llama_index.core import Document
+from llama_index.core.schema import BaseNode, MetadataMode
+
+from markdown_tree import MarkdownTree, Section
+
+
+SECTION_SEPARATOR = " > "
+
+# Sentence-ish units: table rows and headings are single lines; prose
+# sentences and list entries may run over single line breaks (hard-wrapped
+# text) but end at a blank line, a markdown hard break ("  " before the
+# newline) or before a table row, heading, list item or bold field label.
+_UNIT_BREAK = r"(?:\s*\n|\s*[|#*-])"
+_UNIT_RE = re.compile(
+    r"[|#][^\n]*?(?:[.!?](?=\s)|(?=\n|\Z))"
+    r"|\S(?:[^\n]|(?<!  )\n(?!" + _UNIT_BREAK + r"))*?"
+    r"(?:[.!?](?=\s)|(?=\n" + _UNIT_BREAK + r"|\n?\Z)|(?<=  )(?=\n))"
+)
+_TOKEN_RE = re.compile(r"[a-z0-9]+(?:[.,][0-9]+)*")
+_STOPWORDS = {
+    "the", "a", "an", "of", "and", "or", "to", "on", "at", "in", "for", "from",
+    "with", "by", "was", "were", "is", "are", "be", "been", "it", "its", "this",
+    "that", "as", "there", "their", "her", "his", "she", "he", "they", "which",
+}
+
+
+def _tokens(text: str) -> set:
+    tokens = set()
+    for tok in _TOKEN_RE.findall(text.lower()):
+        tok = tok.replace(",", "")
+        if tok not in _STOPWORDS and (len(tok) > 1 or tok.isdigit()):
+            tokens.add(tok)
+    return tokens
+
+
+class OffsetTable:
+    """
+    Columnar node_id -> (document, start, end, section) table.
+
+    Offsets and document numbers are stored in ``array`` columns and section
+    paths are interned, so a few thousand nodes cost a few tens of kilobytes.
+    """
+
+    def __init__(self):
+        self._rows: Dict[str, int] = {}
+        self.doc = array("i")
+        self.start = array("l")
+        self.end = array("l")
+        self.section = array("i")
+        self.section_paths: List[str] = []
+        self._section_ids: Dict[str, int] = {}
+
+    def __len__(self) -> int:
+        return len(self._rows)
+
+    def __contains__(self, node_id: str) -> bool:
+        return node_id in self._rows
+
+    def add(self, node_id: str, doc_index: int, start: int, end: int, section_path: str) -> None:
+        section_id = self._section_ids.get(section_path)
+        if section_id is None:
+            section_id = self._section_ids[section_path] = len(self.section_paths)
+            self.section_paths.append(section_path)
+        row = self._rows.get(node_id)
+        if row is None:
+            self._rows[node_id] = len(self.doc)
+            self.doc.append(doc_index)
+            self.start.append(start)
+            self.end.append(end)
+            self.section.append(section_id)
+        else:
+            self.doc[row], self.start[row], self.end[row] = doc_index, start, end
+            self.section[row] = section_id
+
+    def get(self, node_id: str) -> Optional[tuple]:
+        """(doc_index, start, end, section_path) for a node, or None."""
+        row = self._rows.get(node_id)
+        if row is None:
+            return None
+        return (
+            self.doc[row],
+            self.start[row],
+            self.end[row],
+            self.section_paths[self.section[row]],
+        )
+
+
+class ProvenanceIndex:
+    """Offset table plus the document texts and section trees it points into."""
+
+    def __init__(self, documents: List[Document], trees: List[MarkdownTree]):
+        self.files = [doc.metadata.get("file_path", doc.doc_id) for doc in documents]
+        self.trees = trees
+        self.table = OffsetTable()
+        self._doc_ids = {doc.doc_id: i for i, doc in enumerate(documents)}
+        self._doc_files = {f: i for i, f in enumerate(self.files)}
+        # Per document: section start offsets (pre-order, i.e. ascending) and sections.
+        self._section_starts: List[List[int]] = []
+        self._sections: List[List[Section]] = []
+        for tree in trees:
+            sections = [s for s in tree.iter_sections() if s.level > 0]
+            self._sections.append(sections)
+            self._section_starts.append([s.start for s in sections])
+
+    @classmethod
+    def build(
+        cls,
+        documents: List[Document],
+        trees: List[MarkdownTree],
+        nodes: Iterable[BaseNode],
+    ) -> "ProvenanceIndex":
+        """Record offsets, document number and section path for every node."""
+        index = cls(documents, trees)
+        nodes = list(nodes)
+        by_id = {node.node_id: node for node in nodes}
+        resolved: Dict[str, tuple] = {}
+        for node in nodes:
+            doc_index = index._doc_index_for(node)
+            if doc_index is None or node.start_char_idx is None or node.end_char_idx is None:
+                continue
+            start, end = index._absolute_offsets(node, doc_index, by_id, resolved)
+            index.table.add(node.node_id, doc_index, start, end, index.section_path(doc_index, start))
+        return index
+
+    def _absolute_offsets(self, node: BaseNode, doc_index: int, by_id: Dict, resolved: Dict) -> tuple:
+        """
+        Document-level offsets of a node.
+
+        The token-size HierarchicalNodeParser records child offsets relative
+        to the parent chunk, so offsets that do not reproduce the node text
+        are rebased on the parent's start. Table rows keep their offsets:
+        their text is a serialization of the row, not a copy of it.
+        """
+        if node.node_id in resolved:
+            return resolved[node.node_id]
+        text = self.trees[doc_index].text
+        start, end = node.start_char_idx, node.end_char_idx
+        content = node.get_content(metadata_mode=MetadataMode.NONE)
+        if text[start:end] != content:
+            parent_info = node.parent_node
+            parent = by_id.get(parent_info.node_id) if parent_info else None
+            if parent is not None and parent.start_char_idx is not None:
+                parent_start = self._absolute_offsets(parent, doc_index, by_id, resolved)[0]
+                if text[parent_start + start:parent_start + end] == content:
+                    start, end = parent_start + start, parent_start + end
+        resolved[node.node_id] = (start, end)
+        return start, end
+
+    def _doc_index_for(self, node: BaseNode) -> Optional[int]:
+        ref = node.ref_doc_id
+        if ref in self._doc_ids:
+            return self._doc_ids[ref]
+        # Table rows from the legacy extractor only carry their source path.
+        return self._doc_files.get(node.metadata.get("source"))
+
+    def section_path(self, doc_index: int, offset: int) -> str:
+        """Heading path of the deepest section containing ``offset``."""
+        starts = self._section_starts[doc_index]
+        i = bisect.bisect_right(starts, offset) - 1
+        if i < 0:
+            return ""
+        section: Optional[Section] = self._sections[doc_index][i]
+        while section is not None and section.level > 0 and section.end <= offset:
+            section = section.parent
+        if section is None or section.level == 0:
+            return ""
+        return SECTION_SEPARATOR.join(section.path())
+
+    def source_span(self, node: BaseNode) -> Optional[Dict[str, Any]]:
+        """
+        Exact source span of a retrieved node, or None if it cannot be placed.
+
+        Nodes that were not in the offset table at build time (e.g. nodes of
+        the summary index) are placed from their own offsets and source doc.
+        """
+        entry = self.table.get(node.node_id)
+        if entry is None:
+            doc_index = self._doc_index_for(node)
+            if doc_index is None or node.start_char_idx is None or node.end_char_idx is None:
+                return None
+            entry = (
+                doc_index,
+                node.start_char_idx,
+                node.end_char_idx,
+                self.section_path(doc_index, node.start_char_idx),
+            )
+        doc_index, start, end, section = entry
+        return {
+            "file": self.files[doc_index],
+            "doc_index": doc_index,
+            "start": start,
+            "end": end,
+            "section_path": section,
+        }
+
+    def text_of(self, span: Dict[str, Any]) -> str:
+        return self.trees[span["doc_index"]].text[span["start"]:span["end"]]
+
+    def align(
+        self,
+        answer: str,
+        spans: Iterable[Dict[str, Any]],
+        max_highlights: int = 3,
+        min_score: float = 0.2,
+    ) -> List[Dict[str, Any]]:
+        """
+        Sentences inside ``spans`` that best support ``answer``.
+
+        Each sentence (or table/log line) is scored by the share of the
+        answer's content words it contains, with numbers and dates counted
+        double since they are what factual answers hinge on. Sentences
+        scoring at least ``min_score`` and within 60% of the best are kept.
+        """
+        answer_tokens = _tokens(answer)
+        if not answer_tokens:
+            return []
+        weights = {t: 2.0 if t[0].isdigit() else 1.0 for t in answer_tokens}
+        total = sum(weights.values())
+
+        candidates = []
+        seen = set()
+        for span in spans:
+            text = self.trees[span["doc_index"]].text
+            for m in _UNIT_RE.finditer(text, span["start"], span["end"]):
+                start, end = m.start(), m.end()
+                while start < end and text[start] in " \t|->#":
+                    start += 1
+                # Overlapping spans (a leaf and its merged parent) yield the
+                # same unit; units always end on the same boundary.
+                key = (span["doc_index"], end)
+                if start >= end or key in seen:
+                    continue
+                seen.add(key)
+                sentence = text[start:end]
+                overlap = _tokens(sentence) & answer_tokens
+                score = sum(weights[t] for t in overlap) / total
+                if score >= min_score:
+                    candidates.append((score, span, start, end, sentence))
+
+        if not candidates:
+            return []
+        candidates.sort(key=lambda c: (-c[0], c[1]["doc_index"], c[2]))
+        best = candidates[0][0]
+        return [
+            {
+                "file": span["file"],
+                "doc_index": span["doc_index"],
+                "start": start,
+                "end": end,
+                "section_path": self.section_path(span["doc_index"], start),
+                "text": " ".join(sentence.split()),
+                "score": round(score, 3),
+            }
+            for score, span, start, end, sentence in candidates[:max_highlights]
+            if score >= 0.6 * best
+        ]
@@ -0,0 +1,243 @@
+"""
+Retrieval result cache shared by the agents (and, optionally, by processes).
+
+``CachedRetriever`` wraps the vector retriever under the auto-merging
+retriever. Results are keyed by (index version, normalized question,
+retriever config) and stored as ranked ``(node_id, score)`` lists, so a hit
+skips both the query-embedding API call and the similarity scan; the nodes
+themselves are re-read from the docstore.
+
+Two tiers:
+
+- an in-process LRU (``RETRIEVAL_CACHE_SIZE`` entries, default 1024);
+- an optional SQLite file (``RETRIEVAL_CACHE_PATH``) that several worker
+  processes can read and fill concurrently.
+
+The index version is a hash of the embedded leaves and the embedding model,
+so rebuilding the index with different content or chunking starts a fresh
+keyspace. Building an index never deletes shared entries, since other
+workers or sweep variants may still be using their versions. Old entries
+are evicted by age (``RETRIEVAL_CACHE_MAX_AGE_DAYS``, checked when the cache
+is opened) or explicitly with ``RetrievalCache.prune``:
+
+    python src/retrieval_cache.py --path .llm_cache/retrieval.sqlite --max-age-days 30 --max-entries 100000
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from llama_index.core.base.base_retriever import BaseRetriever
+from llama_index.core.schema import BaseNode, NodeWithScore, QueryBundle
+
+
+DEFAULT_CACHE_SIZE = 1024
+
+_PUNCT_RE = re.compile(r"[^\w\s]")
+_SPACE_RE = re.compile(r"\s+")
+
+
+def normalize_question(question: str) -> str:
+    """Case, whitespace and punctuation-insensitive form of a question."""
+    text = unicodedata.normalize("NFKC", question).lower()
+    text = _PUNCT_RE.sub(" ", text)
+    return _SPACE_RE.sub(" ", text).strip()
+
+
+def compute_index_version(leaf_nodes: Iterable[BaseNode], embed_model: str) -> str:
+    """Hash of what the vector index was built from: leaf ids, texts and the embedding model."""
+    digest = hashlib.sha256(embed_model.encode("utf-8"))
+    for node in sorted(leaf_nodes, key=lambda n: n.node_id):
+        digest.update(node.node_id.encode("utf-8"))
+        digest.update(hashlib.sha1(node.get_content().encode("utf-8")).digest())
+    return digest.hexdigest()[:16]
+
+
+class RetrievalCache:
+    """Two-tier (LRU + optional SQLite) store of ranked (node_id, score) lists."""
+
+    def __init__(self, index_version: str, capacity: int = DEFAULT_CACHE_SIZE, path: Optional[Path] = None):
+        self.index_version = index_version
+        self.capacity = capacity
+        self.path = Path(path) if path else None
+        self._lru: "OrderedDict[str, List[Tuple[str, float]]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._conn: Optional[sqlite3.Connection] = None
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        if self.path is not None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            self._conn = sqlite3.connect(str(self.path), check_same_thread=False, timeout=30)
+            # WAL lets several worker processes read while one writes.
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS retrievals ("
+                " key TEXT PRIMARY KEY, index_version TEXT NOT NULL, results TEXT NOT NULL,"
+                " created_at REAL NOT NULL DEFAULT 0)"
+            )
+            columns = {row[1] for row in self._conn.execute("PRAGMA table_info(retrievals)")}
+            if "created_at" not in columns:
+                # Files written before entries were timestamped.
+                self._conn.execute("ALTER TABLE retrievals ADD COLUMN created_at REAL NOT NULL DEFAULT 0")
+            self._conn.commit()
+
+    def make_key(self, question: str, config: Dict[str, Any]) -> str:
+        payload = json.dumps(
+            {"v": self.index_version, "q": normalize_question(question), "config": config},
+            sort_keys=True,
+        )
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def get(self, key: str) -> Optional[List[Tuple[str, float]]]:
+        with self._lock:
+            results = self._lru.get(key)
+            if results is not None:
+                self._lru.move_to_end(key)
+                self.memory_hits += 1
+                return results
+            if self._conn is not None:
+                row = self._conn.execute(
+                    "SELECT results FROM retrievals WHERE key = ?", (key,)
+                ).fetchone()
+                if row is not None:
+                    results = [tuple(r) for r in json.loads(row[0])]
+                    self._put_locked(key, results)
+                    self.disk_hits += 1
+                    return results
+            self.misses += 1
+            return None
+
+    def put(self, key: str, results: List[Tuple[str, float]]) -> None:
+        with self._lock:
+            self._put_locked(key, results)
+            if self._conn is not None:
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO retrievals (key, index_version, results, created_at)"
+                    " VALUES (?, ?, ?, ?)",
+                    (key, self.index_version, json.dumps(results), time.time()),
+                )
+                self._conn.commit()
+
+    def _put_locked(self, key: str, results: List[Tuple[str, float]]) -> None:
+        self._lru[key] = results
+        self._lru.move_to_end(key)
+        while len(self._lru) > self.capacity:
+            self._lru.popitem(last=False)
+
+    def prune(self, max_age_days: Optional[float] = None, max_entries: Optional[int] = None) -> int:
+        """
+        Evict shared entries (of any index version) older than ``max_age_days``,
+        then all but the newest ``max_entries``. Returns the number deleted.
+        """
+        if self._conn is None:
+            return 0
+        deleted = 0
+        with self._lock:
+            if max_age_days is not None:
+                cutoff = time.time() - max_age_days * 86400
+                deleted += self._conn.execute(
+                    "DELETE FROM retrievals WHERE created_at < ?", (cutoff,)
+                ).rowcount
+            if max_entries is not None:
+                deleted += self._conn.execute(
+                    "DELETE FROM retrievals WHERE key NOT IN"
+                    " (SELECT key FROM retrievals ORDER BY created_at DESC LIMIT ?)",
+                    (max_entries,),
+                ).rowcount
+            self._conn.commit()
+        return deleted
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            hits = self.memory_hits + self.disk_hits
+            total = hits + self.misses
+            return {
+                "index_version": self.index_version,
+                "entries": len(self._lru),
+                "memory_hits": self.memory_hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "hit_rate": hits / total if total else 0.0,
+            }
+
+
+def get_retrieval_cache(index_version: str) -> Optional[RetrievalCache]:
+    """
+    Cache configured via RETRIEVAL_CACHE / RETRIEVAL_CACHE_SIZE /
+    RETRIEVAL_CACHE_PATH / RETRIEVAL_CACHE_MAX_AGE_DAYS, or None when
+    RETRIEVAL_CACHE=0.
+    """
+    if os.getenv("RETRIEVAL_CACHE", "1") == "0":
+        return None
+    path = os.getenv("RETRIEVAL_CACHE_PATH") or None
+    cache = RetrievalCache(
+        index_version,
+        capacity=int(os.getenv("RETRIEVAL_CACHE_SIZE", DEFAULT_CACHE_SIZE)),
+        path=Path(path) if path else None,
+    )
+    max_age_days = os.getenv("RETRIEVAL_CACHE_MAX_AGE_DAYS")
+    if max_age_days:
+        cache.prune(max_age_days=float(max_age_days))
+    return cache
+
+
+class CachedRetriever(BaseRetriever):
+    """
+    Retriever wrapper serving ranked node ids from a RetrievalCache.
+
+    On a hit the nodes are loaded from the docstore, so neither the query
+    embedding nor the similarity search runs.
+    """
+
+    def __init__(self, retriever: BaseRetriever, cache: RetrievalCache, docstore: Any):
+        super().__init__(callback_manager=getattr(retriever, "callback_manager", None))
+        self._retriever = retriever
+        self._cache = cache
+        self._docstore = docstore
+        self._config = {
+            "retriever": type(retriever).__name__,
+            "top_k": getattr(retriever, "similarity_top_k", None),
+        }
+
+    @property
+    def cache(self) -> RetrievalCache:
+        return self._cache
+
+    @property
+    def similarity_top_k(self) -> Optional[int]:
+        return self._config["top_k"]
+
+    def _retrieve(self, query_bundle: QueryBundle) -> List[NodeWithScore]:
+        key = self._cache.make_key(query_bundle.query_str, self._config)
+        cached = self._cache.get(key)
+        if cached is not None:
+            return [
+                NodeWithScore(node=self._docstore.get_document(node_id), score=score)
+                for node_id, score in cached
+            ]
+
+        results = self._retriever.retrieve(query_bundle)
+        self._cache.put(key, [(n.node.node_id, n.score) for n in results])
+        return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Evict old entries from a shared retrieval cache file.")
+    default_path = os.getenv("RETRIEVAL_CACHE_PATH")
+    parser.add_argument("--path", type=Path, default=default_path, required=not default_path,
+                        help="Shared cache file (default: RETRIEVAL_CACHE_PATH)")
+    parser.add_argument("--max-age-days", type=float, help="Delete entries older than this")
+    parser.add_argument("--max-entries", type=int, help="Keep at most this many (newest) entries")
+    args = parser.parse_args()
+    deleted = RetrievalCache("", path=args.path).prune(args.max_age_days, args.max_entries)
+    print(f"Deleted {deleted} entries from {args.path}")
@@ -0,0 +1,145 @@
+"""
+Startup timing and background loading for the CLI entry points.
+
+``main.py`` and ``eval/judge.py`` used to import LlamaIndex, the OpenAI
+integrations and the MCP client, then build every index before doing
+anything else. Those imports now happen on first use, and the entry points
+hand index loading to a ``BackgroundLoader`` so the prompt (or the judge's
+own setup) runs while the indexes load.
+
+``StartupTimer`` records where the time goes. Phases are either ``import``
+(time spent importing a module for the first time) or ``startup`` (building
+clients and indexes); ``report()`` prints both breakdowns, with the
+thread each phase ran on. ``python -X importtime`` gives per-module detail when a phase
+looks slow.
+"""
+
+import importlib
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, List, Optional
+
+
+class StartupTimer:
+    """Wall-clock phases since the timer was created (i.e. since startup)."""
+
+    def __init__(self):
+        self.t0 = time.perf_counter()
+        self._phases: List[Dict[str, Any]] = []
+        self._marks: List[Dict[str, Any]] = []
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def phase(self, name: str, kind: str = "startup") -> Iterator[None]:
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self._record(name, kind, start, time.perf_counter())
+
+    def _record(self, name: str, kind: str, start: float, end: float) -> None:
+        with self._lock:
+            self._phases.append({
+                "name": name,
+                "kind": kind,
+                "thread": threading.current_thread().name,
+                "start": start - self.t0,
+                "seconds": end - start,
+            })
+
+    def stopwatch(self, kind: str = "startup") -> Callable[[str], None]:
+        """
+        Consecutive phases without nesting: each call to the returned
+        function records a phase from the previous call (or creation) to now.
+        """
+        last = [time.perf_counter()]
+
+        def lap(name: str) -> None:
+            now = time.perf_counter()
+            self._record(name, kind, last[0], now)
+            last[0] = now
+
+        return lap
+
+    def timed_import(self, module: str) -> Any:
+        """Import ``module``, recording an import phase if it was not loaded yet."""
+        if module in sys.modules:
+            return sys.modules[module]
+        with self.phase(module, kind="import"):
+            return importlib.import_module(module)
+
+    def mark(self, name: str) -> float:
+        """Record a point in time (e.g. "prompt shown"); returns seconds since startup."""
+        elapsed = time.perf_counter() - self.t0
+        with self._lock:
+            self._marks.append({"name": name, "at": elapsed})
+        return elapsed
+
+    def phases(self) -> List[Dict[str, Any]]:
+        with self._lock:
+            return list(self._phases)
+
+    def report(self) -> str:
+        with self._lock:
+            phases = sorted(self._phases, key=lambda p: p["start"])
+            marks = list(self._marks)
+        lines = ["Startup breakdown (seconds since start):"]
+        for kind, title in (("import", "Imports"), ("startup", "Startup")):
+            selected = [p for p in phases if p["kind"] == kind]
+            if not selected:
+                continue
+            lines.append(f"  {title} ({sum(p['seconds'] for p in selected):.2f}s):")
+            for p in selected:
+                lines.append(
+                    f"    {p['name']:<36} {p['seconds']:6.2f}s  "
+                    f"(at {p['start']:5.2f}s, {p['thread']})"
+                )
+        for m in marks:
+            lines.append(f"  {m['name']:<38} at {m['at']:5.2f}s")
+        return "\n".join(lines)
+
+
+_timer = StartupTimer()
+
+
+def get_startup_timer() -> StartupTimer:
+    """Process-wide timer, started when this module is first imported."""
+    return _timer
+
+
+class BackgroundLoader:
+    """
+    Run ``load()`` in a daemon thread; ``result()`` waits for it.
+
+    An exception raised by ``load`` is re-raised by ``result()`` in the
+    caller's thread, so a failed load surfaces where its result is needed.
+    """
+
+    def __init__(self, load: Callable[[], Any], name: str = "index-loader"):
+        self._load = load
+        self._done = threading.Event()
+        self._value: Any = None
+        self._error: Optional[BaseException] = None
+        self._thread = threading.Thread(target=self._run, name=name, daemon=True)
+        self._thread.start()
+
+    def _run(self) -> None:
+        try:
+            self._value = self._load()
+        except BaseException as exc:  # re-raised by result()
+            self._error = exc
+        finally:
+            self._done.set()
+
+    @property
+    def ready(self) -> bool:
+        return self._done.is_set()
+
+    def result(self, timeout: Optional[float] = None) -> Any:
+        if not self._done.wait(timeout):
+            raise TimeoutError("Background load did not finish in time")
+        if self._error is not None:
+            raise self._error
+        return self._value
@@ -0,0 +1,292 @@
+"""
+Structure-aware chunking driven by the markdown section tree.
+
+Instead of splitting the claim by token counts, the node hierarchy mirrors
+the document structure:
+
+    claim (#) -> document (##) -> section (###) -> paragraph group / table row
+
+Leaves never straddle a heading. Consecutive paragraphs inside a section are
+packed into one leaf until ``leaf_max_tokens`` is reached, and only a single
+paragraph larger than that cap is split (at sentence boundaries). Table rows
+are always their own atomic leaves, serialized like
+``indexing.serialize_table_row``.
+
+Parents are capped at ``parent_max_tokens``: a section larger than that is
+not emitted as one node (auto-merging would otherwise pull in a whole
+multi-thousand-token document). Its children are packed instead into
+consecutive sibling groups of at most the cap, each a parent node of its own,
+so merging stops at the largest bounded level.
+
+Node ids are derived from the source file and character offsets, so the same
+input always yields the same ids across runs and processes.
+"""
+
+import re
+import uuid
+from typing import Callable, List, Optional
+
+from llama_index.core import Document
+from llama_index.core.schema import NodeRelationship, RelatedNodeInfo, TextNode
+from llama_index.core.utils import get_tokenizer
+
+from markdown_tree import Block, MarkdownTree, Section, Table
+
+
+DEFAULT_LEAF_MAX_TOKENS = 256
+DEFAULT_PARENT_MAX_TOKENS = 1024
+
+_SENTENCE_END_RE = re.compile(r"(?<=[.!?])\s+")
+_NODE_ID_NAMESPACE = uuid.UUID("8a4f7f0e-5d0c-4a56-9d55-6b1c2f0f3e21")
+
+_LEVEL_TYPES = {1: "claim", 2: "document"}
+
+
+def _node_type_for(section: Section) -> str:
+    return _LEVEL_TYPES.get(section.level, "section")
+
+
+def make_node_id(source: str, kind: str, start: int, end: int) -> str:
+    """Deterministic node id for a span of a source file."""
+    return str(uuid.uuid5(_NODE_ID_NAMESPACE, f"{source}|{kind}|{start}|{end}"))
+
+
+def _trim(text: str, start: int, end: int):
+    """Shrink [start, end) so it excludes surrounding whitespace."""
+    while start < end and text[start].isspace():
+        start += 1
+    while end > start and text[end - 1].isspace():
+        end -= 1
+    return start, end
+
+
+class _Builder:
+    def __init__(
+        self,
+        doc: Document,
+        tree: MarkdownTree,
+        leaf_max_tokens: int,
+        tokenizer: Callable[[str], List],
+        serialize_row: Callable,
+        parent_max_tokens: int = DEFAULT_PARENT_MAX_TOKENS,
+    ):
+        self.doc = doc
+        self.tree = tree
+        self.text = tree.text
+        self.source = doc.metadata.get("file_path", doc.doc_id)
+        self.leaf_max_tokens = leaf_max_tokens
+        self.parent_max_tokens = max(parent_max_tokens, leaf_max_tokens)
+        self.tokenizer = tokenizer
+        self.serialize_row = serialize_row
+        self.nodes: List[TextNode] = []
+        # Keep file-level metadata (file_name, ...) but hide structural keys
+        # from embeddings and the LLM prompt, like the reader does for dates.
+        self.base_metadata = dict(doc.metadata)
+        self.excluded_embed = list(doc.excluded_embed_metadata_keys) + ["node_type"]
+        self.excluded_llm = list(doc.excluded_llm_metadata_keys) + ["node_type"]
+
+    def _count(self, start: int, end: int) -> int:
+        return len(self.tokenizer(self.text[start:end]))
+
+    def _make_node(self, kind: str, node_type: str, start: int, end: int) -> TextNode:
+        node = TextNode(
+            id_=make_node_id(self.source, kind, start, end),
+            text=self.text[start:end],
+            start_char_idx=start,
+            end_char_idx=end,
+            metadata={**self.base_metadata, "node_type": node_type},
+            excluded_embed_metadata_keys=self.excluded_embed,
+            excluded_llm_metadata_keys=self.excluded_llm,
+        )
+        node.relationships[NodeRelationship.SOURCE] = self.doc.as_related_node_info()
+        self.nodes.append(node)
+        return node
+
+    @staticmethod
+    def _link(parent: TextNode, children: List[TextNode]) -> None:
+        if not children:
+            return
+        parent.relationships[NodeRelationship.CHILD] = [
+            RelatedNodeInfo(node_id=c.node_id) for c in children
+        ]
+        parent_info = RelatedNodeInfo(node_id=parent.node_id)
+        for child in children:
+            child.relationships[NodeRelationship.PARENT] = parent_info
+
+    def _hard_split(self, start: int, end: int) -> List[tuple]:
+        """Cut a span without sentence breaks into roughly cap-sized windows."""
+        tokens = self._count(start, end)
+        if tokens <= self.leaf_max_tokens:
+            return [(start, end)]
+        window = max(1, (end - start) * self.leaf_max_tokens // tokens)
+        spans = []
+        pos = start
+        while pos < end:
+            cut = min(end, pos + window)
+            if cut < end:
+                space = self.text.rfind(" ", pos + 1, cut)
+                if space > pos:
+                    cut = space
+            spans.append((pos, cut))
+            pos = cut
+        return spans
+
+    def _split_oversized(self, start: int, end: int) -> List[TextNode]:
+        """Split one paragraph that exceeds the leaf cap at sentence boundaries."""
+        spans = []
+        pos = start
+        for m in _SENTENCE_END_RE.finditer(self.text, start, end):
+            spans.extend(self._hard_split(pos, m.start()))
+            pos = m.end()
+        spans.extend(self._hard_split(pos, end))
+
+        leaves = []
+        group_start, group_end = -1, -1
+        for s, e in spans:
+            # Count the joined span: the separators between sentences are
+            # tokens too.
+            if group_start >= 0 and self._count(group_start, e) > self.leaf_max_tokens:
+                leaves.append(self._make_node("leaf", "paragraph", group_start, group_end))
+                group_start = -1
+            if group_start < 0:
+                group_start = s
+            group_end = e
+        if group_start >= 0:
+            leaves.append(self._make_node("leaf", "paragraph", group_start, group_end))
+        return leaves
+
+    def _leaves_for_blocks(self, blocks: List) -> List[TextNode]:
+        leaves: List[TextNode] = []
+        group_start, group_end = -1, -1
+
+        def flush():
+            nonlocal group_start
+            if group_start >= 0:
+                leaves.append(self._make_node("leaf", "paragraph", group_start, group_end))
+                group_start = -1
+
+        for block in blocks:
+            if isinstance(block, Table):
+                flush()
+                leaves.extend(self._table_rows(block))
+                continue
+            if not isinstance(block, Block) or block.kind != "paragraph":
+                # Horizontal rules are hard boundaries between leaves.
+                flush()
+                continue
+
+            start, end = _trim(self.text, block.start, block.end)
+            if start >= end:
+                continue
+            if self._count(start, end) > self.leaf_max_tokens:
+                flush()
+                leaves.extend(self._split_oversized(start, end))
+                continue
+            # The leaf is the joined span, blank lines included.
+            if group_start >= 0 and self._count(group_start, end) > self.leaf_max_tokens:
+                flush()
+            if group_start < 0:
+                group_start = start
+            group_end = end
+
+        flush()
+        return leaves
+
+    def _table_rows(self, table: Table) -> List[TextNode]:
+        rows = []
+        for row_idx, (row, row_dict) in enumerate(zip(table.rows, table.row_dicts())):
+            node = TextNode(
+                id_=make_node_id(self.source, "table_row", row.start, row.end),
+                text=self.serialize_row(row_dict, table.headers, table.name),
+                start_char_idx=row.start,
+                end_char_idx=row.end,
+                metadata={
+                    "node_type": "table_row",
+                    "table": table.name,
+                    "row_index": row_idx,
+                    "source": self.doc.metadata.get("file_path", "unknown"),
+                },
+            )
+            node.relationships[NodeRelationship.SOURCE] = self.doc.as_related_node_info()
+            self.nodes.append(node)
+            rows.append(node)
+        return rows
+
+    def _group_children(self, children: List[TextNode], node_type: str) -> List[TextNode]:
+        """Pack consecutive children into parents of at most ``parent_max_tokens``."""
+        groups: List[List[TextNode]] = []
+        for child in children:
+            # The parent spans from its first child to its last, headings
+            # and blank lines between them included.
+            if groups and self._count(groups[-1][0].start_char_idx, child.end_char_idx) <= self.parent_max_tokens:
+                groups[-1].append(child)
+            else:
+                groups.append([child])
+
+        top: List[TextNode] = []
+        for group in groups:
+            if len(group) == 1:
+                # Nothing to merge into: the child stays a top node.
+                top.extend(group)
+                continue
+            node = self._make_node(
+                "group", node_type, group[0].start_char_idx, group[-1].end_char_idx
+            )
+            self._link(node, group)
+            top.append(node)
+        return top
+
+    def build_section(self, section: Section, node_type: str) -> List[TextNode]:
+        """The top nodes of a section: one section node, or capped groups of its children."""
+        start, end = _trim(self.text, section.start, section.end)
+        if start >= end:
+            return []
+
+        children = self._leaves_for_blocks(section.blocks)
+        for child in section.children:
+            children.extend(self.build_section(child, _node_type_for(child)))
+        if self._count(start, end) > self.parent_max_tokens:
+            return self._group_children(children, node_type)
+        node = self._make_node("section", node_type, start, end)
+        self._link(node, children)
+        return [node]
+
+    def build(self) -> List[TextNode]:
+        root = self.tree.root
+        has_preamble = any(self.tree.slice(b).strip() for b in root.blocks)
+        if has_preamble or not root.children:
+            # Text before the first heading (or a document without headings,
+            # e.g. a PDF extraction): the whole document is the top node.
+            self.build_section(root, "claim")
+        else:
+            for child in root.children:
+                self.build_section(child, _node_type_for(child))
+        return self.nodes
+
+
+def get_structure_nodes(
+    documents: List[Document],
+    trees: List[MarkdownTree],
+    serialize_row: Callable,
+    leaf_max_tokens: int = DEFAULT_LEAF_MAX_TOKENS,
+    parent_max_tokens: int = DEFAULT_PARENT_MAX_TOKENS,
+) -> List[TextNode]:
+    """
+    Build a heading-aligned node hierarchy for each document.
+
+    Args:
+        documents: Loaded documents (one per file).
+        trees: Parsed section trees, aligned with ``documents``.
+        serialize_row: Function turning a table row dict into a row sentence.
+        leaf_max_tokens: Fallback size cap for paragraph leaves.
+        parent_max_tokens: Size cap for parent (merge target) nodes.
+
+    Returns:
+        All nodes (parents and leaves) with PARENT/CHILD relationships set,
+        ready for the docstore and ``get_leaf_nodes``.
+    """
+    tokenizer = get_tokenizer()
+    nodes: List[TextNode] = []
+    for doc, tree in zip(documents, trees):
+        nodes.extend(_Builder(doc, tree, leaf_max_tokens, tokenizer, serialize_row, parent_max_tokens).build())
+    return nodes
@@ -0,0 +1,559 @@
+"""
+Claim timeline: the claim's dated events, normalized and indexed by time.
+
+The claim is full of dated events: Event Ledger rows, incident-log
+timestamps, physiotherapy session headings and settlement emails. Before
+this module, temporal questions went through vector retrieval and an LLM.
+``ClaimTimeline.build`` extracts them once at ingestion, using the date
+tools' extraction and time-only log entries ("- **19:39:12** – ...") under
+the latest date. Each event is a ``TimelineEvent`` with its timestamp,
+event type, source file, offsets and section path.
+
+The events are kept sorted, with three indexes over them:
+
+- the sorted timestamps, so the events in a time range are found with
+  ``bisect`` (O(log n + k));
+- positions by event type ("physiotherapy", "settlement", ...);
+- positions by label word stem, for resolving "the accident" or "the first
+  physiotherapy session" without scanning every event.
+
+``answer`` handles these question shapes without an LLM call:
+"what happened between X and Y" (or "in February 2024"), "what was the
+first / last ..." and ordering questions ("which came first, X or Y", "did
+X happen before Y"). X and Y are dates or event descriptions. ``context_text`` renders events as
+compact, chronological context for the summarization agent.
+
+``ClaimTimelines`` keeps one timeline per claim and answers each question
+from the claim it names (or the only claim loaded); when the claim is
+ambiguous the question goes to retrieval.
+
+``TIMELINE_INDEX=0`` skips the timeline; those questions then go through
+retrieval as before.
+"""
+
+from __future__ import annotations
+
+import math
+import re
+from bisect import bisect_left, bisect_right
+from datetime import datetime, time, timedelta
+from typing import TYPE_CHECKING, Any, Dict, Iterable, List, NamedTuple, Optional, Sequence, Tuple
+
+from claims import ClaimTexts, claim_id, strip_claim_prefix
+from markdown_tree import MarkdownTree, parse_markdown
+
+if TYPE_CHECKING:
+    from llama_index.core import Document
+
+
+# Share of an event description's words an event label must contain.
+DEFAULT_MIN_COVERAGE = 0.5
+# Events listed in a "what happened between" answer before "... and N more".
+DEFAULT_MAX_LISTED = 15
+# Events in the chronology context given to the summarizer.
+DEFAULT_MAX_CONTEXT_EVENTS = 200
+
+# Kinds of extracted events kept in the timeline. Free-text date mentions
+# ("Date created: ...") are mostly form fields, not events.
+TIMELINE_KINDS = ("ledger", "log", "heading")
+
+# Event type by keyword in the label or section path, first match wins.
+EVENT_TYPES: Sequence[Tuple[str, Sequence[str]]] = (
+    ("settlement", ("settle", "agreement", "counsel", "excerpt", "offer")),
+    ("physiotherapy", ("physio", "session", "assessment")),
+    ("work", ("work",)),
+    ("adjuster", ("adjuster", "inspection", "site visit", "repair", "deductible")),
+    ("medical", ("emergency", "hospital", "diagnos", "discharge", "x-ray", "triage")),
+    ("report", ("fnol", "loss report", "call", "hotline", "intake")),
+    ("accident", ("collision", "accident", "crash", "impact", "vehicle", "camera", "brak", "rain")),
+)
+
+# "- **19:39:12** – text": a log entry with only a time; the date is the
+# latest one above it.
+_TIME_ENTRY_RE = re.compile(r"^\s*-\s*\*\*(\d{2}:\d{2}(?::\d{2})?)\*\*\s*[–—-]\s*(.+)$", re.MULTILINE)
+# An indented line continuing a hard-wrapped entry (blank lines may separate
+# them); a new bullet, table row or heading ends the entry.
+_CONTINUATION_RE = re.compile(r"\n(?:[ \t]*\n)*[ \t]+(?![-*|#>])(\S[^\n]*)")
+_ISO_DATE_RE = re.compile(r"\b\d{4}-\d{2}-\d{2}\b")
+_LEADING_SPACE_RE = re.compile(r"\s*")
+_MONTHS = {m: i for i, m in enumerate(
+    ("jan", "feb", "mar", "apr", "may", "jun", "jul", "aug", "sep", "oct", "nov", "dec"), 1
+)}
+_MONTH = r"(?:jan|feb|mar|apr|may|jun|jul|aug|sep|oct|nov|dec)[a-z]*\.?"
+_DAY_MONTH_YEAR_RE = re.compile(
+    rf"^(?:on\s+)?(?:(?P<m1>{_MONTH})\s+(?P<d1>\d{{1,2}})(?:st|nd|rd|th)?,?|(?P<d2>\d{{1,2}})(?:st|nd|rd|th)?\s+(?P<m2>{_MONTH}))\s+(?P<y>\d{{4}})$",
+    re.IGNORECASE,
+)
+_MONTH_YEAR_RE = re.compile(rf"^(?:in\s+)?(?P<m>{_MONTH})\s+(?P<y>\d{{4}})$", re.IGNORECASE)
+
+_BETWEEN_Q_RE = re.compile(
+    r"^(?:what|which)\b.*?\b(?:happened|happen|occurred|took place|events?)\b.*?"
+    r"\b(?:between|from)\s+(?P<start>.+?)\s+(?:and|to|until|till)\s+(?P<end>.+?)[?.!]*$",
+    re.IGNORECASE,
+)
+_DURING_Q_RE = re.compile(
+    r"^(?:what|which)\b.*?\b(?:happened|happen|occurred|took place|events?)\b.*?"
+    r"\b(?:in|on|during)\s+(?P<when>.+?)[?.!]*$",
+    re.IGNORECASE,
+)
+_EXTREME_Q_RE = re.compile(
+    r"^(?:what|which|when)\s+(?:was|were|is|did|happened)?\s*(?:the\s+)?"
+    r"(?P<which>first|earliest|last|latest|final|most recent)\s+(?P<what>.+?)[?.!]*$",
+    re.IGNORECASE,
+)
+_WHICH_FIRST_Q_RE = re.compile(
+    r"^(?:which|what)\s+(?:came|happened|was|occurred)\s+(?:first|earlier)\b[,:]?\s*"
+    r"(?P<a>.+?)\s+or\s+(?P<b>.+?)[?.!]*$",
+    re.IGNORECASE,
+)
+_BEFORE_AFTER_Q_RE = re.compile(
+    r"^(?:did|was|were|does)\s+(?P<a>.+?)\s+(?:happen\s+|come\s+|take place\s+|occur\s+)?"
+    r"(?P<rel>before|after)\s+(?P<b>.+?)[?.!]*$",
+    re.IGNORECASE,
+)
+_RANGE_RE = re.compile(
+    r"\b(?:between|from)\s+(?P<start>.+?)\s+(?:and|to|until|till)\s+(?P<end>.+?)[?.!]*$", re.IGNORECASE
+)
+_DURING_RE = re.compile(r"\b(?:in|on|during)\s+(?P<when>.+?)[?.!]*$", re.IGNORECASE)
+# "the final settlement amount" asks for a value, not an event.
+_VALUE_WORDS_RE = re.compile(r"\b(?:amount|sum|cost|price|name|number|diagnos\w*|reason|outcome)\b", re.IGNORECASE)
+# "first event", "last thing that happened": no event description at all.
+_ANY_EVENT_RE = re.compile(
+    r"^(?:events?|things?|entry|entries)(?:\s+(?:that\s+)?(?:happened|occurred|took place|was logged))?$",
+    re.IGNORECASE,
+)
+# "first thing she did after the accident": relative to another event, which
+# the index does not resolve; left to retrieval.
+_RELATIVE_RE = re.compile(r"\b(?:after|before|since|following|prior to|until)\b", re.IGNORECASE)
+_LEADING_ARTICLE_RE = re.compile(r"^(?:the|a|an|her|his|their)\s+", re.IGNORECASE)
+
+
+class TimelineEvent(NamedTuple):
+    """One dated event of the claim, with its place in the source file."""
+
+    timestamp: datetime
+    date: str  # as written, e.g. "2024-01-03 19:40"
+    label: str
+    event_type: str
+    kind: str  # "ledger", "log" or "heading"
+    file: str
+    start: int
+    end: int
+    section_path: Tuple[str, ...]
+
+    @property
+    def document(self) -> str:
+        """The claim document the event comes from (second-level heading)."""
+        return self.section_path[1] if len(self.section_path) > 1 else (self.section_path or ("",))[0]
+
+    def describe(self) -> str:
+        document = f" ({self.document})" if self.document else ""
+        return f"{self.date} – {self.label}{document}"
+
+
+def classify_event(label: str, section_path: Sequence[str] = ()) -> str:
+    """Event type from keywords in the label, else in the section path; "other" if none."""
+    for text in (label, " ".join(reversed(section_path))):
+        lowered = text.lower()
+        for event_type, keywords in EVENT_TYPES:
+            if any(k in lowered for k in keywords):
+                return event_type
+    return "other"
+
+
+def _parse_timestamp(raw: str) -> datetime:
+    return datetime.fromisoformat(raw.strip().replace("T", " "))
+
+
+def _day_range(day: datetime) -> Tuple[datetime, datetime]:
+    start = datetime.combine(day.date(), time.min)
+    return start, start + timedelta(days=1) - timedelta(microseconds=1)
+
+
+def parse_date_phrase(text: str) -> Optional[Tuple[datetime, datetime]]:
+    """
+    (first, last instant) of a date written as 2024-02-01, "February 1,
+    2024", "1 February 2024" or "February 2024"; None for anything else.
+    """
+    phrase = _LEADING_ARTICLE_RE.sub("", text.strip().rstrip("?.!,"))
+    phrase = re.sub(r"^(?:on|in)\s+", "", phrase, flags=re.IGNORECASE)
+    if re.fullmatch(r"\d{4}-\d{2}-\d{2}(?:[ T]\d{2}:\d{2}(?::\d{2})?)?", phrase):
+        moment = _parse_timestamp(phrase)
+        return (moment, moment) if len(phrase) > 10 else _day_range(moment)
+    m = _DAY_MONTH_YEAR_RE.match(phrase)
+    if m:
+        month = _MONTHS[(m.group("m1") or m.group("m2"))[:3].lower()]
+        day = int(m.group("d1") or m.group("d2"))
+        return _day_range(datetime(int(m.group("y")), month, day))
+    m = _MONTH_YEAR_RE.match(phrase)
+    if m:
+        year, month = int(m.group("y")), _MONTHS[m.group("m")[:3].lower()]
+        end = datetime(year + month // 12, month % 12 + 1, 1)
+        return datetime(year, month, 1), end - timedelta(microseconds=1)
+    return None
+
+
+def _section_paths(tree: MarkdownTree) -> Tuple[List[int], List[Tuple[str, ...]]]:
+    sections = [s for s in tree.iter_sections() if s.level > 0]
+    return [s.start for s in sections], [tuple(s.path()) for s in sections]
+
+
+def _join_continuations(text: str, label: str, end: int) -> Tuple[str, int]:
+    """Label and end offset of a log entry with its hard-wrapped continuation lines."""
+    while True:
+        m = _CONTINUATION_RE.match(text, end)
+        if m is None:
+            return label, end
+        label, end = f"{label} {m.group(1).strip()}".strip(" .;,"), m.end()
+
+
+def extract_timeline_events(text: str, file: str = "", tree: Optional[MarkdownTree] = None) -> List[TimelineEvent]:
+    """Normalized events of one markdown document, in document order of extraction."""
+    from mcp_integration.date_tools import extract_dated_events
+
+    tree = tree if tree is not None else parse_markdown(text)
+    starts, paths = _section_paths(tree)
+
+    def path_at(offset: int) -> Tuple[str, ...]:
+        i = bisect_right(starts, offset) - 1
+        return paths[i] if i >= 0 else ()
+
+    raw = [e for e in extract_dated_events(text, offsets=True) if e["kind"] in TIMELINE_KINDS]
+    # Time-only log entries, dated by the latest ISO date above them.
+    date_offsets = [(m.start(), m.group()) for m in _ISO_DATE_RE.finditer(text)]
+    date_starts = [offset for offset, _ in date_offsets]
+    for m in _TIME_ENTRY_RE.finditer(text):
+        # "^\s*" may start matching on a blank line above the entry.
+        start = _LEADING_SPACE_RE.match(text, m.start()).end()
+        i = bisect_left(date_starts, start) - 1
+        if i < 0:
+            continue
+        line_end = text.find("\n", start)
+        raw.append({
+            "date": f"{date_offsets[i][1]} {m.group(1)}",
+            "label": re.sub(r"\*\*|__", "", m.group(2)).strip(" .;,"),
+            "kind": "log",
+            "start": start,
+            "end": line_end if line_end >= 0 else len(text),
+        })
+    for e in raw:
+        if e["kind"] == "log":
+            e["label"], e["end"] = _join_continuations(text, e["label"], e["end"])
+
+    events = []
+    for e in raw:
+        path = path_at(e["start"])
+        events.append(TimelineEvent(
+            timestamp=_parse_timestamp(e["date"]),
+            date=e["date"],
+            label=e["label"],
+            event_type=classify_event(e["label"], path),
+            kind=e["kind"],
+            file=file,
+            start=e["start"],
+            end=e["end"],
+            section_path=path,
+        ))
+    return events
+
+
+class ClaimTimeline:
+    """Sorted claim events with time, type and label-word indexes."""
+
+    def __init__(self, events: Iterable[TimelineEvent], min_coverage: float = DEFAULT_MIN_COVERAGE):
+        from mcp_integration.date_tools import stems
+
+        self.min_coverage = min_coverage
+        # One event per (time, label): the same ledger row may be in several files.
+        unique: Dict[Tuple[datetime, str], TimelineEvent] = {}
+        for event in events:
+            unique.setdefault((event.timestamp, event.label.lower()), event)
+        self.events: List[TimelineEvent] = sorted(unique.values(), key=lambda e: (e.timestamp, e.date))
+        self._keys = [e.timestamp for e in self.events]
+        self._by_type: Dict[str, List[int]] = {}
+        self._postings: Dict[str, List[int]] = {}
+        self._label_stems: List[set] = []
+        for i, event in enumerate(self.events):
+            self._by_type.setdefault(event.event_type, []).append(i)
+            label_stems = set(stems(f"{event.label} {event.event_type}"))
+            self._label_stems.append(label_stems)
+            for stem in label_stems:
+                self._postings.setdefault(stem, []).append(i)
+
+    @classmethod
+    def build(cls, documents: Sequence[Document], trees: Sequence[MarkdownTree], **kwargs: Any) -> "ClaimTimeline":
+        """Events of every markdown document (documents without headings are skipped)."""
+        events: List[TimelineEvent] = []
+        for doc, tree in zip(documents, trees):
+            if tree.root.children:
+                events.extend(extract_timeline_events(tree.text, doc.metadata.get("file_path", doc.doc_id), tree))
+        return cls(events, **kwargs)
+
+    @classmethod
+    def from_text(cls, text: str, file: str = "", **kwargs: Any) -> "ClaimTimeline":
+        return cls(extract_timeline_events(text, file), **kwargs)
+
+    def __len__(self) -> int:
+        return len(self.events)
+
+    # Queries --------------------------------------------------------------
+
+    def between(self, start: datetime, end: datetime) -> List[TimelineEvent]:
+        """Events with start <= timestamp <= end."""
+        return self.events[bisect_left(self._keys, start):bisect_right(self._keys, end)]
+
+    def of_type(self, event_type: str) -> List[TimelineEvent]:
+        return [self.events[i] for i in self._by_type.get(event_type, [])]
+
+    def _scores(self, description: str) -> Dict[int, float]:
+        """
+        Inverse-frequency weighted term scores of the events that match
+        ``description`` well enough, found through the label postings.
+        """
+        from mcp_integration.date_tools import query_terms, term_coverage
+
+        n = len(self.events)
+        scores: Dict[int, float] = {}
+        for term in query_terms(description):
+            postings = self._postings.get(term, [])
+            weight = math.log(1 + n / (1 + len(postings)))
+            for i in postings:
+                scores[i] = scores.get(i, 0.0) + weight
+        return {
+            i: score for i, score in scores.items()
+            if term_coverage(f"{self.events[i].label} {self.events[i].event_type}", description) >= self.min_coverage
+        }
+
+    def matching(self, description: str) -> List[int]:
+        """Positions (in time order) of the events with the best score for ``description``."""
+        scores = self._scores(description)
+        if not scores:
+            return []
+        best = max(scores.values())
+        return sorted(i for i, score in scores.items() if score >= best - 1e-9)
+
+    def find(self, description: str) -> Optional[TimelineEvent]:
+        """
+        Best-matching event for ``description``, or None. As in the date
+        tools, structured sources outweigh log entries; ties go to the earliest.
+        """
+        from mcp_integration.date_tools import KIND_WEIGHT
+
+        scores = self._scores(description)
+        if not scores:
+            return None
+        best = max(scores, key=lambda i: (scores[i] * KIND_WEIGHT.get(self.events[i].kind, 0.5), -i))
+        return self.events[best]
+
+    def first(self, description: Optional[str] = None) -> Optional[TimelineEvent]:
+        return self._extreme(description, last=False)
+
+    def last(self, description: Optional[str] = None) -> Optional[TimelineEvent]:
+        return self._extreme(description, last=True)
+
+    def _extreme(self, description: Optional[str], last: bool) -> Optional[TimelineEvent]:
+        if not self.events:
+            return None
+        if description and _RELATIVE_RE.search(description):
+            return None
+        if not description or _ANY_EVENT_RE.match(description.strip()):
+            return self.events[-1 if last else 0]
+        if description.lower() in self._by_type:
+            positions = self._by_type[description.lower()]
+        else:
+            positions = sorted(self.matching(description))
+        if not positions:
+            return None
+        return self.events[positions[-1 if last else 0]]
+
+    def time_range(self, question: str) -> Optional[Tuple[datetime, datetime]]:
+        """
+        The span a question is about, if it names one: "between X and Y",
+        "from X to Y", or "in / on / during <date>". X and Y may be events.
+        """
+        m = _RANGE_RE.search(question)
+        if m:
+            start, end = self.resolve(m.group("start")), self.resolve(m.group("end"))
+            if start is not None and end is not None:
+                return min(start[0], end[0]), max(start[1], end[1])
+        for m in _DURING_RE.finditer(question):
+            span = parse_date_phrase(m.group("when"))
+            if span is not None:
+                return span
+        return None
+
+    def resolve(self, phrase: str) -> Optional[Tuple[datetime, datetime, str]]:
+        """(first, last instant, description) of a date or an event description."""
+        span = parse_date_phrase(phrase)
+        if span is not None:
+            return span[0], span[1], phrase.strip()
+        event = self.find(phrase)
+        if event is None:
+            return None
+        return event.timestamp, event.timestamp, f"{phrase.strip()} ({event.date})"
+
+    # Questions ------------------------------------------------------------
+
+    def parse(self, question: str) -> Optional[Tuple[str, Dict[str, str]]]:
+        """(shape, parts) of a timeline question: "between", "during", "extreme" or "order"; else None."""
+        q = question.strip()
+        for shape, pattern in (
+            ("between", _BETWEEN_Q_RE),
+            ("order", _WHICH_FIRST_Q_RE),
+            ("order", _BEFORE_AFTER_Q_RE),
+            ("during", _DURING_Q_RE),
+            ("extreme", _EXTREME_Q_RE),
+        ):
+            m = pattern.match(q)
+            if not m:
+                continue
+            parts = {k: v for k, v in m.groupdict().items() if v is not None}
+            if shape == "during" and parse_date_phrase(parts["when"]) is None:
+                continue
+            if shape == "extreme" and _VALUE_WORDS_RE.search(parts["what"]):
+                continue
+            return shape, parts
+        return None
+
+    def answer(self, question: str) -> Optional[Dict[str, Any]]:
+        """Answer a timeline question from the index, or None to fall back to retrieval."""
+        parsed = self.parse(question)
+        if parsed is None or not self.events:
+            return None
+        shape, parts = parsed
+        if shape == "between":
+            answer, events = self._answer_between(parts["start"], parts["end"])
+        elif shape == "during":
+            answer, events = self._answer_between(parts["when"], parts["when"])
+        elif shape == "order":
+            answer, events = self._answer_order(parts["a"], parts["b"], parts.get("rel", "before"), "rel" in parts)
+        else:
+            answer, events = self._answer_extreme(parts["which"].lower(), parts["what"])
+        if answer is None:
+            return None
+        return {
+            "agent": "timeline",
+            "question": question.strip(),
+            "answer": answer,
+            "sources": [self.source(e) for e in events[:5]],
+            "tool_used": "timeline_index",
+        }
+
+    def _answer_between(self, start_phrase: str, end_phrase: str) -> Tuple[Optional[str], List[TimelineEvent]]:
+        start, end = self.resolve(start_phrase), self.resolve(end_phrase)
+        if start is None or end is None:
+            return None, []
+        if start[0] > end[1]:
+            start, end = end, start
+        events = self.between(start[0], end[1])
+        if start == end:
+            header = f"{'On' if end[1] - start[0] < timedelta(days=1) else 'In'} {start[2]}"
+        else:
+            header = f"Between {start[2]} and {end[2]}"
+        if not events:
+            return f"{header}, no dated events are recorded.", []
+        lines = [f"- {e.describe()}" for e in events[:DEFAULT_MAX_LISTED]]
+        if len(events) > DEFAULT_MAX_LISTED:
+            lines.append(f"- ... and {len(events) - DEFAULT_MAX_LISTED} more")
+        return f"{header}, {len(events)} dated events are recorded:\n" + "\n".join(lines), events
+
+    def _answer_order(self, a: str, b: str, relation: str, yes_no: bool) -> Tuple[Optional[str], List[TimelineEvent]]:
+        event_a, event_b = self.find(a), self.find(b)
+        if event_a is None or event_b is None or event_a == event_b:
+            return None, []
+        a, b = _LEADING_ARTICLE_RE.sub("", a.strip()), _LEADING_ARTICLE_RE.sub("", b.strip())
+        if event_a.timestamp == event_b.timestamp:
+            text = f"{a} ({event_a.date}) and {b} ({event_b.date}) are recorded at the same time."
+        else:
+            earlier, later = ((a, event_a), (b, event_b))
+            if event_b.timestamp < event_a.timestamp:
+                earlier, later = later, earlier
+            text = f"{earlier[0]} ({earlier[1].date}) came before {later[0]} ({later[1].date})."
+            text = text[:1].upper() + text[1:]
+            if yes_no:
+                holds = (event_a.timestamp < event_b.timestamp) == (relation.lower() == "before")
+                text = f"{'Yes' if holds else 'No'}: {text[:1].lower() + text[1:]}"
+        return text, [event_a, event_b]
+
+    def _answer_extreme(self, which: str, what: str) -> Tuple[Optional[str], List[TimelineEvent]]:
+        what = _LEADING_ARTICLE_RE.sub("", what.strip())
+        last = which in ("last", "latest", "final", "most recent")
+        event = self._extreme(what, last)
+        if event is None:
+            return None, []
+        document = f", {event.document}" if event.document else ""
+        return f"The {which} {what} was on {event.date} ({event.label}{document}).", [event]
+
+    # Context --------------------------------------------------------------
+
+    def context_text(
+        self,
+        events: Optional[Sequence[TimelineEvent]] = None,
+        max_events: int = DEFAULT_MAX_CONTEXT_EVENTS,
+    ) -> str:
+        """Chronological event lines (date – label [type] (document)) for synthesis, at most ``max_events``."""
+        events = self.events if events is None else events
+        lines = [f"{e.date} – {e.label} [{e.event_type}] ({e.document})" for e in events[:max_events]]
+        if len(events) > max_events:
+            lines.append(f"... and {len(events) - max_events} more events")
+        return "\n".join(lines)
+
+    @staticmethod
+    def source(event: TimelineEvent) -> Dict[str, Any]:
+        return {
+            "node_id": f"event:{event.date}",
+            "score": 1.0,
+            "text": event.describe(),
+            "file": event.file,
+            "start": event.start,
+            "end": event.end,
+            "section_path": " > ".join(event.section_path),
+        }
+
+
+class ClaimTimelines:
+    """
+    One ``ClaimTimeline`` per claim (the files of one claim share it), so
+    every question is answered from the events of a single claim.
+
+    The claim is the one the question names ("In claim X: ..."), or the only
+    one loaded; otherwise ``for_question`` is None and the question goes to
+    retrieval.
+    """
+
+    def __init__(self, timelines: Dict[str, ClaimTimeline], claims: ClaimTexts):
+        self.timelines = timelines
+        self.claims = claims
+
+    @classmethod
+    def build(cls, documents: Sequence[Document], trees: Sequence[MarkdownTree], **kwargs: Any) -> "ClaimTimelines":
+        """Events of every markdown document, grouped by claim (documents without headings are skipped)."""
+        texts: Dict[str, str] = {}
+        events: Dict[str, List[TimelineEvent]] = {}
+        for doc, tree in zip(documents, trees):
+            if not tree.root.children:
+                continue
+            file = doc.metadata.get("file_path", doc.doc_id)
+            texts.setdefault(file, tree.text)
+            events.setdefault(claim_id(tree.text, file), []).extend(extract_timeline_events(tree.text, file, tree))
+        return cls({claim: ClaimTimeline(e, **kwargs) for claim, e in events.items()}, ClaimTexts(texts))
+
+    def __len__(self) -> int:
+        return sum(len(t) for t in self.timelines.values())
+
+    def for_question(self, question: str) -> Optional[ClaimTimeline]:
+        claim = self.claims.claim_for(question)
+        return self.timelines.get(claim) if claim is not None else None
+
+    def parse(self, question: str) -> Optional[Tuple[str, Dict[str, str]]]:
+        timeline = self.for_question(question)
+        return timeline.parse(strip_claim_prefix(question)) if timeline is not None else None
+
+    def answer(self, question: str) -> Optional[Dict[str, Any]]:
+        timeline = self.for_question(question)
+        if timeline is None:
+            return None
+        result = timeline.answer(strip_claim_prefix(question))
+        if result is not None:
+            result["question"] = question.strip()
+        return result